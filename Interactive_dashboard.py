@@ -9,140 +9,336 @@ Fetch data from AWS S3
 Ensure data privacy and data security
 
 Features:
-Business unit/Location: 1) click cell to show top 5 chart and top 10 chart; 2) drop down to select specific location; 3) search box
+Business unit/Location: 1) click cell to show top 5 chart and top 10 chart; 2) drop down to select specific location; 3) search box (typeahead over all locations, search.py)
 User List: 1) click cell to show top 5 chart and top 10 chart; 2) when selecting specifc location, the user list would be shown. The data can be filtered in the following: user id, total rating, disposals rating, locations rating, receiving rating
 Role Description: when selecting specific user in user list, the corresponding numbers would be displayed.
 
 Require:
 Python3 with packages on AWS EC2 terminal
-pip3 install dash pandas dash-bootstrap-components boto3 plotly.express OrderedDict io
+pip3 install dash pandas dash-bootstrap-components boto3 plotly.express OrderedDict io pyarrow gunicorn
 '''
 
 # import modules
 import pandas as pd
+import numpy as np
 import dash
 import dash_table
 import dash_core_components as dcc
 import dash_bootstrap_components as dbc
 import dash_html_components as html
 from dash.dependencies import Output, Input, State, ALL
-import boto3
-import io
 import json
 import plotly.express as px
 from collections import OrderedDict
+from types import SimpleNamespace
 import plotly.graph_objects as go
-
-# set path and name of data files
-is_data_on_s3 = True  # True: use csv on s3, False: csv on local disk
+import os
+from tables import table_file, decode_categories, widen_floats
+from loader import S3Backend, LocalBackend, delta_base, load_tables, published_version
+from indexes import LocationUserIndex, RankingIndex
+from table_query import query_page
+from figure_cache import FigureCache
+from summary import build_home_summary
+from timing import StageTimer
+from metrics import Metrics, instrument_dash
+from cube import AggregateCube, ALL_YEARS, error_types
+from ingest import UNKNOWN_YEAR
+from encoding import Dictionary, encode_columns
+from windows import window_labels
+from scoring import WeightScorer, default_weights, location_features, ranks, top_positions, weight_names
+from snapshots import SnapshotHolder, Refresher
+from incremental import apply_delta
+from api import column_arrays, register_api
+from downsample import ranked_figure, zoom_range
+from search import SearchIndex
+import logging
+
+# set path and name of data files (DASHBOARD_* environment variables override, e.g. for benchmark.py)
+is_data_on_s3 = os.environ.get('DASHBOARD_DATA_SOURCE', 's3') == 's3'  # True: use files on s3, False: files on local disk
 s3_bucket = 'dean690-dataset'
-file_location = 'table.Location_Rating.0412.csv'
-file_user = 'table.Rating.0412.csv'
-file_location_user_disposals = 'table.processed_disposals_df_1.0412.csv'
-file_location_user_receiving = 'table.processed_receiving_df_1.0412.csv'
-file_location_user_locations = 'table.processed_locations_df_1.0412.csv'
-rating_all = 'table.Rating_all.0412.csv'
-
-# create a function to get data on aws s3 bucket
-
-
-def get_s3_df(filename):
-    s3 = boto3.client('s3')
-    obj = s3.get_object(Bucket=s3_bucket, Key=filename)
-    df = pd.read_csv(io.BytesIO(obj['Body'].read()))
-    return df
-
-
-# load data files into DataFrames
-if is_data_on_s3:
-    df_location = get_s3_df(file_location)
-    df_user = get_s3_df(file_user)
-    df_location_user_disposals = get_s3_df(file_location_user_disposals)
-    df_location_user_receiving = get_s3_df(file_location_user_receiving)
-    df_location_user_locations = get_s3_df(file_location_user_locations)
-    df_rating_all = get_s3_df(rating_all)
-
-
-
-# business-unit-based table adjustments
-df_location = df_location.sort_values('total_rating', ascending=False)[
-    ['location', 'total_rating']]
-df_location = df_location[df_location.total_rating > 0]
-df_location['id'] = df_location.location
-
-df_all_user = df_user.sort_values('total_rating', ascending=False)
-df_all_user = df_all_user.nlargest(100, 'total_rating')
-
-df_all_location = df_location.sort_values('total_rating', ascending=False)
-df_all_location = df_all_location.nlargest(100, 'total_rating')
-
-trace1 = go.Bar(x=df_location.location, y=df_location.total_rating)
-# Stack rating each roles
-trace2 = go.Bar(name="Disposals_Rating", x=df_all_user.user,
-                y=df_all_user.disposals_rating, offsetgroup=0)
-trace3 = go.Bar(name="Locations_Rating", x=df_all_user.user,
-                y=df_all_user.locations_rating, offsetgroup=0)
-trace4 = go.Bar(name="Receiving_Rating", x=df_all_user.user,
-                y=df_all_user.receiving_rating, offsetgroup=0)
-#rate_all = go.Bar(name="All_Rating",x=df_all_user.user,y=df_all_user.total_rating,offsetgroup=0)
-
-# Disposals count
-
-disp_error_count = 0
-disp_correct_count = 0
-for i in range(len(df_rating_all)):
-    if (df_rating_all['disposals_rating'][i] == 0) and df_rating_all['disposal_role'][i] == 1:
-        disp_correct_count = disp_correct_count + 1
-    else:
-        disp_error_count = disp_error_count + 1
-
-# Location count
-loc_error_count = 0
-loc_correct_count = 0
-for i in range(len(df_rating_all)):
-    if (df_rating_all['locations_rating'][i] == 0) and df_rating_all['locations_role'][i] == 1:
-        loc_correct_count = loc_correct_count + 1
-    else:
-        loc_error_count = loc_error_count + 1
-
-# Receiving count
-recv_error_count = 0
-recv_correct_count = 0
-for i in range(len(df_rating_all)):
-    if (df_rating_all['receiving_rating'][i] == 0) and df_rating_all['receiving_role'][i] == 1:
-        recv_correct_count = recv_correct_count + 1
+s3_endpoint_url = None  # set for an S3-compatible stand-in, e.g. 'http://localhost:9000' for MinIO
+cache_dir = '.cache'  # local copies of the s3 files
+data_dir = os.environ.get('DASHBOARD_DATA_DIR', '.')  # directory of the files on local disk
+# DASHBOARD_DATA_VERSION pins a version; without it the dashboard serves the published
+# version (table.VERSION, see tables.publish_version) and reloads newly published ones
+pinned_version = os.environ.get('DASHBOARD_DATA_VERSION')
+default_version = '0412'  # served when no version is published
+data_ext = os.environ.get('DASHBOARD_DATA_EXT', '.csv')  # '.csv', '.parquet' or '.arrow' (typed columnar exports, see tables.py)
+# seconds between checks for a newly published version, 0 disables the reload
+reload_seconds = float(os.environ.get('DASHBOARD_RELOAD_SECONDS', '60'))
+
+
+# file names of the tables of a version
+def table_files(version):
+    return {
+        'location': table_file('Location_Rating', version, data_ext),
+        'user': table_file('Rating', version, data_ext),
+        'location_user_disposals': table_file('processed_disposals_df_1', version, data_ext),
+        'location_user_receiving': table_file('processed_receiving_df_1', version, data_ext),
+        'location_user_locations': table_file('processed_locations_df_1', version, data_ext),
+        'rating_all': table_file('Rating_all', version, data_ext),
+        'cube': table_file('Location_Cube', version, data_ext),
+        # dictionaries of the integer-coded user/location columns of the processed tables (encoding.py)
+        'dictionary_user': table_file('Dictionary_user', version, data_ext),
+        'dictionary_location': table_file('Dictionary_location', version, data_ext),
+        # ratings of the trailing windows and the time-decayed rating (windows.py)
+        'rating_windows': table_file('Rating_windows', version, data_ext),
+        # normalized per-user features of the what-if weight tuning (scoring.py)
+        'rating_features': table_file('Rating_features', version, data_ext),
+    }
+
+
+# columns each view needs, only these are read
+columns_location = ['location', 'total_rating']
+columns_user = ['user', 'total_rating', 'disposals_rating', 'locations_rating', 'receiving_rating',
+                'scan_type_#', 'ret_date_#', 'disp_doc_#', 'err_cost_disposals',
+                'val_ds584_flag_#', 'err_cost_locations',
+                'misclf_fap_#', 'cre_mthod_#', 'err_cost_receiving']
+columns_location_user = ['location', 'user']
+columns_rating_windows = ['window'] + columns_user
+columns_rating_all = ['disposals_rating', 'locations_rating', 'receiving_rating',
+                      'disposal_role', 'locations_role', 'receiving_role']
+table_columns = {
+    'location': columns_location,
+    'user': columns_user,
+    'location_user_disposals': columns_location_user,
+    'location_user_receiving': columns_location_user,
+    'location_user_locations': columns_location_user,
+    'rating_all': columns_rating_all,
+    'rating_windows': columns_rating_windows,
+}
+# tables that may not be exported yet, their views are disabled
+optional_tables = ('cube', 'dictionary_user', 'dictionary_location', 'rating_windows', 'rating_features')
+
+logger = logging.getLogger(__name__)
+
+# time each import stage, reported once the layout is built
+boot_timer = StageTimer()
+
+# latency and payload metrics of table loads, figures and callbacks, served at /metrics;
+# DASHBOARD_METRICS_LOG=1 logs one JSON line per callback, DASHBOARD_PROFILING=1 enables
+# the sampling profiler at /metrics/profile?seconds=10
+metrics = Metrics()
+if os.environ.get('DASHBOARD_METRICS_LOG') == '1':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+# data files are loaded concurrently and through the local cache (see loader.py)
+backend = S3Backend(s3_bucket, cache_dir=cache_dir, endpoint_url=s3_endpoint_url) if is_data_on_s3 \
+    else LocalBackend(data_dir)
+
+# user ratings per window: window -> (table like df_user, its ranking); 'all' is the Rating table
+default_window = 'all'
+
+
+# load the tables of a version and build everything the callbacks read from them: one
+# snapshot, swapped as a whole when a new version is published (snapshots.py)
+def build_snapshot(version, timer=None):
+    timer = timer or StageTimer()
+    # a delta export (incremental.write_delta): the tables of its base version, with the
+    # changed users' rows patched into Rating and Rating_all
+    base = delta_base(backend, version)
+    requests = {name: (key, table_columns.get(name)) for name, key in table_files(base or version).items()}
+    if base is not None:
+        requests['rating_all'] = (requests['rating_all'][0], ['user'] + columns_rating_all)
+        requests['user_delta'] = (table_file('Rating_delta', version, data_ext), None)
+    data = load_tables(backend, requests, metrics=metrics, optional=optional_tables)
+    if base is not None:
+        data['user'], data['rating_all'] = apply_delta(data['user'], data['rating_all'], data.pop('user_delta'))
+    df_location = data['location']
+    df_user = data['user']
+    timer.lap('load tables')
+
+    # decode the dictionary-encoded identifiers and float32 ratings of the one-row-per-entity tables
+    df_location = widen_floats(decode_categories(df_location, ['location']))
+    df_user = widen_floats(decode_categories(df_user, ['user']))
+
+    # business-unit-based table adjustments
+    df_location = df_location.sort_values('total_rating', ascending=False)[
+        ['location', 'total_rating']]
+    df_location = df_location[df_location.total_rating > 0]
+    df_location['id'] = df_location.location
+
+    # user-based table adjustments
+    df_user = df_user.sort_values(
+        'total_rating', ascending=False).set_index('user')
+    df_user = df_user[df_user.total_rating > 0]
+    df_user['id'] = df_user.index
+
+    # round the data to 6 digits
+    df_location = round(df_location, 6)
+    df_user = round(df_user, 6)
+    timer.lap('table adjustments')
+
+    # top-K / bottom-K / rank queries of the location and user ratings
+    location_ranking = RankingIndex(df_location.set_index('location'), ['total_rating'])
+    user_ranking = RankingIndex(df_user, ['total_rating', 'disposals_rating', 'locations_rating', 'receiving_rating'])
+    timer.lap('rankings')
+
+    # the rows of every window are aligned with df_user, so the location index serves all
+    # windows and switching a window is a dictionary lookup
+    user_views = OrderedDict([(default_window, (df_user, user_ranking))])
+    if data['rating_windows'] is not None:
+        windowed = widen_floats(decode_categories(data['rating_windows'], ['window', 'user']))
+        windowed = dict(list(windowed.groupby('window', sort=False)))
+        for window in window_labels:
+            if window == default_window or window not in windowed:
+                continue
+            df = windowed[window].set_index('user')[columns_user[1:]].reindex(df_user.index, fill_value=0)
+            df = round(df, 6)
+            df['id'] = df.index
+            user_views[window] = (df, RankingIndex(df, ['total_rating', 'disposals_rating', 'locations_rating',
+                                                        'receiving_rating']))
+        user_views.move_to_end(default_window, last=False)
+    # columns of every window's table for the scoring API (api.py), views without copies
+    user_arrays = OrderedDict((window, column_arrays(df)) for window, (df, _) in user_views.items())
+    timer.lap('rating windows')
+
+    # Home-tab statistics: location bar, top 100 users, error/correct pie counts
+    home_summary = build_home_summary(df_location, df_user, data['rating_all'],
+                                      location_ranking=location_ranking, user_ranking=user_ranking)
+    timer.lap('home summary')
+
+    df_all_user = home_summary['top_users']
+    # (the every-location chart is drawn by location_overview_figure, downsampled)
+    # Stack rating each roles
+    trace2 = go.Bar(name="Disposals_Rating", x=df_all_user.user,
+                    y=df_all_user.disposals_rating, offsetgroup=0)
+    trace3 = go.Bar(name="Locations_Rating", x=df_all_user.user,
+                    y=df_all_user.locations_rating, offsetgroup=0)
+    trace4 = go.Bar(name="Receiving_Rating", x=df_all_user.user,
+                    y=df_all_user.receiving_rating, offsetgroup=0)
+    #rate_all = go.Bar(name="All_Rating",x=df_all_user.user,y=df_all_user.total_rating,offsetgroup=0)
+
+    pie_color = ['red', 'green']
+    trace5 = go.Pie(labels=['Error', 'Correct'], values=list(
+                    home_summary['pies']['disposals']), marker=dict(colors=pie_color))
+    trace6 = go.Pie(labels=['Error', 'Correct'], values=list(
+                    home_summary['pies']['locations']), marker=dict(colors=pie_color))
+    trace7 = go.Pie(labels=['Error', 'Correct'], values=list(
+                    home_summary['pies']['receiving']), marker=dict(colors=pie_color))
+
+    # combine 3 role's location-user mapping, dedupe each table first to keep the concat small
+    location_user_tables = [data[name][['location', 'user']].drop_duplicates() for name in (
+        'location_user_disposals', 'location_user_receiving', 'location_user_locations')]
+
+    # user/location codes of the pairs: the exported dictionaries, or for exports with string
+    # identifiers, dictionaries built here and the deduped pairs encoded once
+    if data['dictionary_user'] is not None and data['dictionary_location'] is not None:
+        dictionaries = {'user': Dictionary.from_table(data['dictionary_user']),
+                        'location': Dictionary.from_table(data['dictionary_location'])}
     else:
-        recv_error_count = recv_error_count + 1
-
-pie_color = ['red', 'green']
-trace5 = go.Pie(labels=['Error', 'Correct'], values=[
-                disp_error_count, disp_correct_count], marker=dict(colors=pie_color))
-trace6 = go.Pie(labels=['Error', 'Correct'], values=[
-                loc_error_count, loc_correct_count], marker=dict(colors=pie_color))
-trace7 = go.Pie(labels=['Error', 'Correct'], values=[
-                recv_error_count, recv_correct_count], marker=dict(colors=pie_color))
-
-# user-based table adjustments
-df_user = df_user.sort_values(
-    'total_rating', ascending=False).set_index('user')
-df_user = df_user[df_user.total_rating > 0]
-df_user['id'] = df_user.index
-
-
-# round the data to 6 digits
-df_location = round(df_location, 6)
-df_user = round(df_user, 6)
-df_location_user_disposals = round(df_location_user_disposals, 6)
-df_location_user_locations = round(df_location_user_locations, 6)
-df_location_user_receiving = round(df_location_user_receiving, 6)
-
-# combine 3 role's location-user mapping
-df_location_user = pd.concat([df_location_user_disposals, df_location_user_receiving, df_location_user_locations])[
-    ['location', 'user']].drop_duplicates(ignore_index=True).set_index('location')
-
+        dictionaries = {'user': Dictionary(df_user.index), 'location': Dictionary(df_location.location)}
+        location_user_tables = [encode_columns(df, dictionaries)
+                                for df in location_user_tables]
+    # the concat and dedupe run on the int32 codes
+    df_location_user = pd.concat(location_user_tables).drop_duplicates(ignore_index=True).set_index('location')
+
+    # location -> presorted df_user rows, so selecting a location is a slice plus a gather
+    location_index = LocationUserIndex(df_location_user, df_user, dictionaries)
+    timer.lap('location index')
+
+    # typeahead search over location names and user IDs, ties by total rating
+    location_search = SearchIndex(df_location.location, df_location.total_rating)
+    user_search = SearchIndex(df_user.index, df_user.total_rating)
+    timer.lap('search index')
+
+    # drill-down cube: (role, error type, year, location) cells, None until the table is exported
+    cube = None
+    if data['cube'] is not None:
+        cube = AggregateCube()
+        cube.set_cells(decode_categories(data['cube'], ['location']))
+    timer.lap('cube')
+
+    # what-if weight tuning: normalized features of every user, summed per location over each
+    # role's pairs (on the codes), so new weights re-score everyone with a matrix-vector
+    # product; None until the table is exported
+    scorer = default_user_rank = default_location_rank = None
+    if data['rating_features'] is not None:
+        features = decode_categories(data['rating_features'], ['user']).set_index('user')
+        user_codes = dictionaries['user'].encode(features.index.to_numpy(), grow=False)
+        features_by_code = features[user_codes >= 0].set_axis(user_codes[user_codes >= 0])
+        df_location_features = location_features(features_by_code, dict(zip(
+            ('disposals', 'receiving', 'locations'), location_user_tables)))
+        df_location_features.index = dictionaries['location'].decode(df_location_features.index.to_numpy())
+        scorer = WeightScorer(features, df_location_features)
+        # ranks under the model's weights, to show how a tuning moves users and locations
+        default_user_rank = ranks(scorer.total())
+        default_location_rank = ranks(scorer.location_total())
+    timer.lap('what-if scorer')
+
+    return SimpleNamespace(
+        version=version, df_location=df_location, df_user=df_user,
+        location_ranking=location_ranking, user_ranking=user_ranking, user_views=user_views, user_arrays=user_arrays,
+        home_summary=home_summary, traces=[trace2, trace3, trace4, trace5, trace6, trace7],
+        location_index=location_index, location_search=location_search, user_search=user_search, cube=cube, scorer=scorer,
+        default_user_rank=default_user_rank, default_location_rank=default_location_rank,
+        # built figures, keyed by (chart type, sort column, N, location, highlighted user)
+        figure_cache=FigureCache(max_bytes=64 * 1024 * 1024, metrics=metrics))
+
+
+# the served snapshot; callbacks read it through snapshot(), which returns the snapshot
+# pinned for their request
+holder = SnapshotHolder(build_snapshot(pinned_version or published_version(backend) or default_version,
+                                       boot_timer))
+
+
+def snapshot():
+    return holder.get()
+
+
+# warm a new snapshot's figure cache with the charts of the landing views before it is
+# swapped in, so the first users after a reload don't build them
+def warm_snapshot(s):
+    build_location_overview()
+    for index in (5, 10):
+        build_location_barchart(index)
+        for by in ('total_rating', 'disposals_rating', 'locations_rating', 'receiving_rating'):
+            build_user_barchart(by, index)
+
+
+# the reload thread of this process, None if it doesn't reload
+refresher = None
+
+
+# check for a newly published version every reload_seconds in a background thread; call
+# once per process: __main__ below, and under gunicorn (gunicorn.conf.py) in the master,
+# which reloads and re-forks the workers (on_swap), and with reload=False in each worker,
+# which only watches the published version for the snapshot gauge
+def start_refresher(reload=True, on_swap=None):
+    global refresher
+    if pinned_version or reload_seconds <= 0:
+        return None
+    refresher = Refresher(holder, lambda: published_version(backend), build_snapshot if reload else None,
+                          interval=reload_seconds, warm=warm_snapshot, metrics=metrics, on_swap=on_swap).start()
+    return refresher
+
+
+# served version and, when this process reloads, the published version and how far
+# behind it the served snapshot is (Refresher.status)
+def snapshot_status():
+    if refresher is None:
+        return {'version': holder.current.version, 'swapped_at': holder.swapped_at, 'pid': os.getpid()}
+    return dict(refresher.status(), pid=os.getpid())
+
+
+# rows per page of the user table
+user_table_page_size = 20
+# matches listed by a search box
+search_limit = 20
+
+metrics.gauge('figure_cache', lambda: holder.current.figure_cache.stats())
+metrics.gauge('snapshot', snapshot_status)
 
 # initialize Dash application
-app = dash.Dash(external_stylesheets=[dbc.themes.FLATLY])
+# (the drill-down and what-if components only exist once their tables are exported, so
+# their callbacks are registered without them being in every layout)
+app = dash.Dash(external_stylesheets=[dbc.themes.FLATLY], suppress_callback_exceptions=True)
+# WSGI application for a multi-process server, see wsgi.py
+server = app.server
+holder.attach(server)
+instrument_dash(app, metrics, profiling=os.environ.get('DASHBOARD_PROFILING') == '1')
+# JSON scoring API for downstream systems at /api/v1, answered from the same snapshot (see api.py)
+register_api(server, snapshot, metrics)
 
 
 # set dashboard page content: location list
@@ -176,26 +372,52 @@ def build_location_top_selection():
 
 # set dashboard page content: location list
 # build location dropdown
-def build_location_dropdown():
-    options = [{'label': df_location.iloc[i].location + ' total_rating ' +
-                str(df_location.iloc[i].total_rating), 'value': df_location.iloc[i].location} for i in range(len(df_location))]
+# dropdown options of the matches of a search (positions of a SearchIndex), labeled with the
+# total rating; `search` is the typed text, so the dropdown doesn't filter out fuzzy matches
+def search_options(index, positions, search_value=None):
+    return [{'label': str(name) + ' total_rating ' + str(rating), 'value': name,
+             'search': search_value or str(name)}
+            for name, rating in zip(index.names[positions].tolist(), index.scores[positions].tolist())]
+
+
+# typeahead: the best matches of the typed text (the best rated names before typing), and
+# the selected value, which the dropdown must keep among its options
+def typeahead_options(index, search_value=None, value=None):
+    positions = index.search(search_value or '', search_limit)
+    options = search_options(index, positions, search_value)
+    if value is not None:
+        selected = index.position(value)
+        if selected >= 0 and selected not in positions:
+            options += search_options(index, [selected])
+    return options
+
+
+# location dropdown: only the typeahead matches are sent, see callback_location_search
+def build_location_dropdown(idstr='id_location_dropdown'):
     return dcc.Dropdown(
-        id='id_location_dropdown',
-        options=options,
+        id=idstr,
+        options=typeahead_options(snapshot().location_search),
         placeholder="Select a location",
     )
 
 
 # set dashboard page content: location list
 # build location barchart
-def build_location_barchart(index):
+def location_barchart_figure(index):
+    s = snapshot()
     if index > 0:
-        data = df_location.head(index)
+        data = s.df_location.iloc[s.location_ranking.top('total_rating', index)]
     else:
-        data = df_location.tail((-1)*index)
+        data = s.df_location.iloc[s.location_ranking.bottom('total_rating', (-1)*index)]
     fig = px.bar(data, x="location", y="total_rating",
                  color="location", title="")
     fig.update_layout(showlegend=False)
+    return fig
+
+
+def build_location_barchart(index):
+    fig = snapshot().figure_cache.get(('location_barchart', 'total_rating', index, None, None),
+                           lambda: location_barchart_figure(index))
     return dcc.Graph(
         id={
             'type': 'id_location_barchart',
@@ -240,23 +462,41 @@ def build_user_top_selection():
     )
 
 
+# ratings table and ranking of a window, the all-time ratings for an unknown window
+def user_view(window):
+    user_views = snapshot().user_views
+    return user_views.get(window, user_views[default_window])
+
+
+# a user's row of a window's ratings table, None if the user isn't in it (e.g. gone after a
+# reload, or not rated in the window)
+def user_info(user_id, window=default_window):
+    table = user_view(window)[0]
+    return table.loc[user_id] if user_id in table.index else None
+
+
+# get current location's user list, sorted by total rating (presorted for all time)
+def location_user_table(location_id, window=default_window):
+    table = user_view(window)[0].iloc[snapshot().location_index.rows(location_id)][[
+        'id', 'total_rating', 'disposals_rating', 'locations_rating', 'receiving_rating']]
+    if window in snapshot().user_views and window != default_window:
+        table = table.iloc[np.argsort(-table['total_rating'].to_numpy(), kind='stable')]
+    return table.reset_index()
+
+
 # set dashboard page content: user list
 # define structure and style for user table
-def build_user_table(location_id=None):
+# paging, filtering and sorting run on the server (callback_user_table_query), only one page is sent
+def build_user_table(location_id=None, window=default_window):
     if location_id is None:
-        data = None
+        data, page_count = None, 1
     else:
-        # get current location's user list
-        data = df_user[df_user.index.isin(df_location_user.user.loc[[location_id]])][[
-            'id', 'total_rating', 'disposals_rating', 'locations_rating', 'receiving_rating']]
-        # sort by total rating
-        data = data.sort_values(
-            ['total_rating'], ascending=False).reset_index().to_dict('records')
+        data, page_count = query_page(location_user_table(location_id, window), '', [], 0, user_table_page_size)
 
     return dash_table.DataTable(
         id={'type': 'id_user_table', 'index': '1'},
-        columns=[{"name": s, "id": s} for s in (
-            "user", "total_rating", 'disposals_rating', 'locations_rating', 'receiving_rating')],
+        columns=[{"name": "user", "id": "user"}] + [{"name": s, "id": s, "type": "numeric"} for s in (
+            "total_rating", 'disposals_rating', 'locations_rating', 'receiving_rating')],
         editable=True,
         data=data,
         style_header={
@@ -275,10 +515,17 @@ def build_user_table(location_id=None):
             }
         ],
         style_table={'overflowX': 'scroll'},
-        filter_action='native',
+        page_action='custom',
+        filter_action='custom',
+        sort_action='custom',
+        sort_mode='multi',
+        filter_query='',
+        sort_by=[],
+        page_current=0,
+        page_count=page_count,
         row_selectable='single',
         style_as_list_view=False,
-        page_size=20,
+        page_size=user_table_page_size,
         merge_duplicate_headers=True,
         dropdown_conditional=[{
             'if': {
@@ -292,11 +539,12 @@ def build_user_table(location_id=None):
 
 # set dashboard page content: user list
 # build user topX barchart
-def build_user_barchart(by, index):
+def user_barchart_figure(by, index, window=default_window):
+    df, ranking = user_view(window)
     if index > 0:
-        data = df_user.sort_values(by, ascending=False).head(index)
+        data = df.iloc[ranking.top(by, index)]
     else:
-        data = df_user.sort_values(by, ascending=False).tail((-1)*index)
+        data = df.iloc[ranking.bottom(by, (-1)*index)]
     if by == 'total_rating':
         data = data[['disposals_rating', 'locations_rating',
                      'receiving_rating']].reset_index()
@@ -310,6 +558,12 @@ def build_user_barchart(by, index):
         fig.update_layout(title="Top "+str(index) +
                           " Users vs " + by, yaxis={'title': by})
         fig.update_layout(showlegend=False)
+    return fig
+
+
+def build_user_barchart(by, index, window=default_window):
+    fig = snapshot().figure_cache.get(('user_barchart.' + window, by, index, None, None),
+                           lambda: user_barchart_figure(by, index, window))
     return dcc.Graph(
         id={
             'type': 'id_user_barchart',
@@ -382,8 +636,22 @@ def build_detail_zone():
     ]
 
 
+# every location by total rating (downsampled past downsample.max_points locations);
+# lo, hi: the rank range zoomed into
+def location_overview_figure(lo=0, hi=None):
+    locations = snapshot().home_summary['locations']
+    return ranked_figure(locations.location, locations.total_rating, lo, hi, title='Error Rating Each Locations',
+                         xaxis_title='Location Rank', yaxis_title='Error Rating')
+
+
+def build_location_overview():
+    return snapshot().figure_cache.get(('location_overview', 'total_rating', None, None, None),
+                                       location_overview_figure)
+
+
 # set Home page contents
 def build_homepage_text():
+    trace2, trace3, trace4, trace5, trace6, trace7 = snapshot().traces
     return [
         # project name
         html.H3("Accurate User Database and Traning Resource Optimization", style={
@@ -421,8 +689,7 @@ def build_homepage_text():
                 "margin-top": "15px", "margin-left": "50px"}),
         # graph for finding 2
         #html.H5("Graph2", style={"margin-top": "15px", "margin-left": "50px"}),
-        html.Div(dcc.Graph(id='location', style={'width': '190vh'}, figure=go.Figure(data=[trace1], layout={
-                 'title': 'Error Rating Each Locations', 'xaxis': {'title': 'Users'}, 'yaxis': {'title': 'Error Rating'}})),),
+        html.Div(dcc.Graph(id='location', style={'width': '190vh'}, figure=build_location_overview()),),
         # findings content 3
         html.H5("3. The Percentage of Error in Each Role: the graphs show the percentage of users who did the error transactions compared with the total number of users in each role.  The location role has the most users, and the disposal role has the highest user error rate in all three roles.", style={
                 "margin-top": "15px", "margin-left": "50px"}),
@@ -470,19 +737,7 @@ def build_table(idstr, columns, data, selectable):
 
 
 def build_location_zone(duplicate=False):
-    if not duplicate:
-        return dcc.Dropdown(
-            id='id_location_dropdown',
-            options=[{'label': df_location.iloc[i].location + ' total_rating ' + str(
-                df_location.iloc[i].total_rating), 'value': df_location.iloc[i].location} for i in range(len(df_location))],
-            placeholder="Select a location",
-        )
-    return dcc.Dropdown(
-        id='id_location_dropdown_2',
-        options=[{'label': df_location.iloc[i].location + ' total_rating ' +
-                  str(df_location.iloc[i].total_rating), 'value': df_location.iloc[i].location} for i in range(len(df_location))],
-        placeholder="Select a location",
-    )
+    return build_location_dropdown('id_location_dropdown_2' if duplicate else 'id_location_dropdown')
 
 # build user datatable
 
@@ -491,66 +746,202 @@ def build_user_zone(location_id=None):
     if location_id is None:
         userinfo = None
     else:
-        # get current location's user list
-        userinfo = df_user[df_user.index.isin(
-            df_location_user.user.loc[[location_id]])][['id', 'total_rating']]
+        # get current location's user list, presorted by total rating
+        s = snapshot()
+        userinfo = s.df_user.iloc[s.location_index.rows(location_id)][['id', 'total_rating']]
         userinfo = userinfo.round({'total_rating': 4})
-        # sort by total rating, remove user whose rating=0
-        userinfo = userinfo[userinfo.total_rating > 0].sort_values(
-            ['total_rating'], ascending=False).reset_index().to_dict('records')
+        # remove user whose rating=0
+        userinfo = userinfo[userinfo.total_rating > 0].reset_index().to_dict('records')
     return [build_table('id_user', [{"name": s, "id": s} for s in ("user", "total_rating")], userinfo, True)]
 
 
+# set drill-down page content: business units by role, error type and year (from the cube)
+cube_measures = OrderedDict([('errors', 'Error transactions'), ('err_cost', 'Error cost'),
+                             ('users', 'Users with errors'), ('rating_sum', 'Rating sum')])
+
+
+def year_label(year):
+    if year == ALL_YEARS:
+        return 'All years'
+    if year == UNKNOWN_YEAR:
+        return 'Unknown year'
+    return str(year)
+
+
+def build_drilldown_zone():
+    cube = snapshot().cube
+    if cube is None:
+        return [html.H5("The drill-down table (table.Location_Cube) has not been exported yet.",
+                        style={"margin-top": "50px", "margin-left": "50px"})]
+    return [
+        dbc.Row([
+            dbc.Col(dcc.Dropdown(id='id_cube_role', clearable=False, value='disposals',
+                                 options=[{'label': role.capitalize(), 'value': role}
+                                          for role in ('disposals', 'locations', 'receiving')]), width=2),
+            dbc.Col(dcc.Dropdown(id='id_cube_error_type', clearable=False), width=2),
+            dbc.Col(dcc.Dropdown(id='id_cube_year', clearable=False, value=ALL_YEARS,
+                                 options=[{'label': year_label(year), 'value': year} for year in cube.years()]),
+                    width=2),
+            dbc.Col(dcc.RadioItems(id='id_cube_measure', value='errors', inline=True,
+                                   options=[{'label': label, 'value': measure}
+                                            for measure, label in cube_measures.items()]), width=6),
+        ], style={"margin-top": "50px", "margin-left": "20px"}),
+        html.Div(id='id_cube_barchart_div'),
+        html.Div(id='id_cube_location_div', style={"margin-left": "50px", "margin-right": "50px"}),
+    ]
+
+
+# business units of a cube slice, sorted by the measure
+def cube_barchart_figure(role, error_type, year, measure):
+    data = snapshot().cube.slice(role, error_type, year).sort_values(measure, ascending=False).reset_index()
+    fig = px.bar(data, x='location', y=measure, hover_data=list(cube_measures), title="")
+    fig.update_layout(title=cube_measures[measure] + ' per Business Unit: ' + role + ', ' + error_type +
+                      ', ' + year_label(year), yaxis={'title': cube_measures[measure]})
+    return fig
+
+
+def build_cube_barchart(role, error_type, year, measure):
+    fig = snapshot().figure_cache.get(('cube_barchart', measure, year, role + '.' + error_type, None),
+                           lambda: cube_barchart_figure(role, error_type, year, measure))
+    return dcc.Graph(id={'type': 'id_cube_barchart', 'index': 1}, figure=fig, animate=False,
+                     responsive=True, config={"displayModeBar": False})
+
+
+# one business unit's cells over the years
+def build_cube_location_table(role, error_type, location):
+    data = snapshot().cube.location_years(role, error_type, location).reset_index()
+    data['year'] = [year_label(year) for year in data['year']]
+    data = data.round({'err_cost': 2, 'rating_sum': 4}).to_dict('records')
+    columns = [{"name": "year", "id": "year"}] + [{"name": label, "id": measure}
+                                                  for measure, label in cube_measures.items()]
+    return [html.H5(location + ': ' + role + ', ' + error_type + ' by year', style={"margin-top": "30px"}),
+            build_table('id_cube_location_table', columns, data, False)]
+
+
+# set what-if page content: one weight per feature, users and locations re-ranked by the weights
+whatif_top = 20
+
+
+def build_whatif_zone():
+    if snapshot().scorer is None:
+        return [html.H5("The feature table (table.Rating_features) has not been exported yet.",
+                        style={"margin-top": "50px", "margin-left": "50px"})]
+    weights = default_weights()
+    columns = []
+    for role in ('disposals', 'locations', 'receiving'):
+        columns.append(dbc.Col([html.H6("Role " + role.capitalize())] + [
+            html.Div([html.Label(name, style={'width': '170px'}),
+                      dcc.Input(id={'type': 'id_weight', 'index': name}, type='number', min=0, step=0.005,
+                                value=round(weights[name], 6), debounce=True)])
+            for name in weight_names(role)], width=4))
+    return [
+        dbc.Row(columns, style={"margin-top": "50px", "margin-left": "20px"}),
+        dbc.Row([
+            dbc.Col(html.Div(id='id_whatif_users'), width=7),
+            dbc.Col(html.Div(id='id_whatif_locations'), width=5),
+        ], style={"margin-top": "30px", "margin-left": "20px", "margin-right": "20px"}),
+    ]
+
+
+# top users and locations under the weights, with their rank under the model's weights
+def build_whatif_tables(weights):
+    s = snapshot()
+    scorer = s.scorer
+    totals = scorer.total(weights)
+    top = top_positions(totals, whatif_top)
+    users = scorer.score(weights, top).round(4).reset_index()
+    users.insert(0, 'rank', np.arange(1, len(top) + 1))
+    users['model_rank'] = s.default_user_rank[top]
+    location_totals = scorer.location_total(weights)
+    top = top_positions(location_totals, whatif_top)
+    locations = pd.DataFrame({'rank': np.arange(1, len(top) + 1), 'location': scorer.locations[top],
+                              'total_rating': location_totals[top].round(4),
+                              'model_rank': s.default_location_rank[top]})
+    return ([html.H5("Top " + str(whatif_top) + " users"),
+             build_table('id_whatif_user_table', [{"name": s, "id": s} for s in users.columns],
+                         users.to_dict('records'), False)],
+            [html.H5("Top " + str(whatif_top) + " business units"),
+             build_table('id_whatif_location_table', [{"name": s, "id": s} for s in locations.columns],
+                         locations.to_dict('records'), False)])
+
+
 # define homepage and dashboard layout
 section_header_style = {"margin-top": "0px",
                         "margin-bottom": "50px", "text-align": "center"}
-app.layout = html.Div([
-    dcc.Tabs([
-        dcc.Tab(
-            label='Home',
-            children=build_homepage_text()
-        ),
-        dcc.Tab(
-            label='Dashboard',
-            children=[
-                dbc.Row([
-                    dbc.Col(children=[
-                        html.H4("Business Unit/Location",
-                                style=section_header_style),
-                        html.Div(id='id_location_top_selection_div',
-                                 children=build_location_top_selection()),
-                        html.Div(id='id_location_dropdown_div',
-                                 children=build_location_dropdown()),
-                        html.Div(id='id_location_barchart_div')
-                    ], width=4),
-                    dbc.Col(children=[
-                        html.H4("User List", style=section_header_style),
-                        build_user_top_selection(),
-                        html.Div(id='id_user_barchart_or_table_div',
-                                 style={"margin-top": "50px"})
-                    ], width=5),
-                    dbc.Col(children=[html.H4(
-                        "Role Description", style=section_header_style)] + build_detail_zone(), width=3),
-                ], align='start', style={"margin-top": "50px"}),
-                html.Div([
-                    html.Div(children=[html.Div('Graphs Section')], style={
-                             'paddingLeft': '15px', 'textAlign': 'left', "font-size": "28px", "background-color": "#ffeecc"}),
+
+
+# built for every page load from the snapshot of that request, so a reload reaches new pages
+def serve_layout():
+    user_views = snapshot().user_views
+    return html.Div([
+        dcc.Tabs([
+            dcc.Tab(
+                label='Home',
+                children=build_homepage_text()
+            ),
+            dcc.Tab(
+                label='Drill-down',
+                children=build_drilldown_zone()
+            ),
+            dcc.Tab(
+                label='What-if',
+                children=build_whatif_zone()
+            ),
+            dcc.Tab(
+                label='Dashboard',
+                children=[
+                    dbc.Row([
+                        dbc.Col(children=[
+                            html.H4("Business Unit/Location",
+                                    style=section_header_style),
+                            html.Div(id='id_location_top_selection_div',
+                                     children=build_location_top_selection()),
+                            html.Div(id='id_location_dropdown_div',
+                                     children=build_location_dropdown()),
+                            html.Div(id='id_location_barchart_div')
+                        ], width=4),
+                        dbc.Col(children=[
+                            html.H4("User List", style=section_header_style),
+                            dcc.RadioItems(id='id_rating_window', value=default_window, inline=True,
+                                           options=[{'label': window_labels[window], 'value': window}
+                                                    for window in user_views],
+                                           style={} if len(user_views) > 1 else {'display': 'none'}),
+                            dcc.Dropdown(id='id_user_search', options=typeahead_options(snapshot().user_search),
+                                         placeholder="Search a user"),
+                            build_user_top_selection(),
+                            html.Div(id='id_user_barchart_or_table_div',
+                                     style={"margin-top": "50px"})
+                        ], width=5),
+                        dbc.Col(children=[html.H4(
+                            "Role Description", style=section_header_style)] + build_detail_zone(), width=3),
+                    ], align='start', style={"margin-top": "50px"}),
                     html.Div([
+                        html.Div(children=[html.Div('Graphs Section')], style={
+                                 'paddingLeft': '15px', 'textAlign': 'left', "font-size": "28px", "background-color": "#ffeecc"}),
                         html.Div([
-                            html.Div(id='user_rating_bar2'),
-                            html.Div(id='user_rating_bar')
-                        ],
-                            style={'display': 'flex', 'flexDirection': 'row',
-                                   'justifyContent': 'center'}
-                        ),
-                    ], style={'marginLeft': '2%', 'marginTop': '1%'}),
-                ], style={'marginTop': '50px'})
-            ]
-        ),
-    ]),
-    html.Div(id='id_selected_location', style={'display': 'none'}),
-    html.Div(id='id_selected_user', style={'display': 'none'}),
-], style={'width': '100vw', 'marginBottom': '100px'})
+                            html.Div([
+                                html.Div(id='user_rating_bar2'),
+                                html.Div(id='user_rating_bar')
+                            ],
+                                style={'display': 'flex', 'flexDirection': 'row',
+                                       'justifyContent': 'center'}
+                            ),
+                        ], style={'marginLeft': '2%', 'marginTop': '1%'}),
+                    ], style={'marginTop': '50px'})
+                ]
+            ),
+        ]),
+        html.Div(id='id_selected_location', style={'display': 'none'}),
+        html.Div(id='id_selected_user', style={'display': 'none'}),
+    ], style={'width': '100vw', 'marginBottom': '100px'})
+
+
+app.layout = serve_layout
+# build the layout once at startup, for the timing and to fail early
+serve_layout()
+boot_timer.lap('layout')
+logger.info(boot_timer.report('dashboard startup'))
+metrics.gauge('startup_s', lambda: dict(boot_timer.stages))
 
 
 # interative features: input detected in location zone, from either dropdown or barchart
@@ -589,36 +980,80 @@ def callback_location_input(dropdown_id, clickDataAll, active_cell):
               Output('id_location_top_selection_div', 'children'),
               Output('id_location_dropdown_div', 'children'),
               Input('id_selected_location', 'children'),
-              Input('id_user_top_selection', 'active_cell')
+              Input('id_user_top_selection', 'active_cell'),
+              Input('id_rating_window', 'value')
               )
-def callback_user_top_input(location_id, active_cell):
+def callback_user_top_input(location_id, active_cell, window):
     ctx = dash.callback_context
     if not ctx.triggered:
         return dash.no_update, dash.no_update, dash.no_update
     else:
         fire_id = ctx.triggered[0]['prop_id'].split('.')[0]
-        if fire_id == 'id_selected_location':
-            return None if location_id is None else build_user_table(location_id), dash.no_update, dash.no_update
+        if fire_id == 'id_rating_window' and location_id is None:
+            if active_cell is None or active_cell['column_id'] == 'top':
+                return dash.no_update, dash.no_update, dash.no_update
+            return build_user_barchart(active_cell['column_id'], int(active_cell['row_id']), window), \
+                dash.no_update, dash.no_update
+        if fire_id in ('id_selected_location', 'id_rating_window'):
+            return None if location_id is None else build_user_table(location_id, window), dash.no_update, dash.no_update
         else:
             if active_cell is None or active_cell['column_id'] == 'top':
                 return dash.no_update, dash.no_update, dash.no_update
             else:
-                return [build_user_barchart(active_cell['column_id'], int(active_cell['row_id'])),
+                return [build_user_barchart(active_cell['column_id'], int(active_cell['row_id']), window),
                         build_location_top_selection(),
                         build_location_dropdown()]
 
 
+# interative features: page, filter or sort changed in user table, evaluated on the server
+@app.callback(Output({'type': 'id_user_table', 'index': ALL}, 'data'),
+              Output({'type': 'id_user_table', 'index': ALL}, 'page_count'),
+              Input({'type': 'id_user_table', 'index': ALL}, 'page_current'),
+              Input({'type': 'id_user_table', 'index': ALL}, 'page_size'),
+              Input({'type': 'id_user_table', 'index': ALL}, 'sort_by'),
+              Input({'type': 'id_user_table', 'index': ALL}, 'filter_query'),
+              State('id_selected_location', 'children'),
+              State('id_rating_window', 'value'),
+              prevent_initial_call=True
+              )
+def callback_user_table_query(page_current, page_size, sort_by, filter_query, location_id, window):
+    table = location_user_table(location_id, window)
+    pages = [query_page(table, f, s, p, n or user_table_page_size)
+             for p, n, s, f in zip(page_current, page_size, sort_by, filter_query)]
+    return [data for data, _ in pages], [page_count for _, page_count in pages]
+
+
+# typeahead: ranked matches of the text typed in the location and user search boxes
+@app.callback(Output('id_location_dropdown', 'options'),
+              Input('id_location_dropdown', 'search_value'),
+              State('id_location_dropdown', 'value'),
+              prevent_initial_call=True)
+def callback_location_search(search_value, value):
+    return typeahead_options(snapshot().location_search, search_value, value)
+
+
+@app.callback(Output('id_user_search', 'options'),
+              Input('id_user_search', 'search_value'),
+              State('id_user_search', 'value'),
+              prevent_initial_call=True)
+def callback_user_search(search_value, value):
+    return typeahead_options(snapshot().user_search, search_value, value)
+
+
 # interative features: input detected in user table/barchart zone
 @app.callback(Output('id_selected_user', 'children'),
               Input({'type': 'id_user_table', 'index': ALL}, 'selected_row_ids'),
               Input({'type': 'id_user_barchart', 'index': ALL}, 'clickData'),
+              Input('id_user_search', 'value'),
               )
-def callback_user_table_chart_input(row_id, clickDataAll):
+def callback_user_table_chart_input(row_id, clickDataAll, search_user):
     ctx = dash.callback_context
     if not ctx.triggered:
         return dash.no_update
     else:
         fire_id = ctx.triggered[0]['prop_id'].split('.')[0]
+        if fire_id == 'id_user_search':
+            return dash.no_update if search_user is None else search_user
         if json.loads(fire_id)['type'] == 'id_user_table':
             return dash.no_update if row_id is None or row_id[0] is None else row_id[0][0]
         else:
@@ -633,11 +1068,14 @@ def callback_user_table_chart_input(row_id, clickDataAll):
 @app.callback(Output('id_detail_disposals', 'data'),
               Output('id_detail_location', 'data'),
               Output('id_detail_receiving', 'data'),
-              Input('id_selected_user', 'children'))
-def callback_user_selected(user_id):
+              Input('id_selected_user', 'children'),
+              Input('id_rating_window', 'value'))
+def callback_user_selected(user_id, window):
     if user_id is None:
         return dash.no_update, dash.no_update, dash.no_update
-    info = df_user.loc[user_id]
+    info = user_info(user_id, window)
+    if info is None:
+        return [], [], []
     detail_disposal = [info[["scan_type_#", "ret_date_#",
                              "disp_doc_#", "err_cost_disposals"]].to_dict()]
     detail_location = [
@@ -647,33 +1085,29 @@ def callback_user_selected(user_id):
     return detail_disposal, detail_location, detail_receiving
 
 
-def build_user_rating_bar2(df_user, user_id=None):
-    if not user_id:
-        color = ['#186ded' for x in range(len(df_user))]
-    else:
-        color = ['#186ded' if x['id'] !=
-                 user_id else '#e30909' for i, x in df_user.iterrows()]
-    df_user = df_user.sort_values(
-        by=['total_rating'], ascending=False).reset_index(drop=True)
-    bar2 = go.Figure(data=go.Bar(
-        x=df_user['id'],
-        y=df_user['total_rating'],
-        marker=dict(color=color)),
+# the location's users by total rating, the selected user in red (downsampled past
+# downsample.max_points users); lo, hi: the rank range zoomed into
+def user_rating_bar2_figure(location_id, user_id=None, window=default_window, lo=0, hi=None):
+    # current location's users, sorted by total rating
+    location_users = location_user_table(location_id, window)
+    location_users = location_users[location_users.total_rating > 0]
+    return ranked_figure(location_users['id'], location_users['total_rating'], lo, hi, title='Error Rating Per Users',
+                         xaxis_title='User Rank', yaxis_title='Error Rating', highlight=user_id)
 
-        layout={'title': {
-            'text': 'Error Rating Per Users',
-            'y': 0.9,
-            'x': 0.5,
-            'xanchor': 'center',
-            'yanchor': 'top'
-        }})
-    bar2.update_layout(xaxis_title="User", yaxis_title="Error Rating")
-    return [html.Div(dcc.Graph(figure=bar2))]
+
+def cached_user_rating_bar2(location_id, user_id=None, window=default_window):
+    return snapshot().figure_cache.get(('user_rating_bar2.' + window, 'total_rating', None, location_id, user_id),
+                                       lambda: user_rating_bar2_figure(location_id, user_id, window))
+
+
+def build_user_rating_bar2(location_id, user_id=None, window=default_window):
+    bar2 = cached_user_rating_bar2(location_id, user_id, window)
+    return [html.Div(dcc.Graph(id='id_user_rating_bar2_graph', figure=bar2))]
 
 # Function to create and return bar chart
 
 
-def build_user_rating_bar(user_info, cols=['disposals_rating', 'locations_rating', 'receiving_rating']):
+def user_rating_bar_figure(user_info, cols=['disposals_rating', 'locations_rating', 'receiving_rating']):
     #ratings = ["{:0,.4f}".format(float(user_info[col])) for col in cols]
     ratings = [round(float(user_info[col]), 4) for col in cols]
     bar = go.Figure(data=go.Bar(
@@ -691,6 +1125,15 @@ def build_user_rating_bar(user_info, cols=['disposals_rating', 'locations_rating
             'yanchor': 'top'
         }})
     bar.update_layout(xaxis_title="User Roles", yaxis_title="Error Rating")
+    return bar
+
+
+def build_user_rating_bar(user_id, window=default_window):
+    info = user_info(user_id, window)
+    if info is None:
+        return ''
+    bar = snapshot().figure_cache.get(('user_rating_bar.' + window, None, None, None, user_id),
+                                      lambda: user_rating_bar_figure(info))
     return [html.Div(dcc.Graph(figure=bar))]
 
 # main callback to udpate data table content upon input
@@ -699,35 +1142,111 @@ def build_user_rating_bar(user_info, cols=['disposals_rating', 'locations_rating
 @app.callback([Output('user_rating_bar', 'children'),
                Output('user_rating_bar2', 'children')],
               [Input('id_location_dropdown', 'value'),
-               Input('id_selected_user', 'children')],
+               Input('id_selected_user', 'children'),
+               Input('id_rating_window', 'value')],
               prevent_initial_call=True
               )
-def update_info(location_id, user_id):
+def update_info(location_id, user_id, window):
     ctx = dash.callback_context
     if not ctx.triggered:
         return ['', '']
     else:
         button_id = ctx.triggered[0]['prop_id'].split('.')[0]
 
-    location_users = df_user[df_user.index.isin(
-        df_location_user.user.loc[[location_id]])]
-    location_users = location_users[location_users.total_rating > 0].sort_values(
-        ['total_rating'], ascending=False).reset_index(drop=True)
-
+    # switched the rating window: redraw what is shown
+    if button_id == 'id_rating_window':
+        if user_id is None and location_id is None:
+            return dash.no_update, dash.no_update
+        button_id = 'id_location_dropdown' if user_id is None else 'id_selected_user'
     # selcted a new location
     if button_id == 'id_location_dropdown':
-        user_rating_bar2 = build_user_rating_bar2(location_users)
+        user_rating_bar2 = build_user_rating_bar2(location_id, window=window)
         return ['', user_rating_bar2]
     # selected a new user
     elif button_id == 'id_selected_user':
-        info = df_user.loc[user_id]
-        user_rating_bar = build_user_rating_bar(info)
-        user_rating_bar2 = build_user_rating_bar2(location_users, user_id)
+        user_rating_bar = build_user_rating_bar(user_id, window)
+        user_rating_bar2 = build_user_rating_bar2(location_id, user_id, window)
         return [user_rating_bar, user_rating_bar2]
     else:
         print('ERROR: unhandled input', button_id)
 
 
-# run web server at port 8050
+# zoom to detail: redraw the zoomed rank range of the downsampled charts from the full
+# series (zoomed figures are not cached, the ranges are arbitrary; a reset is the cached figure)
+@app.callback(Output('location', 'figure'),
+              Input('location', 'relayoutData'),
+              prevent_initial_call=True)
+def callback_location_overview_zoom(relayout):
+    zoom = zoom_range(relayout)
+    if zoom is None:
+        return dash.no_update
+    if zoom == (0, None):
+        return build_location_overview()
+    return location_overview_figure(*zoom)
+
+
+@app.callback(Output('id_user_rating_bar2_graph', 'figure'),
+              Input('id_user_rating_bar2_graph', 'relayoutData'),
+              State('id_location_dropdown', 'value'),
+              State('id_selected_user', 'children'),
+              State('id_rating_window', 'value'),
+              prevent_initial_call=True)
+def callback_user_rating_bar2_zoom(relayout, location_id, user_id, window):
+    zoom = zoom_range(relayout)
+    if zoom is None or location_id is None:
+        return dash.no_update
+    if zoom == (0, None):
+        return cached_user_rating_bar2(location_id, user_id, window)
+    return user_rating_bar2_figure(location_id, user_id, window, *zoom)
+
+
+# drill-down: error types of the selected role (the callbacks are registered whether or not
+# the cube is exported, a reload may add it)
+@app.callback(Output('id_cube_error_type', 'options'),
+              Output('id_cube_error_type', 'value'),
+              Input('id_cube_role', 'value'))
+def callback_cube_role(role):
+    options = [{'label': 'All errors' if name == 'all' else name, 'value': name}
+               for name, _ in error_types(role)]
+    return options, 'all'
+
+
+# drill-down: business unit barchart of the selected slice
+@app.callback(Output('id_cube_barchart_div', 'children'),
+              Input('id_cube_role', 'value'),
+              Input('id_cube_error_type', 'value'),
+              Input('id_cube_year', 'value'),
+              Input('id_cube_measure', 'value'))
+def callback_cube_slice(role, error_type, year, measure):
+    if error_type is None or snapshot().cube is None:
+        return dash.no_update
+    return build_cube_barchart(role, error_type, year, measure)
+
+
+# drill-down: clicked business unit over the years
+@app.callback(Output('id_cube_location_div', 'children'),
+              Input({'type': 'id_cube_barchart', 'index': ALL}, 'clickData'),
+              State('id_cube_role', 'value'),
+              State('id_cube_error_type', 'value'),
+              prevent_initial_call=True)
+def callback_cube_location(clickDataAll, role, error_type):
+    if not clickDataAll or not clickDataAll[0] or snapshot().cube is None:
+        return None
+    return build_cube_location_table(role, error_type, clickDataAll[0]['points'][0]['x'])
+
+
+# what-if: re-rank users and locations when a weight changes (empty inputs count as 0)
+@app.callback(Output('id_whatif_users', 'children'),
+              Output('id_whatif_locations', 'children'),
+              Input({'type': 'id_weight', 'index': ALL}, 'value'))
+def callback_whatif_weights(values):
+    if snapshot().scorer is None:
+        return dash.no_update, dash.no_update
+    names = [item['id']['index'] for item in dash.callback_context.inputs_list[0]]
+    return build_whatif_tables({name: float(value or 0) for name, value in zip(names, values)})
+
+
+# run web server at port 8050 (development; production: gunicorn -c gunicorn.conf.py wsgi:server)
 if __name__ == "__main__":
+    start_refresher()
     app.run_server(debug=False, host='0.0.0.0', port=8050)
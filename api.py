@@ -0,0 +1,264 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+JSON scoring API for downstream systems (e.g. the LMS assigning trainings), served by
+the dashboard's Flask server next to the Dash app.
+
+Endpoints:
+- GET /api/v1/users/<user>, GET /api/v1/users?id=<user>&id=..., POST /api/v1/users
+  {"users": [...]}: ratings, error breakdown and per-role ranks of up to max_batch users
+- GET /api/v1/locations/<location>/top?k=10, POST /api/v1/locations/top
+  {"locations": [...], "k": 10}: top-K users of each location
+- GET /api/v1/rankings?by=disposals_rating,receiving_rating&k=100&offset=0: per-role rankings
+Every endpoint takes `window` (a rating window of windows.py, default all time) and the
+top-K endpoints `by` (total_rating or a role rating); unknown users and locations are
+listed under "missing".
+
+Answers are gathers from the dashboard snapshot's indexes and column arrays (no table
+scans, no DataFrame per request). The rows are serialized in blocks and streamed. A
+snapshot never changes, so the ETag of a response is a hash of the snapshot version and
+the request: a client that sends it back in If-None-Match gets 304 Not Modified until a
+new version is published.
+
+The snapshot provides user_views ({window: (user table, RankingIndex)}), user_arrays
+({window: column_arrays(user table)}), location_index (indexes.LocationUserIndex) and version.
+
+Usage:
+    register_api(app.server, snapshot, metrics)
+'''
+
+# import modules
+import hashlib
+import json
+import time
+import numpy as np
+from scoring import top_positions
+
+prefix = '/api/v1'
+# most users or locations of one request, most rows of one top-K
+max_batch = 10000
+max_k = 1000
+# rows serialized per streamed block
+block_rows = 1000
+
+default_window = 'all'
+rating_columns = ['total_rating', 'disposals_rating', 'locations_rating', 'receiving_rating']
+user_columns = rating_columns + ['scan_type_#', 'ret_date_#', 'disp_doc_#', 'err_cost_disposals',
+                                 'val_ds584_flag_#', 'err_cost_locations',
+                                 'misclf_fap_#', 'cre_mthod_#', 'err_cost_receiving']
+
+
+# invalid request, answered with {"error": message}
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+# the columns of a user table the API serves, as arrays (views of the table's columns)
+def column_arrays(df):
+    return [df[col].to_numpy() for col in user_columns]
+
+
+# user table, its column arrays and ranking of a window
+def _view(s, window):
+    window = window or default_window
+    if window not in s.user_views:
+        raise ApiError('unknown window ' + str(window) + ', one of: ' + ', '.join(s.user_views))
+    df, ranking = s.user_views[window]
+    return df, s.user_arrays[window], ranking
+
+
+def _integer(value, name, upper, default):
+    try:
+        value = default if value is None else int(value)
+    except (TypeError, ValueError):
+        raise ApiError(name + ' must be an integer')
+    if not 0 <= value <= upper:
+        raise ApiError(name + ' must be between 0 and ' + str(upper))
+    return value
+
+
+def _rating_column(by):
+    by = by or 'total_rating'
+    if by not in rating_columns:
+        raise ApiError('unknown column ' + str(by) + ', one of: ' + ', '.join(rating_columns))
+    return by
+
+
+def _ids(values, name):
+    if not isinstance(values, list):
+        raise ApiError(name + ' must be a list')
+    if len(values) > max_batch:
+        raise ApiError('at most ' + str(max_batch) + ' ' + name + ' per request', 413)
+    return [str(value) for value in values]
+
+
+# JSON list of records, serialized in blocks
+def _records(records):
+    yield '['
+    for start in range(0, len(records), block_rows):
+        yield (',' if start else '') + json.dumps(records[start:start + block_rows])[1:-1]
+    yield ']'
+
+
+# JSON object of (key, value) items; a generator value is streamed, anything else dumped
+def _object(items):
+    yield '{'
+    for i, (key, value) in enumerate(items):
+        yield (',' if i else '') + json.dumps(key) + ':'
+        if hasattr(value, '__next__'):
+            yield from value
+        else:
+            yield json.dumps(value)
+    yield '}'
+
+
+# JSON list of generators
+def _list(values):
+    yield '['
+    for i, value in enumerate(values):
+        if i:
+            yield ','
+        yield from value
+    yield ']'
+
+
+# records of the users at row offsets `rows`: user, user_columns and the per-role ranks
+def _user_rows(df, arrays, ranking, rows):
+    names = ['user'] + user_columns + ['rank_' + col for col in rating_columns]
+    values = np.column_stack([array[rows] for array in arrays]).tolist()
+    ranks = np.column_stack([ranking.ranks(col, rows) for col in rating_columns]).tolist()
+    return [dict(zip(names, [user] + row + rank))
+            for user, row, rank in zip(df.index[rows].tolist(), values, ranks)]
+
+
+# ratings, error breakdown and ranks of a batch of users
+def users_answer(s, users, window=None):
+    df, arrays, ranking = _view(s, window)
+    rows = df.index.get_indexer(users)
+    return _object([('version', s.version), ('window', window or default_window),
+                    ('missing', [user for user, row in zip(users, rows) if row < 0]),
+                    ('users', _records(_user_rows(df, arrays, ranking, rows[rows >= 0])))])
+
+
+# one user, ApiError 404 if unknown
+def user_answer(s, user, window=None):
+    df, arrays, ranking = _view(s, window)
+    try:
+        row = df.index.get_loc(user)
+    except KeyError:
+        raise ApiError('unknown user ' + user, 404)
+    return _object([('version', s.version), ('window', window or default_window),
+                    ('user', _user_rows(df, arrays, ranking, np.array([row]))[0])])
+
+
+# df rows of a location's k best users by a column (the location index is presorted by
+# the all-time total rating)
+def _location_top_rows(s, arrays, location, k, by, window):
+    rows = s.location_index.rows(location)
+    if by == 'total_rating' and window == default_window:
+        return rows[:k]
+    return rows[top_positions(arrays[user_columns.index(by)][rows], k)]
+
+
+# top-K users of each location
+def locations_top_answer(s, locations, k=None, by=None, window=None):
+    window = window or default_window
+    df, arrays, ranking = _view(s, window)
+    k = _integer(k, 'k', max_k, 10)
+    by = _rating_column(by)
+    known = [location for location in locations if s.location_index.location_code(location) >= 0]
+    parts = (_object([('location', location), ('users', _records(
+        _user_rows(df, arrays, ranking, _location_top_rows(s, arrays, location, k, by, window))))])
+        for location in known)
+    return _object([('version', s.version), ('window', window), ('by', by), ('k', k),
+                    ('missing', [location for location in locations if s.location_index.location_code(location) < 0]),
+                    ('locations', _list(parts))])
+
+
+# top users of one or more rating columns, from offset on
+def rankings_answer(s, by=None, k=None, offset=None, window=None):
+    window = window or default_window
+    df, arrays, ranking = _view(s, window)
+    columns = [_rating_column(col) for col in (by or 'total_rating').split(',')]
+    k = _integer(k, 'k', max_k, 100)
+    offset = _integer(offset, 'offset', len(ranking), 0)
+    parts = []
+    for col in columns:
+        rows = ranking.top(col, offset + k)[offset:]
+        ratings = arrays[user_columns.index(col)][rows].tolist()
+        parts.append((col, _records([{'rank': offset + i + 1, 'user': user, 'rating': rating} for i, (user, rating)
+                                     in enumerate(zip(df.index[rows].tolist(), ratings))])))
+    return _object([('version', s.version), ('window', window), ('offset', offset),
+                    ('rankings', _object(parts))])
+
+
+# serve the API on a Flask server; get_snapshot() returns the dashboard snapshot to answer
+# from (snapshots.py), metrics (metrics.py) times each endpoint as api.<name>
+def register_api(server, get_snapshot, metrics=None):
+    from flask import Response, request
+
+    def respond(name, answer):
+        start = time.perf_counter()
+        s = get_snapshot()
+        key = b'\0'.join([s.version.encode(), request.method.encode(), request.full_path.encode(),
+                          request.get_data()])
+        etag = hashlib.sha1(key).hexdigest()
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            try:
+                # validation and index lookups run here, only the serialization is streamed
+                chunks = answer(s)
+            except ApiError as e:
+                return Response(json.dumps({'error': str(e)}), status=e.status, mimetype='application/json')
+            response = Response(chunks, mimetype='application/json')
+        response.set_etag(etag)
+        # cached answers are revalidated, they change with the published version
+        response.headers['Cache-Control'] = 'no-cache'
+        if metrics is not None:
+            metrics.observe('api.' + name, time.perf_counter() - start)
+        return response
+
+    def body():
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            raise ApiError('expected a JSON object')
+        return data
+
+    @server.route(prefix + '/users', methods=['GET', 'POST'])
+    def api_users():
+        def answer(s):
+            if request.method == 'POST':
+                data = body()
+                return users_answer(s, _ids(data.get('users'), 'users'), data.get('window'))
+            return users_answer(s, _ids(request.args.getlist('id'), 'users'), request.args.get('window'))
+        return respond('users', answer)
+
+    @server.route(prefix + '/users/<user>')
+    def api_user(user):
+        return respond('user', lambda s: user_answer(s, user, request.args.get('window')))
+
+    @server.route(prefix + '/locations/<location>/top')
+    def api_location_top(location):
+        args = request.args
+        return respond('location_top', lambda s: locations_top_answer(
+            s, [location], args.get('k'), args.get('by'), args.get('window')))
+
+    @server.route(prefix + '/locations/top', methods=['POST'])
+    def api_locations_top():
+        def answer(s):
+            data = body()
+            return locations_top_answer(s, _ids(data.get('locations'), 'locations'), data.get('k'),
+                                        data.get('by'), data.get('window'))
+        return respond('locations_top', answer)
+
+    @server.route(prefix + '/rankings')
+    def api_rankings():
+        args = request.args
+        return respond('rankings', lambda s: rankings_answer(s, args.get('by'), args.get('k'), args.get('offset'),
+                                                             args.get('window')))
+
+    return server
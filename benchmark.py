@@ -0,0 +1,415 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Benchmark of the rating pipeline and the dashboard on synthetic extracts (synthetic_data.py).
+
+Pipeline stages, each with wall time, rows/s, the peak RSS while it ran and that peak above
+the RSS it started with (the peak is restarted per stage through /proc/self/clear_refs):
+    as-of date (a pass over the date columns) -> ingest (ingest.ingest_role per role: read,
+    dedupe, clean, cube facts, window sums, encode, per-user sums) -> rate (scale + weight)
+    -> what-if features -> location rollup -> cube -> windowed ratings -> export
+    -> training rosters (rosters.py)
+and, with --workers, the parallel pipeline (pipeline.py) end to end.
+Dashboard: startup time and peak RSS, plus cold (first) and warm (median) latency of each
+callback and scoring API endpoint (api.py), measured through the Flask test client in a
+separate process so the pipeline's memory doesn't count.
+
+Results are written as JSON. Given a baseline result file, stages slower than the baseline
+by more than the tolerance are reported and the exit code is 1, so CI can catch regressions.
+
+Usage:
+    python benchmark.py --rows 1000000 --workdir bench
+    python benchmark.py --rows 1000000 --workdir bench --baseline bench_0412.json --tolerance 0.2
+'''
+
+# import modules
+import argparse
+import json
+import os
+import re
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import numpy as np
+import pandas as pd
+import api
+import ingest
+import pipeline
+import rating
+from cube import AggregateCube
+from encoding import dictionary_tables, encode_columns, new_dictionaries
+from loader import LocalBackend
+from rosters import load_roster_tables, write_rosters
+from synthetic_data import write_extracts
+from tables import export_tables
+from scoring import default_weights, feature_table
+from windows import WindowedSums, latest_transaction_date
+
+data_version = 'bench'
+
+
+# peak resident memory of this process in MB (ru_maxrss is KB on linux)
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# resident memory of this process in MB: (now, peak since the last reset_peak_rss), or
+# (None, None) where /proc/self/status doesn't exist
+def rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            status = f.read()
+    except OSError:
+        return None, None
+    return tuple(int(re.search(name + r':\s+(\d+)', status).group(1)) / 1024 for name in ('VmRSS', 'VmHWM'))
+
+
+# restart the peak resident memory (VmHWM) at the current one, linux only
+def reset_peak_rss():
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+# timings of pipeline stages: {stage: {'seconds', 'rows', 'rows_per_s', 'peak_rss_mb', 'stage_mb'}}
+# peak_rss_mb: peak resident memory while the stage ran (not the process' all-time peak,
+# which an earlier stage may have set); stage_mb: that peak above the memory at the start
+# of the stage, the memory the stage itself needed
+class StageResults:
+    def __init__(self):
+        self.stages = {}
+        self.start_rss = None
+
+    # start timing a stage, returns the start time for add
+    def start(self):
+        reset_peak_rss()
+        self.start_rss = rss_mb()[0]
+        return time.perf_counter()
+
+    def add(self, name, start, rows):
+        seconds = time.perf_counter() - start
+        peak = rss_mb()[1]
+        stage = self.stages.setdefault(name, {'seconds': 0.0, 'rows': 0, 'peak_rss_mb': None, 'stage_mb': None})
+        stage['seconds'] += seconds
+        stage['rows'] += rows
+        stage['rows_per_s'] = stage['rows'] / stage['seconds'] if stage['seconds'] else None
+        if peak is not None:
+            stage['peak_rss_mb'] = max(stage['peak_rss_mb'] or 0, peak)
+            stage['stage_mb'] = max(stage['stage_mb'] or 0, peak - self.start_rss)
+
+
+# run the pipeline over the extracts in extract_dir, write the tables into out_dir
+# every role streams through ingest.ingest_role like the production load: dedupe, clean, cube,
+# window sums, encode and per-user sums per chunk, so only the sums stay in memory
+def bench_pipeline(extract_dir, out_dir, chunksize=ingest.chunksize):
+    results = StageResults()
+    paths = {role: os.path.join(extract_dir, source['file']) for role, source in ingest.SOURCES.items()}
+    start = results.start()
+    window_sums = WindowedSums(latest_transaction_date(paths, chunksize))
+    results.add('as-of date', start, 0)
+
+    user_sums, location_users = {}, {}
+    cube = AggregateCube()
+    dictionaries = new_dictionaries()
+    for role, path in paths.items():
+        start = results.start()
+        user_sums[role], _, location_users[role] = ingest.ingest_role(
+            path, role, chunksize=chunksize, cube=cube, dictionaries=dictionaries, windows=window_sums)
+        results.add('ingest', start, int(user_sums[role]['n'].sum()))
+
+    start = results.start()
+    # users are rated by name, the notebook's user order matters
+    role_aggs = {role: rating.finish_aggregate(
+        user_sums[role].set_axis(dictionaries['user'].decode(user_sums[role].index.to_numpy())).sort_index(), role)
+        for role in rating.ROLES}
+    role_ratings = {role: rating.model_role(agg, role) for role, agg in role_aggs.items()}
+    rating_df = rating.combine_ratings(*role_ratings.values())
+    rating_all = rating.build_rating_all(rating_df)
+    results.add('rate', start, sum(len(s) for s in user_sums.values()))
+
+    start = results.start()
+    rating_features = feature_table(role_aggs)
+    results.add('features', start, len(rating_features))
+
+    start = results.start()
+    location_rating = rating.location_rollup(location_users, role_ratings, dictionaries)
+    results.add('location rollup', start, sum(len(p) for p in location_users.values()))
+
+    start = results.start()
+    cube.refresh(role_ratings)
+    results.add('cube', start, 0)
+
+    start = results.start()
+    rating_windows = window_sums.ratings()
+    results.add('windows', start, len(rating_windows))
+
+    # the dashboard reads location/user pairs (int codes) from the processed tables
+    tables = {'Rating': rating_df, 'Rating_all': rating_all, 'Location_Rating': location_rating,
+              'Location_Cube': cube.table(), 'Rating_windows': rating_windows,
+              'Rating_features': rating_features, **dictionary_tables(dictionaries)}
+    for role, pairs in location_users.items():
+        tables['processed_' + role + '_df_1'] = pairs
+    os.makedirs(out_dir, exist_ok=True)
+    start = results.start()
+    export_tables(tables, out_dir, data_version)
+    results.add('export', start, sum(len(df) for df in tables.values()))
+
+    # nightly training rosters of every business unit, from the exported tables
+    start = results.start()
+    write_rosters(load_roster_tables(LocalBackend(out_dir), data_version, '.parquet'),
+                  os.path.join(out_dir, 'rosters'), data_version, 'parquet')
+    results.add('rosters', start, sum(len(p) for p in location_users.values()))
+    return results.stages
+
+
+# call one dash callback through the test client, returns the seconds it took
+def dash_call(client, output, outputs, inputs, changed, state=None):
+    payload = {'output': output, 'outputs': outputs, 'inputs': inputs,
+               'changedPropIds': changed, 'state': state or []}
+    start = time.perf_counter()
+    response = client.post('/_dash-update-component', json=payload)
+    seconds = time.perf_counter() - start
+    if response.status_code not in (200, 204):
+        raise RuntimeError(output + ': HTTP ' + str(response.status_code))
+    return seconds
+
+
+# requests of the dashboard's callbacks for a location and a user: {name: dash_call kwargs}
+def dashboard_requests(location, user, window='all'):
+    table_id = {'index': '1', 'type': 'id_user_table'}
+    window_input = {'id': 'id_rating_window', 'property': 'value', 'value': window}
+    table_all = '{"index":["ALL"],"type":"id_user_table"}'
+    return {
+        'callback_location_input': dict(
+            output='..id_selected_location.children...id_location_barchart_div.children..',
+            outputs=[{'id': 'id_selected_location', 'property': 'children'},
+                     {'id': 'id_location_barchart_div', 'property': 'children'}],
+            inputs=[{'id': 'id_location_dropdown', 'property': 'value', 'value': location}, [],
+                    {'id': 'id_location_top_selection', 'property': 'active_cell', 'value': None}],
+            changed=['id_location_dropdown.value']),
+        'callback_user_top_input': dict(
+            output='..id_user_barchart_or_table_div.children...id_location_top_selection_div.children'
+                   '...id_location_dropdown_div.children..',
+            outputs=[{'id': 'id_user_barchart_or_table_div', 'property': 'children'},
+                     {'id': 'id_location_top_selection_div', 'property': 'children'},
+                     {'id': 'id_location_dropdown_div', 'property': 'children'}],
+            inputs=[{'id': 'id_selected_location', 'property': 'children', 'value': location},
+                    {'id': 'id_user_top_selection', 'property': 'active_cell', 'value': None}, window_input],
+            changed=['id_selected_location.children']),
+        'callback_user_table_query': dict(
+            output='..' + table_all + '.data...' + table_all + '.page_count..',
+            outputs=[[{'id': table_id, 'property': 'data'}], [{'id': table_id, 'property': 'page_count'}]],
+            inputs=[[{'id': table_id, 'property': 'page_current', 'value': 1}],
+                    [{'id': table_id, 'property': 'page_size', 'value': 20}],
+                    [{'id': table_id, 'property': 'sort_by',
+                      'value': [{'column_id': 'total_rating', 'direction': 'asc'}]}],
+                    [{'id': table_id, 'property': 'filter_query', 'value': '{total_rating} > 0.1'}]],
+            state=[{'id': 'id_selected_location', 'property': 'children', 'value': location}, window_input],
+            changed=[json.dumps(table_id, separators=(',', ':')) + '.sort_by']),
+        'callback_user_table_chart_input': dict(
+            output='id_selected_user.children',
+            outputs={'id': 'id_selected_user', 'property': 'children'},
+            inputs=[[{'id': table_id, 'property': 'selected_row_ids', 'value': [user]}], [],
+                    {'id': 'id_user_search', 'property': 'value', 'value': None}],
+            changed=[json.dumps(table_id, separators=(',', ':')) + '.selected_row_ids']),
+        'callback_location_search': dict(
+            output='id_location_dropdown.options',
+            outputs={'id': 'id_location_dropdown', 'property': 'options'},
+            inputs=[{'id': 'id_location_dropdown', 'property': 'search_value', 'value': str(location)[:-1]}],
+            state=[{'id': 'id_location_dropdown', 'property': 'value', 'value': None}],
+            changed=['id_location_dropdown.search_value']),
+        # a misspelled user ID (one character dropped), answered from the trigram index
+        'callback_user_search': dict(
+            output='id_user_search.options',
+            outputs={'id': 'id_user_search', 'property': 'options'},
+            inputs=[{'id': 'id_user_search', 'property': 'search_value', 'value': str(user)[:1] + str(user)[2:]}],
+            state=[{'id': 'id_user_search', 'property': 'value', 'value': None}],
+            changed=['id_user_search.search_value']),
+        'callback_user_selected': dict(
+            output='..id_detail_disposals.data...id_detail_location.data...id_detail_receiving.data..',
+            outputs=[{'id': 'id_detail_disposals', 'property': 'data'},
+                     {'id': 'id_detail_location', 'property': 'data'},
+                     {'id': 'id_detail_receiving', 'property': 'data'}],
+            inputs=[{'id': 'id_selected_user', 'property': 'children', 'value': user}, window_input],
+            changed=['id_selected_user.children']),
+        'update_info': dict(
+            output='..user_rating_bar.children...user_rating_bar2.children..',
+            outputs=[{'id': 'user_rating_bar', 'property': 'children'},
+                     {'id': 'user_rating_bar2', 'property': 'children'}],
+            inputs=[{'id': 'id_location_dropdown', 'property': 'value', 'value': location},
+                    {'id': 'id_selected_user', 'property': 'children', 'value': user}, window_input],
+            changed=['id_selected_user.children']),
+        'switch_window': dict(
+            output='..user_rating_bar.children...user_rating_bar2.children..',
+            outputs=[{'id': 'user_rating_bar', 'property': 'children'},
+                     {'id': 'user_rating_bar2', 'property': 'children'}],
+            inputs=[{'id': 'id_location_dropdown', 'property': 'value', 'value': location},
+                    {'id': 'id_selected_user', 'property': 'children', 'value': user},
+                    dict(window_input, value='90d' if window == 'all' else 'all')],
+            changed=['id_rating_window.value']),
+        'zoom_user_rating_bar2': dict(
+            output='id_user_rating_bar2_graph.figure',
+            outputs={'id': 'id_user_rating_bar2_graph', 'property': 'figure'},
+            inputs=[{'id': 'id_user_rating_bar2_graph', 'property': 'relayoutData',
+                     'value': {'xaxis.range[0]': 0.5, 'xaxis.range[1]': 20.5}}],
+            state=[{'id': 'id_location_dropdown', 'property': 'value', 'value': location},
+                   {'id': 'id_selected_user', 'property': 'children', 'value': user}, window_input],
+            changed=['id_user_rating_bar2_graph.relayoutData']),
+        'callback_cube_slice': dict(
+            output='id_cube_barchart_div.children',
+            outputs={'id': 'id_cube_barchart_div', 'property': 'children'},
+            inputs=[{'id': 'id_cube_role', 'property': 'value', 'value': 'disposals'},
+                    {'id': 'id_cube_error_type', 'property': 'value', 'value': 'scan_type'},
+                    {'id': 'id_cube_year', 'property': 'value', 'value': 0},
+                    {'id': 'id_cube_measure', 'property': 'value', 'value': 'err_cost'}],
+            changed=['id_cube_year.value']),
+        'callback_whatif_weights': dict(
+            output='..id_whatif_users.children...id_whatif_locations.children..',
+            outputs=[{'id': 'id_whatif_users', 'property': 'children'},
+                     {'id': 'id_whatif_locations', 'property': 'children'}],
+            inputs=[[{'id': {'index': name, 'type': 'id_weight'}, 'property': 'value',
+                      'value': 0.5 if name == 'err_cost_disposals' else weight}
+                     for name, weight in default_weights().items()]],
+            changed=['{"index":"err_cost_disposals","type":"id_weight"}.value']),
+    }
+
+
+# time one scoring API request, returns seconds
+def api_call(client, method, path, body=None):
+    start = time.perf_counter()
+    response = client.open(path, method=method, json=body)
+    response.get_data()  # the answer is streamed
+    seconds = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(path + ': HTTP ' + str(response.status_code))
+    return seconds
+
+
+# scoring API requests for a location, a user and a batch of users: {name: api_call args}
+def api_requests(location, user, users):
+    return {
+        'api.user': ('GET', api.prefix + '/users/' + user),
+        'api.users': ('POST', api.prefix + '/users', {'users': list(users)}),
+        'api.location_top': ('GET', api.prefix + '/locations/' + location + '/top?k=10'),
+        'api.rankings': ('GET', api.prefix + '/rankings?by=' + ','.join(api.rating_columns) + '&k=100'),
+    }
+
+
+# import the dashboard and time its callbacks, runs inside the child process
+def bench_dashboard_child(repeat):
+    start = time.perf_counter()
+    import Interactive_dashboard as dashboard
+    results = {'startup': {'seconds': time.perf_counter() - start, 'peak_rss_mb': peak_rss_mb(),
+                           'stages': dict(dashboard.boot_timer.stages)}}
+    # the busiest location and its top user
+    snapshot = dashboard.snapshot()
+    location = snapshot.location_index.locations[
+        int(np.argmax(np.diff(snapshot.location_index.location_ptr)))]
+    user = snapshot.df_user.index[snapshot.location_index.rows(location)[0]]
+    client = dashboard.server.test_client()
+    for name, request in dashboard_requests(location, user).items():
+        seconds = [dash_call(client, **request) for _ in range(repeat)]
+        results[name] = {'seconds': seconds[0], 'warm_seconds': statistics.median(seconds[1:] or seconds)}
+    for name, request in api_requests(location, user, snapshot.df_user.index[:api.max_batch].tolist()).items():
+        seconds = [api_call(client, *request) for _ in range(repeat)]
+        results[name] = {'seconds': seconds[0], 'warm_seconds': statistics.median(seconds[1:] or seconds)}
+    # hot reload of the same tables: build and warm a snapshot off the request path, then swap
+    start = time.perf_counter()
+    fresh = dashboard.build_snapshot(snapshot.version)
+    with dashboard.holder.pinned(fresh):
+        dashboard.warm_snapshot(fresh)
+    dashboard.holder.swap(fresh)
+    results['reload'] = {'seconds': time.perf_counter() - start}
+    results['peak_rss_mb'] = peak_rss_mb()
+    print(json.dumps(results))
+
+
+# run the dashboard over the tables in data_dir in a fresh process
+def bench_dashboard(data_dir, data_ext, repeat=5):
+    env = dict(os.environ, DASHBOARD_DATA_SOURCE='local', DASHBOARD_DATA_DIR=os.path.abspath(data_dir),
+               DASHBOARD_DATA_EXT=data_ext, DASHBOARD_DATA_VERSION=data_version)
+    env['PYTHONPATH'] = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--dashboard-child', str(repeat)],
+                            env=env, stdout=subprocess.PIPE, check=True,
+                            universal_newlines=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+# stages slower than the baseline by more than tolerance: [(section, stage, seconds, baseline)]
+def regressions(results, baseline, tolerance):
+    slower = []
+    for section in ('pipeline', 'dashboard'):
+        for stage, values in results.get(section, {}).items():
+            base = baseline.get(section, {}).get(stage)
+            if not isinstance(values, dict) or not isinstance(base, dict) or 'seconds' not in base:
+                continue
+            if values['seconds'] > base['seconds'] * (1 + tolerance):
+                slower.append((section, stage, values['seconds'], base['seconds']))
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the rating pipeline and the dashboard.')
+    parser.add_argument('--rows', type=int, default=1000000, help='rows of each synthetic extract')
+    parser.add_argument('--workdir', default='bench', help='directory of the extracts and tables')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunksize', type=int, default=ingest.chunksize)
+    parser.add_argument('--ext', default='.csv', help="tables the dashboard reads: '.csv', '.parquet' or '.arrow'")
+    parser.add_argument('--repeat', type=int, default=5, help='calls of each dashboard callback')
+    parser.add_argument('--workers', type=int, help='also time pipeline.run_pipeline with this many processes')
+    parser.add_argument('--skip-dashboard', action='store_true')
+    parser.add_argument('--out', default='bench_results.json')
+    parser.add_argument('--baseline', help='result file of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown, 0.2 = 20%%')
+    parser.add_argument('--dashboard-child', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.dashboard_child:
+        bench_dashboard_child(args.dashboard_child)
+        return 0
+
+    extract_dir = os.path.join(args.workdir, 'extracts')
+    table_dir = os.path.join(args.workdir, 'tables')
+    start = time.perf_counter()
+    write_extracts(extract_dir, args.rows, seed=args.seed)
+    results = {'rows': args.rows, 'generate_seconds': time.perf_counter() - start,
+               'pipeline': bench_pipeline(extract_dir, table_dir, args.chunksize)}
+    if args.workers:
+        # memory of this process only, the workers are processes of their own
+        parallel = StageResults()
+        start = parallel.start()
+        dictionaries = new_dictionaries()
+        pipeline.build_tables(pipeline.run_pipeline(extract_dir, workers=args.workers, dictionaries=dictionaries),
+                              dictionaries)
+        parallel.add('parallel pipeline', start, 3 * args.rows)
+        results['pipeline'].update(parallel.stages)
+    if not args.skip_dashboard:
+        results['dashboard'] = bench_dashboard(table_dir, args.ext, args.repeat)
+
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=1)
+    for section in ('pipeline', 'dashboard'):
+        for stage, values in results.get(section, {}).items():
+            if isinstance(values, dict) and 'seconds' in values:
+                rate = values.get('rows_per_s')
+                rss = values.get('peak_rss_mb')
+                print('{:<10} {:<32} {:8.3f}s {:>16} {:>8}'.format(
+                    section, stage, values['seconds'], '{:,.0f} rows/s'.format(rate) if rate else '',
+                    '{:.0f} MB'.format(rss) if rss else ''))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(results, json.load(f), args.tolerance)
+        for section, stage, seconds, base in slower:
+            print('REGRESSION {} {}: {:.3f}s vs {:.3f}s'.format(section, stage, seconds, base))
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
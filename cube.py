@@ -0,0 +1,152 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Precomputed aggregate cube over (role, error type, year, location) for drill-down.
+
+The cube keeps additive facts per (location, year, user) and role: transactions, cost,
+and for every error type (the role's actions, plus 'all' for any error) the error
+transactions and their cost. New batches of processed rows are folded into the facts
+(add), so a refresh never rescans the transaction tables. refresh() derives the cells:
+
+    role, error_type, year, location -> n, errors, err_cost, users, rating_sum
+
+errors/err_cost: error transactions of that type and their cost; users: users with at
+least one such error; rating_sum: the sum of those users' role ratings. Year ALL_YEARS
+holds the totals over all years, UNKNOWN_YEAR the transactions without a valid date.
+A slice is an index lookup on the sorted cells.
+
+Usage:
+    cube = AggregateCube()
+    ingest.ingest_role(path, 'disposals', cube=cube)       # or cube.add(processed, role, years)
+    cube.refresh({'disposals': disposals_rating_df, ...})
+    cube.slice('disposals', 'scan_type', 2019)               # per business unit
+'''
+
+# import modules
+import os
+import numpy as np
+import pandas as pd
+import rating
+
+# year of the all-years totals
+ALL_YEARS = 0
+
+cube_keys = ['role', 'error_type', 'year', 'location']
+cube_measures = ['n', 'errors', 'err_cost', 'users', 'rating_sum']
+
+
+def cube_facts_file(role):
+    return 'cube.' + role + '_facts.csv'
+
+
+# error types of a role: (name, processed column) of each action, plus 'all'
+def error_types(role):
+    return [(name, col) for col, name, _ in rating.ROLES[role]['actions']] + [('all', None)]
+
+
+# facts of processed rows: one row per location, year, user with the additive measures
+def build_facts(processed, role, years):
+    if isinstance(years, pd.Series):
+        years = years.reindex(processed.index)
+    df = pd.DataFrame({'location': processed['location'].to_numpy(), 'user': processed['user'].to_numpy(),
+                       'year': np.asarray(years, dtype=np.int64), 'n': 1,
+                       'org_cost': processed['ori_cost'].to_numpy(dtype=float)})
+    any_error = np.zeros(len(df), dtype=bool)
+    for name, col in error_types(role)[:-1]:
+        error = processed[col].to_numpy(dtype=float) > 0
+        any_error |= error
+        df[name] = error.astype(np.int64)
+        df[name + '_cost'] = np.where(error, df['org_cost'], 0.0)
+    df['all'] = any_error.astype(np.int64)
+    df['all_cost'] = np.where(any_error, df['org_cost'], 0.0)
+    return df.groupby(['location', 'year', 'user'], sort=False).sum()
+
+
+# cells of one role from its facts and user ratings, one grouped pass per year level
+def role_cells(facts, role, ratings):
+    types = error_types(role)
+    levels = {'year': facts, 'all': facts.groupby(level=['location', 'user'], sort=False).sum()}
+    cells = []
+    for level, df in levels.items():
+        df = df.reset_index()
+        if level == 'all':
+            df['year'] = ALL_YEARS
+        user_rating = df['user'].map(ratings).fillna(0).to_numpy()
+        measures = {'n': df['n']}
+        for name, _ in types:
+            has_error = df[name].to_numpy() > 0
+            measures[name + '.errors'] = df[name]
+            measures[name + '.err_cost'] = df[name + '_cost']
+            measures[name + '.users'] = has_error.astype(np.int64)
+            measures[name + '.rating_sum'] = np.where(has_error, user_rating, 0.0)
+        summed = pd.DataFrame(measures).groupby([df['year'].to_numpy(), df['location'].to_numpy()]).sum()
+        summed.index.names = ['year', 'location']
+        for name, _ in types:
+            part = summed[[name + '.' + m for m in cube_measures[1:]]]
+            part.columns = cube_measures[1:]
+            part.insert(0, 'n', summed['n'])
+            cells.append(part.assign(role=role, error_type=name).reset_index())
+    return pd.concat(cells, ignore_index=True)
+
+
+class AggregateCube:
+    def __init__(self, facts=None):
+        self.facts = facts or {}  # role -> facts indexed by location, year, user
+        self.cells = None
+
+    # fold processed rows of a role (years: transaction year of each row) into the facts
+    def add(self, processed, role, years):
+        part = build_facts(processed, role, years)
+        facts = self.facts.get(role)
+        self.facts[role] = part if facts is None else pd.concat([facts, part]).groupby(level=[0, 1, 2]).sum()
+
+    # rebuild the cells from the facts and the current ratings ({role: *_rating_df})
+    def refresh(self, role_ratings):
+        cells = [role_cells(self.facts[role], role,
+                            role_ratings[role].set_index('user')[role + '_rating'])
+                 for role in rating.ROLES if role in self.facts]
+        self.cells = self.set_cells(pd.concat(cells, ignore_index=True)[cube_keys + cube_measures])
+        return self.cells
+
+    # use an exported cells table, sorted and indexed for lookups
+    def set_cells(self, cells):
+        self.cells = cells.set_index(cube_keys).sort_index()
+        return self.cells
+
+    # cells of a role, error type and year: one row per location (or one location's row)
+    def slice(self, role, error_type='all', year=ALL_YEARS, location=None):
+        key = (role, error_type, year) if location is None else (role, error_type, year, location)
+        try:
+            return self.cells.loc[key]
+        except KeyError:
+            return self.cells.iloc[:0].droplevel([0, 1, 2])
+
+    # cells of one location over the years: one row per year
+    def location_years(self, role, error_type, location):
+        df = self.cells.xs((role, error_type), level=['role', 'error_type'])
+        return df.xs(location, level='location')
+
+    # years present in the cells, all-years first
+    def years(self):
+        years = sorted(set(self.cells.index.get_level_values('year')) - {ALL_YEARS})
+        return [ALL_YEARS] + years
+
+    # the cells as a flat table, e.g. for export_tables({'Location_Cube': ...})
+    def table(self):
+        return self.cells.reset_index()
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for role, facts in self.facts.items():
+            facts.to_csv(os.path.join(directory, cube_facts_file(role)))
+
+    @classmethod
+    def load(cls, directory):
+        facts = {}
+        for role in rating.ROLES:
+            path = os.path.join(directory, cube_facts_file(role))
+            if os.path.exists(path):
+                facts[role] = pd.read_csv(path, index_col=['location', 'year', 'user'],
+                                          dtype={'location': str, 'user': str})
+        return cls(facts)
@@ -0,0 +1,103 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Bounded-size charts of ranked series (every location by rating, every user of a location).
+
+Up to max_points entities are drawn one bar each. A longer series is summarized on the
+server into at most max_points rank buckets (first/last rank, max, mean and min rating,
+the top entity), drawn as WebGL lines (go.Scattergl) with the min-max band filled, so the
+figure's JSON stays small however many entities there are. Zooming into a rank range
+redraws only that range from the full series: buckets again while it is long, one bar
+per entity once it is short (zoom_range turns Dash's relayoutData into that range).
+
+Usage:
+    fig = ranked_figure(df.location, df.total_rating, title='Error Rating Each Locations')
+    lo, hi = zoom_range(relayout)   # in a relayoutData callback
+    fig = ranked_figure(df.location, df.total_rating, lo, hi)
+'''
+
+# import modules
+import math
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# most bars (or rank buckets) of one figure
+max_points = 1000
+# bars are labeled with the entity below this many, like the charts before
+max_labels = 100
+
+
+# rank buckets of values[lo:hi], at most n: 1-based first/last rank, count, max, mean, min and
+# the position of each bucket's first entity
+def rank_buckets(values, lo=0, hi=None, n=max_points):
+    values = np.asarray(values, dtype=np.float64)
+    hi = len(values) if hi is None else min(hi, len(values))
+    lo = min(max(lo, 0), hi)
+    if hi == lo:
+        return pd.DataFrame({'first': [], 'last': [], 'count': [], 'max': [], 'mean': [], 'min': [], 'position': []})
+    size = math.ceil((hi - lo) / n)
+    starts = np.arange(lo, hi, size)
+    part = values[lo:hi]
+    offsets = starts - lo
+    counts = np.diff(np.append(starts, hi))
+    return pd.DataFrame({'first': starts + 1, 'last': starts + counts, 'count': counts,
+                         'max': np.maximum.reduceat(part, offsets),
+                         'mean': np.add.reduceat(part, offsets) / counts,
+                         'min': np.minimum.reduceat(part, offsets),
+                         'position': starts})
+
+
+# rank range [lo, hi) (0-based) of a zoom in relayoutData, None for a full view or no zoom
+def zoom_range(relayout):
+    if not relayout:
+        return None
+    if relayout.get('xaxis.autorange'):
+        return 0, None
+    if 'xaxis.range[0]' in relayout and 'xaxis.range[1]' in relayout:
+        first, last = relayout['xaxis.range[0]'], relayout['xaxis.range[1]']
+    elif 'xaxis.range' in relayout:
+        first, last = relayout['xaxis.range']
+    else:
+        return None
+    # the x axis is the 1-based rank
+    return max(int(math.floor(first)) - 1, 0), max(int(math.ceil(last)), 0)
+
+
+# figure of a series ranked by value (descending): bars up to max_points entities in
+# [lo, hi), WebGL max/mean/min lines of rank buckets above; highlight: label drawn red
+def ranked_figure(labels, values, lo=0, hi=None, title='', xaxis_title='Rank', yaxis_title='',
+                  highlight=None, n=max_points):
+    labels = np.asarray(labels, dtype=object)
+    values = np.asarray(values, dtype=np.float64)
+    hi = len(values) if hi is None else min(hi, len(values))
+    lo = min(max(lo, 0), hi)
+    if hi - lo <= n:
+        ranks = np.arange(lo + 1, hi + 1)
+        color = np.where(labels[lo:hi] == highlight, '#e30909', '#186ded') if highlight is not None else '#186ded'
+        fig = go.Figure(data=go.Bar(x=ranks, y=values[lo:hi], hovertext=labels[lo:hi], marker=dict(color=color)))
+        if hi - lo <= max_labels:
+            fig.update_xaxes(tickmode='array', tickvals=ranks, ticktext=labels[lo:hi])
+    else:
+        buckets = rank_buckets(values, lo, hi, n)
+        hover = ['ranks {}-{}: top {}'.format(f, l, top) for f, l, top in
+                 zip(buckets['first'], buckets['last'], labels[buckets['position'].to_numpy()])]
+        fig = go.Figure(data=[
+            go.Scattergl(x=buckets['first'], y=buckets['max'], mode='lines', name='max', hovertext=hover,
+                         line=dict(color='#186ded')),
+            go.Scattergl(x=buckets['first'], y=buckets['min'], mode='lines', name='min', fill='tonexty',
+                         line=dict(color='#186ded', width=0.5)),
+            go.Scattergl(x=buckets['first'], y=buckets['mean'], mode='lines', name='mean',
+                         line=dict(color='#0ac45e')),
+        ])
+        if highlight is not None:
+            at = np.flatnonzero(labels[lo:hi] == highlight)
+            if len(at):
+                fig.add_trace(go.Scattergl(x=[lo + at[0] + 1], y=[values[lo + at[0]]], mode='markers', name=highlight,
+                                           marker=dict(color='#e30909', size=10)))
+    fig.update_layout(title={'text': title, 'y': 0.9, 'x': 0.5, 'xanchor': 'center', 'yanchor': 'top'},
+                      xaxis_title=xaxis_title, yaxis_title=yaxis_title)
+    # keep the zoom when the figure is redrawn for a range
+    fig.update_xaxes(range=[lo + 0.5, hi + 0.5])
+    return fig
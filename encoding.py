@@ -0,0 +1,103 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Dictionary encoding of the user and location identifiers.
+
+A Dictionary assigns stable int32 codes to strings: a value keeps its code forever and
+new values are appended, so codes from earlier exports stay valid. Joins, groupbys and
+index lookups run on the codes; strings are decoded only for display. The dictionaries
+are exported next to the tables as Dictionary_user / Dictionary_location (code, value).
+
+Usage:
+    dictionaries = new_dictionaries()
+    encoded = encode_columns(processed_disposals_df_1, dictionaries)
+    export_tables({'processed_disposals_df_1': encoded, **dictionary_tables(dictionaries)}, 'out', '0412')
+'''
+
+# import modules
+import numpy as np
+import pandas as pd
+
+# columns holding identifiers, encoded with the dictionary of the same name
+encoded_columns = ('user', 'location')
+
+
+# identifiers as an object array of str (csv reads numeric-looking identifiers as numbers)
+def as_strings(values):
+    return pd.Index(values, dtype=object).astype(str).to_numpy(dtype=object)
+
+
+# append-only mapping of strings to int32 codes (the position of the string)
+class Dictionary:
+    def __init__(self, values=()):
+        self.values = pd.Index(pd.unique(as_strings(values)), dtype=object)
+
+    def __len__(self):
+        return len(self.values)
+
+    # int32 codes of values; unknown values get new codes (grow) or -1
+    def encode(self, values, grow=True):
+        values = as_strings(values)
+        codes = self.values.get_indexer(values)
+        if grow and (codes < 0).any():
+            new = pd.unique(values[codes < 0])
+            self.values = self.values.append(pd.Index(new, dtype=object))
+            codes = self.values.get_indexer(values)
+        return codes.astype(np.int32)
+
+    # strings of codes (-1 decodes to None)
+    def decode(self, codes):
+        codes = np.asarray(codes)
+        values = self.values.to_numpy()[np.maximum(codes, 0)]
+        if (codes < 0).any():
+            values = values.copy()
+            values[codes < 0] = None
+        return values
+
+    # the dictionary as an exportable table
+    def table(self):
+        return pd.DataFrame({'code': np.arange(len(self.values), dtype=np.int32), 'value': self.values})
+
+    @classmethod
+    def from_table(cls, df):
+        df = df.sort_values('code')
+        if not np.array_equal(df['code'].to_numpy(), np.arange(len(df))):
+            raise ValueError('dictionary codes are not 0..n-1')
+        return cls(df['value'].to_numpy())
+
+
+# an empty dictionary for every encoded column
+def new_dictionaries():
+    return {col: Dictionary() for col in encoded_columns}
+
+
+# copy of df with its identifier columns replaced by codes
+def encode_columns(df, dictionaries):
+    df = df.copy()
+    for col, dictionary in dictionaries.items():
+        if col in df.columns:
+            df[col] = dictionary.encode(df[col].to_numpy())
+    return df
+
+
+# copy of df with its code columns replaced by strings
+def decode_columns(df, dictionaries):
+    df = df.copy()
+    for col, dictionary in dictionaries.items():
+        if col in df.columns:
+            df[col] = dictionary.decode(df[col].to_numpy())
+    return df
+
+
+# encode a role's (user_sums, location_sums, location_users) like ingest.ingest_role(dictionaries=...)
+def encode_result(result, dictionaries):
+    user_sums, location_sums, location_users = result
+    user_sums = user_sums.set_axis(dictionaries['user'].encode(user_sums.index.to_numpy()))
+    location_sums = location_sums.set_axis(dictionaries['location'].encode(location_sums.index.to_numpy()))
+    return user_sums, location_sums, encode_columns(location_users, dictionaries)
+
+
+# {name: table} of the dictionaries for export_tables
+def dictionary_tables(dictionaries):
+    return {'Dictionary_' + col: dictionary.table() for col, dictionary in dictionaries.items()}
@@ -0,0 +1,71 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+LRU cache of built dashboard figures with a memory cap.
+
+Keys are (chart type, sort column, N, location, highlighted user). A figure is built and
+serialized once; the cache keeps the JSON-ready dict, so a hit skips building and
+validating the plotly figure. The dashboard gives every table snapshot its own cache (snapshots.py);
+invalidate() drops the figures of tables reloaded in place.
+With a metrics registry (metrics.py), misses are timed as figure.build and figure.serialize.
+'''
+
+# import modules
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class FigureCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, metrics=None):
+        self.max_bytes = max_bytes
+        self.metrics = metrics
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (figure dict, size of its json)
+        self._lock = threading.Lock()
+
+    # cached figure for key, build() returns a plotly figure and is only called on a miss
+    def get(self, key, build):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        start = time.perf_counter()
+        fig = build()
+        built = time.perf_counter()
+        serialized = fig.to_json()
+        figure = json.loads(serialized)
+        if self.metrics is not None:
+            self.metrics.observe('figure.build', built - start)
+            self.metrics.observe('figure.serialize', time.perf_counter() - built, len(serialized))
+        with self._lock:
+            if key not in self._entries and len(serialized) <= self.max_bytes:
+                self._entries[key] = (figure, len(serialized))
+                self.nbytes += len(serialized)
+                # evict least recently used figures over the memory cap
+                while self.nbytes > self.max_bytes:
+                    _, (_, size) = self._entries.popitem(last=False)
+                    self.nbytes -= size
+        return figure
+
+    # drop every figure, e.g. after the tables reloaded
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    # hit counters and memory use, e.g. for a metrics gauge
+    def stats(self):
+        requests = self.hits + self.misses
+        return {'entries': len(self._entries), 'bytes': self.nbytes, 'hits': self.hits,
+                'misses': self.misses, 'hit_rate': self.hits / requests if requests else 0.0}
+
+    def __len__(self):
+        return len(self._entries)
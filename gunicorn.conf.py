@@ -0,0 +1,38 @@
+# gunicorn settings for the dashboard: gunicorn -c gunicorn.conf.py wsgi:server
+import gc
+import multiprocessing
+import os
+import signal
+
+bind = '0.0.0.0:8050'
+# load the data once in the master, workers are forked from it
+preload_app = True
+workers = multiprocessing.cpu_count()
+# threads per worker, so one slow callback doesn't queue the other users of a worker
+worker_class = 'gthread'
+threads = 4
+timeout = 120
+
+
+# the master reloads newly published table versions (snapshots.py); after a swap it
+# re-forks the workers (SIGHUP: with preload_app the loaded app, now holding the new
+# snapshot, is kept and new workers replace the old ones gracefully), so the workers
+# share the new snapshot copy-on-write instead of each building its own
+def when_ready(server):
+    from Interactive_dashboard import start_refresher
+
+    def refork(snapshot):
+        # collect the old snapshot's cycles, then freeze the new one like wsgi.py does
+        gc.unfreeze()
+        gc.collect()
+        gc.freeze()
+        os.kill(os.getpid(), signal.SIGHUP)
+
+    start_refresher(on_swap=refork)
+
+
+# threads don't survive the fork: every worker watches the published version on its own,
+# to report in the snapshot gauge how far behind it is
+def post_fork(server, worker):
+    from Interactive_dashboard import start_refresher
+    start_refresher(reload=False)
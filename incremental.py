@@ -0,0 +1,197 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Incremental (delta) re-scoring of the user ratings.
+
+The state keeps, for every role, the per-user sufficient statistics of the rating model
+(transaction count, cost sums and error action sums) together with the scaler parameters
+(min/max of each feature, mean/std of the error cost). A new batch of transactions is
+folded into the statistics and only the affected users are re-rated, unless a min/max
+boundary moves, in which case the role is rescaled for everyone.
+
+Min-max scaling of the standardized error cost equals min-max scaling of the raw error
+cost, so the ratings only depend on the feature min/max. The std_err_cost_* columns
+follow the global mean/std and are recomputed whenever a table is built.
+
+The state also remembers every user changed since the full export it was built from.
+write_delta exports their Rating rows as the Rating_delta table of a new version, with
+a file naming that full export as its base. A dashboard reloading the version builds it
+from the base version's tables with the rows patched into Rating and Rating_all
+(apply_delta), so only the delta is downloaded. Each delta holds every change since the
+base, so a dashboard that skipped a delta misses nothing. Only the user ratings are
+updated this way: the location tables, the rating windows, the cube and the what-if
+features keep the base version's values until the next full export (pipeline.py).
+
+Usage:
+    state = RatingState.from_processed(processed_disposals_df_1, processed_locations_df_1,
+                                       processed_receiving_df_1)   # built from export 0412
+    changed_rows = state.update({'disposals': new_disposals_rows})   # Rating rows of the changed users
+    write_delta(state, 's3://dean690-dataset', '0412-1', '0412')
+    publish_version('s3://dean690-dataset', '0412-1')
+    state.save('state')
+'''
+
+# import modules
+import json
+import os
+import numpy as np
+import pandas as pd
+import ingest
+import rating
+from tables import delta_base_file, export_tables, write_text
+
+state_scalers = 'state.scalers.json'
+
+
+def state_sums_file(role):
+    return 'state.' + role + '_sums.csv'
+
+
+# raw feature matrix of a role: action counts and error cost per user
+def raw_features(sums, role):
+    names = [name for _, name, _ in rating.ROLES[role]['actions']]
+    return sums[names + ['err_cost']].to_numpy(dtype=float)
+
+
+# weighted min-max rating of the given rows of a raw feature matrix
+def rate_features(X, lo, hi, role):
+    return ((X - lo) / rating._handle_zeros_in_scale(hi - lo)) @ rating.weights(role)
+
+
+class RatingState:
+    # dropped_user: the locations user the notebook drops (see role_table), default the
+    # first one of the initial sums; changed: users changed since the base export
+    def __init__(self, sums, scalers=None, dropped_user=None, changed=()):
+        # per role: user sums (index user, sorted), rating per user, scaler parameters
+        self.sums = {}
+        self.ratings = {}
+        self.scalers = {}
+        for role in rating.ROLES:
+            self.sums[role] = sums[role].sort_index().astype(float)
+            X = raw_features(self.sums[role], role)
+            self.scalers[role] = self._fit(X, self.sums[role]) if scalers is None else scalers[role]
+            lo, hi = np.array(self.scalers[role]['min']), np.array(self.scalers[role]['max'])
+            self.ratings[role] = pd.Series(rate_features(X, lo, hi, role), index=self.sums[role].index)
+        # kept by id: a new user sorting ahead of it must not be dropped instead
+        if dropped_user is None and len(self.sums['locations']):
+            dropped_user = self.sums['locations'].index[0]
+        self.dropped_user = dropped_user
+        self.changed = set(changed)
+
+    # scaler parameters of a role: feature min/max and error cost mean/std
+    @staticmethod
+    def _fit(X, sums):
+        err = sums['err_cost'].to_numpy(dtype=float)
+        return {'min': X.min(axis=0).tolist() if len(X) else [],
+                'max': X.max(axis=0).tolist() if len(X) else [],
+                'mean': float(err.mean()) if len(err) else 0.0,
+                'std': float(err.std()) if len(err) else 0.0,
+                'n_users': int(len(err))}
+
+    # build the state from the processed_*_df_1 tables
+    @classmethod
+    def from_processed(cls, processed_disposals_df_1, processed_locations_df_1, processed_receiving_df_1):
+        processed = {'disposals': processed_disposals_df_1, 'locations': processed_locations_df_1,
+                     'receiving': processed_receiving_df_1}
+        return cls({role: ingest.partial_sums(processed[role], role, 'user') for role in rating.ROLES})
+
+    # fold per-user partial sums of one role into the state, return the users whose rating changed
+    def fold(self, role, part):
+        sums = self.sums[role]
+        part = part.astype(float)
+        new_users = part.index.difference(sums.index)
+        if len(new_users):
+            sums = pd.concat([sums, pd.DataFrame(0.0, index=new_users, columns=sums.columns)]).sort_index()
+        sums.loc[part.index, part.columns] += part
+        self.sums[role] = sums
+
+        old = self.scalers[role]
+        X = raw_features(sums, role)
+        self.scalers[role] = scalers = self._fit(X, sums)
+        lo, hi = np.array(scalers['min']), np.array(scalers['max'])
+        ratings = self.ratings[role].reindex(sums.index)
+        if scalers['min'] == old['min'] and scalers['max'] == old['max']:
+            # boundaries unchanged: only the affected users are re-rated
+            rows = sums.index.get_indexer(part.index)
+            ratings.iloc[rows] = rate_features(X[rows], lo, hi, role)
+            changed = part.index
+        else:
+            # a boundary moved: rescale the whole role
+            updated = pd.Series(rate_features(X, lo, hi, role), index=sums.index)
+            changed = updated.index[(updated != ratings).to_numpy()].union(part.index)
+            ratings = updated
+        self.ratings[role] = ratings
+        return changed
+
+    # fold a batch of processed_*_df_1 rows ({role: DataFrame}), return the delta of the Rating table
+    def update(self, batch):
+        changed = pd.Index([])
+        for role, processed in batch.items():
+            if len(processed):
+                changed = changed.union(self.fold(role, ingest.partial_sums(processed, role, 'user')))
+        self.changed.update(changed)
+        return self.rating_table(changed)
+
+    # notebook's *_rating_df of a role, for all users or the given users
+    def role_table(self, role, users=None):
+        sums = self.sums[role]
+        if role == 'locations':
+            # the notebook drops the first user of the locations table after modeling (cell 60),
+            # the user that was first when the state was built
+            sums = sums[sums.index != self.dropped_user]
+        if users is not None:
+            sums = sums[sums.index.isin(users)]
+        agg = rating.finish_aggregate(sums, role)
+        scalers = self.scalers[role]
+        table = agg[['user'] + rating.count_columns(role) + ['err_cost_' + role]].copy()
+        table['std_err_cost_' + role] = (table['err_cost_' + role] - scalers['mean']) / \
+            rating._handle_zeros_in_scale(np.array([scalers['std']]))[0]
+        table[role + '_rating'] = self.ratings[role].reindex(sums.index).to_numpy()
+        reference = agg[['org_cost_' + role] + rating.percent_columns(role) + ['err_cost_' + role + '_%']]
+        table = pd.concat([table, reference], axis=1)
+        return table.fillna(0) if role == 'receiving' else table
+
+    # notebook's `Rating` table, for all users or the given users
+    def rating_table(self, users=None):
+        return rating.combine_ratings(*[self.role_table(role, users) for role in rating.ROLES])
+
+    # persist the sufficient statistics and scaler parameters
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for role in rating.ROLES:
+            self.sums[role].to_csv(os.path.join(directory, state_sums_file(role)), index_label='user')
+        with open(os.path.join(directory, state_scalers), 'w') as f:
+            json.dump(dict(self.scalers, dropped_user=self.dropped_user, changed=sorted(self.changed)), f)
+
+    @classmethod
+    def load(cls, directory):
+        sums = {role: pd.read_csv(os.path.join(directory, state_sums_file(role)), index_col='user',
+                                  dtype={'user': str}) for role in rating.ROLES}
+        with open(os.path.join(directory, state_scalers)) as f:
+            scalers = json.load(f)
+        # states saved before the dropped user was kept: the first user, as then
+        dropped_user = scalers.pop('dropped_user', None)
+        changed = [str(user) for user in scalers.pop('changed', [])]
+        return cls(sums, scalers, None if dropped_user is None else str(dropped_user), changed)
+
+
+# export the Rating rows of the users changed since the full export base_version as the
+# Rating_delta table of version, and name base_version in version's delta base file;
+# publish version (tables.publish_version) after it
+def write_delta(state, directory, version, base_version, formats=('csv', 'parquet', 'arrow')):
+    delta = state.rating_table(sorted(state.changed))
+    paths = export_tables({'Rating_delta': delta}, directory, version, formats)
+    paths.append(write_text(directory, delta_base_file(version), base_version + '\n'))
+    return paths
+
+
+# Rating and Rating_all of a full export with the rows of a Rating_delta table patched in:
+# the rows of the changed users are replaced, new users appended, the columns of each
+# table kept
+def apply_delta(rating_df, rating_all, delta):
+    patched = []
+    for table, rows in ((rating_df, delta), (rating_all, rating.build_rating_all(delta))):
+        kept = table[~table['user'].isin(rows['user'])]
+        patched.append(pd.concat([kept, rows[table.columns]], ignore_index=True))
+    return patched
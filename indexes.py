@@ -0,0 +1,145 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+In-memory indexes the dashboard builds at load time.
+
+LocationUserIndex: location -> row offsets into df_user, presorted in df_user order
+(df_user is sorted by total_rating, descending), so selecting a location is a slice
+of the offsets plus a gather of the rows. It also answers "locations of a user".
+It is built from the integer-coded location/user pairs (encoding.py); only the
+requested location string is looked up in the dictionary.
+'''
+
+# import modules
+import numpy as np
+import pandas as pd
+
+
+# compressed location -> user rows and user -> locations mapping
+class LocationUserIndex:
+    # df_location_user: index location, column user, both int codes of `dictionaries`
+    # ({'user': Dictionary, 'location': Dictionary}, see encoding.py); df_user: index user
+    def __init__(self, df_location_user, df_user, dictionaries):
+        # user code -> df_user row, so the pairs map to rows with an integer gather
+        # (the extra last slot maps code -1, an unknown user, to no row)
+        user_codes = dictionaries['user'].encode(df_user.index.to_numpy(), grow=False)
+        row_of_code = np.full(len(dictionaries['user']) + 1, -1, dtype=np.int64)
+        row_of_code[user_codes[user_codes >= 0]] = np.flatnonzero(user_codes >= 0)
+        rows = row_of_code[df_location_user['user'].to_numpy()]
+        keep = rows >= 0  # users without a rating row are not listed
+        codes = df_location_user.index.to_numpy().astype(np.int64)[keep]
+        rows = rows[keep]
+        # location codes are positions in the location dictionary
+        self.locations = dictionaries['location'].values
+        self.users = df_user.index
+        self.n_users = len(df_user)
+        # location -> rows, each location's rows ascending, i.e. in df_user order; the pairs
+        # are unique, so one argsort of a combined (location, row) key orders them (several
+        # times faster than lexsort)
+        order = np.argsort(codes * (self.n_users + 1) + rows)
+        self.location_rows = rows[order]
+        self.location_ptr = np.searchsorted(codes[order], np.arange(len(self.locations) + 1))
+        # row -> location codes
+        order = np.argsort(rows * (len(self.locations) + 1) + codes)
+        self.user_locations = codes[order]
+        self.user_ptr = np.searchsorted(rows[order], np.arange(self.n_users + 1))
+
+    # position of a location, -1 if unknown
+    def location_code(self, location):
+        try:
+            return self.locations.get_loc(str(location))
+        except (KeyError, TypeError):
+            return -1
+
+    # df_user row offsets of a location's users, in df_user order
+    def rows(self, location):
+        code = self.location_code(location)
+        if code < 0:
+            return self.location_rows[:0]
+        return self.location_rows[self.location_ptr[code]:self.location_ptr[code + 1]]
+
+    # locations of the user at a df_user row offset
+    def locations_of_row(self, row):
+        return self.locations[self.user_locations[self.user_ptr[row]:self.user_ptr[row + 1]]]
+
+    # locations of a user
+    def locations_of(self, user):
+        try:
+            return self.locations_of_row(self.users.get_loc(user))
+        except KeyError:
+            return self.locations[:0]
+
+
+# per-column descending orders of a table, for top-K, bottom-K and rank queries
+# ties keep table order (like nlargest); positions are row offsets into the table
+class RankingIndex:
+    # df: one row per key (the index), columns: the columns to rank
+    def __init__(self, df, columns):
+        self.keys = df.index
+        positions = np.arange(len(df))
+        self._values, self._order, self._rank, self._sorted = {}, {}, {}, {}
+        for col in columns:
+            values = df[col].to_numpy(dtype=np.float64, copy=True)
+            order = np.lexsort((positions, -values))
+            rank = np.empty(len(order), dtype=np.int64)
+            rank[order] = positions
+            self._values[col], self._order[col], self._rank[col] = values, order, rank
+            self._sorted[col] = -values[order]  # ascending, for searchsorted
+
+    def __len__(self):
+        return len(self.keys)
+
+    # row offsets of the k largest values, descending (all rows if k is None)
+    def top(self, col, k=None):
+        return self._order[col][:k]
+
+    # row offsets of the k smallest values, still in descending order like sort_values().tail(k)
+    def bottom(self, col, k):
+        order = self._order[col]
+        return order[max(len(order) - k, 0):]
+
+    # 1-based rank of a key in a column, 1 = largest
+    def rank(self, col, key):
+        return int(self._rank[col][self.keys.get_loc(key)]) + 1
+
+    # 1-based ranks of the rows at offsets `rows` in a column
+    def ranks(self, col, rows):
+        return self._rank[col][rows] + 1
+
+    # set new values ({col: value}) of a key in place, an unknown key is appended
+    def update(self, key, values):
+        try:
+            pos = self.keys.get_loc(key)
+        except KeyError:
+            pos = self._append(key)
+        for col, value in values.items():
+            self._move(col, pos, float(value))
+
+    # bottom-ranked placeholder row for a new key, its values are set by update
+    def _append(self, key):
+        pos = len(self.keys)
+        self.keys = self.keys.append(pd.Index([key]))
+        for col in self._values:
+            self._values[col] = np.append(self._values[col], -np.inf)
+            self._order[col] = np.append(self._order[col], pos)
+            self._rank[col] = np.append(self._rank[col], pos)
+            self._sorted[col] = np.append(self._sorted[col], np.inf)
+        return pos
+
+    # move row pos of a column to the place of its new value
+    def _move(self, col, pos, value):
+        values, rank = self._values[col], self._rank[col]
+        old = rank[pos]
+        order = np.delete(self._order[col], old)
+        negated = np.delete(self._sorted[col], old)
+        values[pos] = value
+        # equal values are ordered by row offset
+        lo = np.searchsorted(negated, -value, 'left')
+        hi = np.searchsorted(negated, -value, 'right')
+        new = lo + np.searchsorted(order[lo:hi], pos)
+        order = np.insert(order, new, pos)
+        self._sorted[col] = np.insert(negated, new, -value)
+        start, stop = min(old, new), max(old, new) + 1
+        rank[order[start:stop]] = np.arange(start, stop)
+        self._order[col] = order
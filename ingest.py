@@ -0,0 +1,288 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Streaming ingest of the raw gmu_training_* extracts.
+
+Each file is read in chunks with every column typed as string, cleaned in a single pass
+with the notebook's rules, and folded into per-user and per-location partial sums.
+Peak memory depends on the number of users and locations, not on the number of
+transactions. Duplicate removal (dedupe=True, the notebook's drop_duplicates) remembers
+an 8-byte hash per distinct row, so it is bounded by partitions: an extract of up to
+partition_bytes is deduped while it streams, a larger one is cleaned into spill files by
+row hash first (equal rows land in the same partition) and each partition is deduped and
+folded on its own, holding only that partition's hashes.
+
+Usage:
+    user_sums, location_sums, location_users = ingest_role('gmu_training_disposals.csv', 'disposals')
+    disposals_rating_df = rate_user_sums(user_sums, 'disposals')
+'''
+
+# import modules
+import math
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import rating
+from encoding import encode_columns
+
+# rows per chunk
+chunksize = 500000
+# input bytes per dedupe partition: the distinct row hashes of one partition are held in memory
+partition_bytes = 256 * 1024 * 1024
+# processed rows buffered in memory before they are written to the dedupe spill files
+spill_rows = 1000000
+# year of transactions without a valid date
+UNKNOWN_YEAR = -1
+
+# raw extract of each role
+# columns: raw column -> processed column of the notebook's processed_*_df_1 table
+# date: (raw column, format, length of the date prefix) of the transaction date
+SOURCES = {
+    'disposals': {
+        'file': 'gmu_training_disposals.csv',
+        'columns': {'BUSINESS_UNIT': 'location', 'LAST_USER_TO_COMMENT': 'user', 'SCAN_TYPE': 'scan_type_pfm',
+                    'ON_DS132': 'disp_doc', 'COST': 'ori_cost'},
+        'dates': ['EXPECTED_RETIREMENT_DATE_REC', 'RETIREMENT_DATE'],
+        'date': ('RETIREMENT_DATE', '%Y-%m-%d', 10),
+    },
+    'locations': {
+        'file': 'gmu_training_locations.csv',
+        'columns': {'BUSINESS_UNIT': 'location', 'ENTERED_BY': 'user', 'VALID_DS584_FLAG': 'val_ds584_flag',
+                    'COST': 'ori_cost'},
+        'dates': [],
+        # e.g. 'Thu Jun 13 2019 00:00:00 GMT-0400 (EDT)'
+        'date': ('LOCATION_DATE', '%a %b %d %Y', 15),
+    },
+    'receiving': {
+        'file': 'gmu_training_receiving_2.csv',
+        'columns': {'BUSINESS_UNIT': 'location', 'OPRID': 'user', 'MISCLASSIFIED_FAP': 'misclf_pfm',
+                    'CREATION_METHOD': 'cre_mthod_pfm', 'COST': 'ori_cost'},
+        'dates': [],
+        # e.g. '27.09.2019'
+        'date': ('ACQUISITION_DT', '%d.%m.%Y', 10),
+    },
+}
+
+# value mappings of the cleaning rules
+SCAN_TYPE_MAP = {'Invalid': 1, 'Discovered': 0.5, 'Scan Transfer': 0.5, 'Manual': 0.5, 'Scanned': 0}
+ON_DS132_MAP = {'Yes': 0, 'No': 1}
+MISCLASSIFIED_FAP_MAP = {'Should be FAP based on Asset Class': 1,
+                         'Should not be FAP based on Asset Class': 1,
+                         'FAP not in Approved Location': 1}
+CREATION_METHOD_MAP = {'AM Page': 1, 'Manual Creation': 1, 'PI Add': 1, 'Purch. Req': 0}
+
+
+# map known labels, keep values that are already numeric
+def map_values(s, mapping):
+    return s.map(mapping).fillna(pd.to_numeric(s, errors='coerce'))
+
+
+# remove symbol in cost column and convert to float
+def clean_cost(s):
+    return pd.to_numeric(s.astype(str).str.replace(r"[#,@&\-']", '', regex=True), errors='coerce')
+
+
+# ret_pfm: 1 if the asset was retired before the expected retirement year, else 0
+def ret_pfm(expected, actual):
+    expected = pd.to_datetime(expected, errors='coerce')
+    actual = pd.to_datetime(actual, errors='coerce')
+    late = (expected - actual).dt.days > 0
+    return (late & (expected.dt.year != actual.dt.year)).astype(int)
+
+
+# transaction date of each raw row of a role, NaT if missing or malformed
+def transaction_dates(raw, role):
+    col, fmt, length = SOURCES[role]['date']
+    s = raw[col]
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s
+    # dates repeat a lot, parse each distinct string once
+    codes, uniques = pd.factorize(s)
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=object).astype(str).str[:length], format=fmt, errors='coerce')
+    # missing values have code -1, which picks the NaT appended last (also when every value
+    # of the chunk is missing and there are no uniques)
+    dates = np.append(parsed.to_numpy(dtype='datetime64[ns]'), np.datetime64('NaT', 'ns'))[codes]
+    return pd.Series(dates, index=s.index)
+
+
+# transaction year of each raw row of a role, UNKNOWN_YEAR if the date is missing
+def transaction_years(raw, role):
+    return dates_years(transaction_dates(raw, role))
+
+
+# year of each transaction date, UNKNOWN_YEAR if NaT
+def dates_years(dates):
+    return dates.dt.year.fillna(UNKNOWN_YEAR).astype(int)
+
+
+# apply the notebook's cleaning rules to a raw chunk, return the processed_*_df_1 rows
+def clean_chunk(raw, role):
+    source = SOURCES[role]
+    df = raw[list(source['columns'])].rename(columns=source['columns'])
+    df[['location', 'user']] = df[['location', 'user']].fillna('0')
+    if role == 'disposals':
+        df['scan_type_pfm'] = map_values(df['scan_type_pfm'].fillna('Invalid'), SCAN_TYPE_MAP)
+        df.insert(3, 'ret_date_pfm', ret_pfm(raw['EXPECTED_RETIREMENT_DATE_REC'], raw['RETIREMENT_DATE']))
+        df['disp_doc'] = map_values(df['disp_doc'], ON_DS132_MAP)
+        errors = (df['scan_type_pfm'] > 0) | (df['ret_date_pfm'] > 0) | (df['disp_doc'] > 0)
+    elif role == 'locations':
+        df['val_ds584_flag'] = (pd.to_numeric(df['val_ds584_flag'], errors='coerce') == 0).astype(int)
+        errors = df['val_ds584_flag'] > 0
+    else:
+        df['misclf_pfm'] = map_values(df['misclf_pfm'].fillna(0), MISCLASSIFIED_FAP_MAP)
+        df['cre_mthod_pfm'] = map_values(df['cre_mthod_pfm'], CREATION_METHOD_MAP)
+        errors = (df['misclf_pfm'] > 0) | (df['cre_mthod_pfm'] > 0)
+    df['ori_cost'] = clean_cost(df['ori_cost'])
+    # filter the error cost
+    df['err_cost'] = df['ori_cost'].where(errors)
+    return df.fillna(0)
+
+
+# per-key partial sums of a processed chunk: n, org_cost, err_cost and one column per action
+def partial_sums(processed, role, key):
+    actions = rating.ROLES[role]['actions']
+    return processed.groupby(key).agg(
+        n=('ori_cost', 'size'),
+        org_cost=('ori_cost', 'sum'),
+        err_cost=('err_cost', 'sum'),
+        **{name: (col, 'sum') for col, name, _ in actions})
+
+
+# fold two partial sums tables together
+def merge_sums(acc, part):
+    if acc is None:
+        return part
+    return pd.concat([acc, part]).groupby(level=0).sum()
+
+
+# row hashes seen so far, as sorted runs that at least double in size from the newest to the
+# oldest (like a log-structured merge tree): a chunk's hashes become a new run, merged with
+# the newer runs no larger than it, so each hash is merged O(log chunks) times and a lookup
+# bisects O(log chunks) runs, instead of re-sorting everything seen for every chunk
+class SeenRows:
+    def __init__(self):
+        self.runs = []
+
+    def __len__(self):
+        return sum(len(run) for run in self.runs)
+
+    # mask of the hashes not seen before (and first within `hashes`); remembers them
+    def add(self, hashes):
+        # the lookups bisect with the hashes sorted, which walks the runs in order
+        order = np.argsort(hashes, kind='stable')
+        ordered = hashes[order]
+        new = np.ones(len(hashes), dtype=bool)
+        new[1:] = ordered[1:] != ordered[:-1]  # first of equal hashes, in row order
+        for run in self.runs:
+            pos = np.minimum(np.searchsorted(run, ordered), len(run) - 1)
+            new &= run[pos] != ordered
+        keep = np.empty(len(hashes), dtype=bool)
+        keep[order] = new
+        run = ordered[new]
+        while self.runs and len(self.runs[-1]) <= 2 * len(run):
+            # two sorted runs: the stable sort (timsort) merges them in linear time
+            run = np.sort(np.concatenate([self.runs.pop(), run]), kind='stable')
+        if len(run):
+            self.runs.append(run)
+        return keep
+
+
+# processed rows of an extract in chunks, each with the transaction dates of its rows
+# (None unless dates); dedupe: only the first of equal raw rows, deduped in partitions of
+# at most partition_bytes of input (spilled to spill_dir, default a temporary directory)
+def processed_chunks(path, role, dedupe=True, usecols=None, chunksize=chunksize, dates=False, spill_dir=None):
+    chunks = pd.read_csv(path, dtype=str, usecols=usecols, chunksize=chunksize)
+    n_partitions = math.ceil(os.path.getsize(path) / partition_bytes) if dedupe else 1
+    if n_partitions <= 1:
+        seen = SeenRows()
+        for raw in chunks:
+            if dedupe:
+                raw = raw[seen.add(pd.util.hash_pandas_object(raw, index=False).to_numpy())]
+            yield clean_chunk(raw, role), transaction_dates(raw, role) if dates else None
+        return
+    own_dir = spill_dir is None
+    spill_dir = tempfile.mkdtemp(prefix='dedupe.') if own_dir else spill_dir
+    os.makedirs(spill_dir, exist_ok=True)
+    try:
+        files = {}
+        buffers = {}
+        buffered = 0
+
+        def flush():
+            for part, rows in buffers.items():
+                file = os.path.join(spill_dir, '{}.{}.{}.arrow'.format(role, part, len(files.get(part, []))))
+                pd.concat(rows, ignore_index=True).to_feather(file, compression='uncompressed')
+                files.setdefault(part, []).append(file)
+            buffers.clear()
+
+        for raw in chunks:
+            processed = clean_chunk(raw, role)
+            processed['row_hash'] = pd.util.hash_pandas_object(raw, index=False).to_numpy()
+            if dates:
+                processed['date'] = transaction_dates(raw, role).to_numpy()
+            for part, rows in processed.groupby(processed['row_hash'].to_numpy() % n_partitions):
+                buffers.setdefault(part, []).append(rows)
+            buffered += len(processed)
+            if buffered >= spill_rows:
+                flush()
+                buffered = 0
+        flush()
+        # equal rows have equal hashes, so each partition is deduped on its own
+        for part in sorted(files):
+            seen = SeenRows()
+            for file in files[part]:
+                rows = pd.read_feather(file)
+                rows = rows[seen.add(rows.pop('row_hash').to_numpy())]
+                yield rows, rows.pop('date') if dates else None
+    finally:
+        if own_dir:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+
+
+# stream one raw extract and accumulate its per-user and per-location sums
+# dedupe: remove duplicate rows like the notebook's drop_duplicates (reads every column,
+# memory bounded by partition_bytes of input, see processed_chunks)
+# processed_path: also write the cleaned processed_*_df_1 rows to this csv (in partition
+# order when the dedupe spills)
+# cube: also add the rows to an aggregate cube (cube.AggregateCube)
+# windows: also add the rows to the per-user sums of the time windows (windows.WindowedSums)
+# dictionaries: encode user/location as int codes right after cleaning ({'user': Dictionary,
+# 'location': Dictionary}, see encoding.py), so the sums, pairs and processed rows are keyed
+# by codes (the cube keeps the strings)
+# spill_dir: directory of the dedupe spill files (default a temporary directory, removed)
+def ingest_role(path, role, dedupe=True, processed_path=None, chunksize=chunksize, cube=None,
+                dictionaries=None, spill_dir=None, windows=None):
+    source = SOURCES[role]
+    usecols = None if dedupe else list(source['columns']) + source['dates']
+    dated = cube is not None or windows is not None
+    if usecols is not None and dated and source['date'][0] not in usecols:
+        usecols.append(source['date'][0])
+    user_sums = location_sums = None
+    location_users = []
+    chunks = processed_chunks(path, role, dedupe, usecols, chunksize, dated, spill_dir)
+    for i, (processed, dates) in enumerate(chunks):
+        if cube is not None:
+            cube.add(processed, role, dates_years(dates))
+        if windows is not None:
+            windows.add(processed, role, dates)
+        if dictionaries is not None:
+            processed = encode_columns(processed, dictionaries)
+        user_sums = merge_sums(user_sums, partial_sums(processed, role, 'user'))
+        location_sums = merge_sums(location_sums, partial_sums(processed, role, 'location'))
+        location_users.append(processed[['location', 'user']].drop_duplicates())
+        if len(location_users) > 16:
+            location_users = [pd.concat(location_users).drop_duplicates()]
+        if processed_path is not None:
+            processed.to_csv(processed_path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+    if user_sums is None:
+        raise ValueError('no rows in ' + str(path))
+    location_users = pd.concat(location_users).drop_duplicates(ignore_index=True)
+    return user_sums, location_sums, location_users
+
+
+# standardize, normalize and weight the accumulated user sums of a role (notebook's *_rating_df)
+def rate_user_sums(user_sums, role, dropped_user=None):
+    return rating.model_role(rating.finish_aggregate(user_sums.sort_index(), role), role, dropped_user)
@@ -0,0 +1,207 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Loader for the dashboard's input tables.
+
+All tables are fetched concurrently. The S3 backend shares one boto3 client across the
+threads and keeps an on-disk cache keyed by ETag/Last-Modified: an object is downloaded
+only when it changed (a HEAD request checks it), and a cache entry this process validated
+less than `cache_max_age` seconds ago is used without any network I/O. A new process
+validates every entry once, so a restart after a publish never serves stale tables.
+Downloads go to a unique temporary file in the cache directory, which replaces the cached
+copy only once its size (and for single-part uploads its MD5 ETag) checks out, so
+processes refreshing the same object at once never mix their downloads. The S3 backend
+also works against an S3-compatible stand-in such as MinIO (endpoint_url). The local
+backend reads files from a directory. Both raise FileNotFoundError for a missing object;
+any other error (access denied, network, a corrupt file) is raised as it is.
+published_version reads the published export version (tables.publish_version) without
+any cache, it is polled to find new exports; delta_base reads the full export a delta
+export applies to.
+
+Usage:
+    backend = S3Backend('dean690-dataset')   # or LocalBackend('data')
+    data = load_tables(backend, {'user': ('table.Rating.0412.csv', ['user', 'total_rating'])})
+'''
+
+# import modules
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from tables import delta_base_file, read_table, version_file
+
+# seconds a cache entry validated by this process is trusted without asking S3 again
+cache_max_age = 3600
+
+# error codes of the S3 API for a missing object (GetObject, HeadObject)
+not_found_codes = ('NoSuchKey', '404', 'NotFound')
+
+
+# tables stored in a local directory
+class LocalBackend:
+    def __init__(self, directory):
+        self.directory = directory
+
+    # local path of a table, parquet files are memory-mapped when read from a path
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+    # version of a table, changes whenever the file is rewritten
+    def version(self, key):
+        st = os.stat(self.path(key))
+        return str(st.st_mtime_ns) + '-' + str(st.st_size)
+
+    def read(self, key, columns=None):
+        return read_table(self.path(key), key, columns)
+
+    # content of a small text file, read every time
+    def read_text(self, key):
+        with open(self.path(key)) as f:
+            return f.read()
+
+
+# tables stored in an s3 bucket, cached on local disk
+class S3Backend:
+    def __init__(self, bucket, cache_dir='.cache', endpoint_url=None, client=None):
+        self.bucket = bucket
+        self.cache_dir = cache_dir
+        if client is None:
+            import boto3
+            client = boto3.client('s3', endpoint_url=endpoint_url)
+        # boto3 clients are thread safe, one client serves every download
+        self.client = client
+        # key -> time.monotonic() this process last validated its cache entry (kept in
+        # memory only, another process validates for itself)
+        self._checked = {}
+
+    # call a client method on an object, a missing object raises FileNotFoundError
+    def _call(self, method, key):
+        try:
+            return getattr(self.client, method)(Bucket=self.bucket, Key=key)
+        except Exception as e:
+            response = getattr(e, 'response', None)
+            if isinstance(response, dict) and response.get('Error', {}).get('Code') in not_found_codes:
+                raise FileNotFoundError(key) from e
+            raise
+
+    def _meta_path(self, key):
+        return os.path.join(self.cache_dir, key + '.meta.json')
+
+    def _read_meta(self, key):
+        try:
+            with open(self._meta_path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    # write a file through a unique temporary file in the cache directory, then rename it
+    # into place; write(f) fills the temporary file (opened in binary mode)
+    def _replace(self, path, write):
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix='.' + os.path.basename(path) + '.')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def _write_meta(self, key, meta):
+        self._replace(self._meta_path(key), lambda f: f.write(json.dumps(meta).encode()))
+
+    # download an object into f; raises IOError if it arrived incomplete or corrupted
+    def _download(self, obj, key, f):
+        size = 0
+        md5 = hashlib.md5()
+        for chunk in obj['Body'].iter_chunks(1 << 20):
+            f.write(chunk)
+            md5.update(chunk)
+            size += len(chunk)
+        if 'ContentLength' in obj and size != obj['ContentLength']:
+            raise IOError('{}: got {} of {} bytes'.format(key, size, obj['ContentLength']))
+        # the ETag of a single-part upload is the MD5 of the object, multipart ETags have a '-'
+        etag = obj['ETag'].strip('"')
+        if '-' not in etag and etag != md5.hexdigest():
+            raise IOError(key + ': content does not match its ETag')
+
+    # make sure the cached copy of a table is current, return its local path
+    def path(self, key):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = os.path.join(self.cache_dir, key)
+        meta = self._read_meta(key)
+        if meta is not None and os.path.exists(path):
+            checked = self._checked.get(key)
+            if checked is not None and time.monotonic() - checked < cache_max_age:
+                return path
+            head = self._call('head_object', key)
+            if head['ETag'] == meta['etag'] and str(head['LastModified']) == meta['last_modified']:
+                self._checked[key] = time.monotonic()
+                return path
+        obj = self._call('get_object', key)
+        self._replace(path, lambda f: self._download(obj, key, f))
+        self._write_meta(key, {'etag': obj['ETag'], 'last_modified': str(obj['LastModified'])})
+        self._checked[key] = time.monotonic()
+        return path
+
+    # version of a table as seen by the cache
+    def version(self, key):
+        self.path(key)
+        meta = self._read_meta(key)
+        return meta['etag'] + '-' + meta['last_modified']
+
+    def read(self, key, columns=None):
+        return read_table(self.path(key), key, columns)
+
+    # content of a small text file, fetched every time (bypasses the cache)
+    def read_text(self, key):
+        return self._call('get_object', key)['Body'].read().decode()
+
+
+# published export version, None when nothing is published
+def published_version(backend):
+    try:
+        version = backend.read_text(version_file).strip()
+    except FileNotFoundError:
+        return None
+    return version or None
+
+
+# full export version a delta export applies to (incremental.write_delta), None for a
+# full export
+def delta_base(backend, version):
+    try:
+        base = backend.read_text(delta_base_file(version)).strip()
+    except FileNotFoundError:
+        return None
+    return base or None
+
+
+# read one table, timed as load.<name> (bytes: memory of the DataFrame) when metrics are given
+def _timed_read(backend, name, key, columns, metrics):
+    start = time.perf_counter()
+    df = backend.read(key, columns)
+    if metrics is not None:
+        metrics.observe('load.' + name, time.perf_counter() - start,
+                        int(df.memory_usage(index=True, deep=True).sum()))
+    return df
+
+
+# load tables concurrently, requests: {name: (key, columns)}, returns {name: DataFrame}
+# optional: names of tables that may be missing, they are returned as None (other errors
+# are raised like those of any table)
+def load_tables(backend, requests, max_workers=None, metrics=None, optional=()):
+    with ThreadPoolExecutor(max_workers=max_workers or len(requests)) as pool:
+        futures = {name: pool.submit(_timed_read, backend, name, key, columns, metrics)
+                   for name, (key, columns) in requests.items()}
+        tables = {}
+        for name, future in futures.items():
+            try:
+                tables[name] = future.result()
+            except FileNotFoundError:
+                if name not in optional:
+                    raise
+                tables[name] = None
+        return tables
@@ -0,0 +1,209 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Instrumentation of the dashboard's hot paths.
+
+- Metrics: latency histograms and payload sizes per name (one name per callback, table
+  load and figure stage), plus gauges such as the figure cache hit rate
+- instrument_dash: times every callback request of a Dash app, logs one JSON line per
+  request (logger 'dashboard.metrics') and serves the metrics at /metrics (local only)
+- SamplingProfiler: opt-in sampling of every thread's stack, returned as folded stacks
+  (flamegraph.pl / speedscope input), served at /metrics/profile?seconds=10
+
+Usage:
+    metrics = Metrics()
+    with metrics.timer('load.user'):
+        ...
+    metrics.gauge('figure_cache', lambda: {'hits': figure_cache.hits})
+    instrument_dash(app, metrics, profiling=True)
+'''
+
+# import modules
+import bisect
+import json
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+logger = logging.getLogger('dashboard.metrics')
+
+# histogram bucket upper bounds in milliseconds
+latency_buckets = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, float('inf')]
+
+# remote addresses allowed to read /metrics
+local_addresses = ('127.0.0.1', '::1', 'localhost')
+# bounds of the duration of a /metrics/profile request, in seconds
+profile_seconds = (0.1, 120)
+
+
+# latency histogram and payload size totals of one name
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(latency_buckets)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.total_bytes = 0
+        self.max_bytes = 0
+
+    def observe(self, ms, nbytes=None):
+        self.counts[bisect.bisect_left(latency_buckets, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        if nbytes is not None:
+            self.total_bytes += nbytes
+            self.max_bytes = max(self.max_bytes, nbytes)
+
+    # upper bound of the bucket holding quantile q
+    def quantile(self, q):
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(latency_buckets, self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(bound, self.max_ms)
+        return 0.0
+
+    def summary(self):
+        return {'count': self.count,
+                'mean_ms': self.total_ms / self.count if self.count else 0.0,
+                'p50_ms': self.quantile(0.5), 'p95_ms': self.quantile(0.95), 'p99_ms': self.quantile(0.99),
+                'max_ms': self.max_ms,
+                'mean_bytes': self.total_bytes / self.count if self.count else 0,
+                'max_bytes': self.max_bytes,
+                'buckets_ms': {str(b): c for b, c in zip(latency_buckets, self.counts) if c}}
+
+
+# thread-safe registry of histograms and gauges
+class Metrics:
+    def __init__(self):
+        self.started_at = time.time()
+        self._histograms = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds, nbytes=None):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(seconds * 1000, nbytes)
+
+    # time a block of code under name
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    # value() is called on every snapshot, e.g. the hit counters of a cache
+    def gauge(self, name, value):
+        self._gauges[name] = value
+
+    def snapshot(self):
+        with self._lock:
+            histograms = {name: h.summary() for name, h in sorted(self._histograms.items())}
+        return {'uptime_s': time.time() - self.started_at, 'latency': histograms,
+                'gauges': {name: value() for name, value in self._gauges.items()}}
+
+
+# samples the stacks of all threads, result in folded format: "a;b;c <count>" per line
+class SamplingProfiler:
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(code.co_name + ' (' + code.co_filename + ':' + str(code.co_firstlineno) + ')')
+                    frame = frame.f_back
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return '\n'.join(stack + ' ' + str(count) for stack, count in self.samples.most_common())
+
+
+# name of the callback answering a dash update request
+def callback_name(app, output):
+    callback = app.callback_map.get(output, {}).get('callback')
+    return getattr(callback, '__name__', output)
+
+
+# time every callback request of a dash app and serve the metrics of the server
+def instrument_dash(app, metrics, profiling=False):
+    from flask import Response, abort, g, request
+    server = app.server
+    profile_lock = threading.Lock()
+
+    @server.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @server.after_request
+    def record_request(response):
+        start = getattr(g, 'metrics_start', None)
+        if start is None or request.path != app.config.requests_pathname_prefix + '_dash-update-component':
+            return response
+        seconds = time.perf_counter() - start
+        body = request.get_json(silent=True) or {}
+        name = 'callback.' + callback_name(app, body.get('output', ''))
+        nbytes = response.calculate_content_length()
+        metrics.observe(name, seconds, nbytes)
+        logger.info(json.dumps({'event': 'callback', 'name': name, 'ms': round(seconds * 1000, 3),
+                                'bytes': nbytes, 'request_bytes': request.content_length,
+                                'status': response.status_code}))
+        return response
+
+    def local_only():
+        if request.remote_addr not in local_addresses:
+            abort(404)
+
+    @server.route('/metrics')
+    def metrics_endpoint():
+        local_only()
+        return Response(json.dumps(metrics.snapshot(), indent=1), mimetype='application/json')
+
+    @server.route('/metrics/profile')
+    def profile_endpoint():
+        local_only()
+        if not profiling:
+            abort(404)
+        try:
+            seconds = float(request.args.get('seconds', 10))
+        except ValueError:
+            return Response('seconds must be a number\n', status=400, mimetype='text/plain')
+        if seconds != seconds:  # nan
+            return Response('seconds must be a number\n', status=400, mimetype='text/plain')
+        seconds = min(max(seconds, profile_seconds[0]), profile_seconds[1])
+        # one profile at a time, a second request waits for the first
+        with profile_lock:
+            profiler = SamplingProfiler()
+            profiler.start()
+            time.sleep(seconds)
+            folded = profiler.stop()
+        return Response(folded, mimetype='text/plain')
+
+    return metrics
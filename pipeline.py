@@ -0,0 +1,176 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Parallel rating pipeline: the three roles are independent until Rating is built, so their
+work runs concurrently in a process pool.
+
+- map: each extract is split into byte ranges of whole lines; a task reads its range,
+  cleans it (ingest.clean_chunk), splits the rows into shards by hash of user and writes
+  each shard's rows to a file in the spill directory; only the file paths go back
+- reduce: one task per (role, shard) streams the shard's files, removes duplicate rows
+  and sums per user and per location; duplicate rows have the same user, so they always
+  meet in the same shard
+- the disjoint per-user shards are concatenated, the per-location sums merged, and the
+  roles rated and joined into Rating in the parent
+
+Rows cross process boundaries only as files, and the parent never holds them: its memory
+is the per-user and per-location sums.
+
+The extracts must not contain quoted line breaks (the byte ranges split on newlines).
+
+Usage:
+    results = run_pipeline('data', workers=32)
+    Rating, Rating_all, Location_Rating = build_tables(results)
+    export_tables(output_tables(results), 'out', '0412')
+    python pipeline.py data out 0412
+'''
+
+# import modules
+import io
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import ingest
+import rating
+from encoding import dictionary_tables, encode_result, new_dictionaries
+from tables import export_tables
+
+# bytes of an extract one map task reads
+range_bytes = 64 * 1024 * 1024
+
+
+# shard of each user, stable across processes and runs
+def user_shards(users, n_shards):
+    return (pd.util.hash_array(np.asarray(users, dtype=object)) % n_shards).astype(np.int64)
+
+
+# split a csv file into byte ranges that start and end on line boundaries, skips the header
+def line_ranges(path, size=range_bytes):
+    with open(path, 'rb') as f:
+        f.readline()
+        bounds = [f.tell()]
+        end = os.fstat(f.fileno()).st_size
+        while bounds[-1] < end:
+            f.seek(min(bounds[-1] + size, end))
+            if f.tell() < end:
+                f.readline()
+            bounds.append(f.tell())
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+# map task: clean the rows of a byte range and write them, with their row hash, to one file
+# per shard in spill_dir, returns {shard: path}
+def map_range(path, role, start, end, n_shards, spill_dir):
+    with open(path, 'rb') as f:
+        header = f.readline()
+        f.seek(start)
+        data = f.read(end - start)
+    parts = {}
+    for raw in pd.read_csv(io.BytesIO(header + data), dtype=str, chunksize=ingest.chunksize):
+        processed = ingest.clean_chunk(raw, role)
+        processed['row_hash'] = pd.util.hash_pandas_object(raw, index=False).to_numpy()
+        processed = processed[~processed['row_hash'].duplicated().to_numpy()]
+        for shard, rows in processed.groupby(user_shards(processed['user'], n_shards)):
+            parts.setdefault(shard, []).append(rows)
+    paths = {}
+    for shard, rows in parts.items():
+        paths[shard] = os.path.join(spill_dir, '{}.{}.{}.arrow'.format(role, shard, start))
+        pd.concat(rows, ignore_index=True).to_feather(paths[shard], compression='uncompressed')
+    return paths
+
+
+# reduce task: sums of one shard's files (written by map_range or spill.spill_role), one
+# file at a time, returns (user_sums, location_sums, location_users)
+def reduce_shard(role, files):
+    user_sums = location_sums = None
+    location_users = []
+    seen = ingest.SeenRows()
+    for path in files:
+        processed = pd.read_feather(path)
+        processed = processed[seen.add(processed['row_hash'].to_numpy())]
+        user_sums = ingest.merge_sums(user_sums, ingest.partial_sums(processed, role, 'user'))
+        location_sums = ingest.merge_sums(location_sums, ingest.partial_sums(processed, role, 'location'))
+        location_users.append(processed[['location', 'user']].drop_duplicates())
+    return user_sums, location_sums, pd.concat(location_users).drop_duplicates()
+
+
+# run the pipeline over the extracts in a directory (or {role: path})
+# returns {role: (user_sums, location_sums, location_users)} like ingest.ingest_role
+# dictionaries: encode the results with these (codes are assigned in the parent, so they
+# are stable whatever the worker order)
+# spill_dir: directory of the shard files (default a temporary directory, removed at the end)
+def run_pipeline(paths, workers=None, n_shards=None, size=range_bytes, dictionaries=None, spill_dir=None):
+    if isinstance(paths, str):
+        paths = {role: os.path.join(paths, source['file']) for role, source in ingest.SOURCES.items()}
+    workers = workers or os.cpu_count()
+    n_shards = n_shards or workers
+    own_dir = spill_dir is None
+    spill_dir = tempfile.mkdtemp(prefix='shards.') if own_dir else spill_dir
+    os.makedirs(spill_dir, exist_ok=True)
+    results = {}
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # every range of every role is queued at once, so the roles overlap
+            maps = {role: [pool.submit(map_range, path, role, start, end, n_shards, spill_dir)
+                           for start, end in line_ranges(path, size)]
+                    for role, path in paths.items()}
+            reduces = {}
+            for role, futures in maps.items():
+                shards = {}
+                for future in futures:
+                    for shard, file in future.result().items():
+                        shards.setdefault(shard, []).append(file)
+                if not shards:
+                    raise ValueError('no rows in ' + str(paths[role]))
+                reduces[role] = [pool.submit(reduce_shard, role, files) for files in shards.values()]
+            for role, futures in reduces.items():
+                parts = [future.result() for future in futures]
+                user_sums = pd.concat([part[0] for part in parts])
+                location_sums = pd.concat([part[1] for part in parts]).groupby(level=0).sum()
+                location_users = pd.concat([part[2] for part in parts]).drop_duplicates(ignore_index=True)
+                results[role] = (user_sums, location_sums, location_users)
+                if dictionaries is not None:
+                    results[role] = encode_result(results[role], dictionaries)
+    finally:
+        if own_dir:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+    return results
+
+
+# the notebook's Rating, Rating_all and Location_Rating tables from the pipeline results
+# dictionaries: the results are encoded with these; users are rated by name (the notebook's
+# user order matters), the location/user pairs are joined and grouped on the codes
+def build_tables(results, dictionaries=None):
+    user_sums = {role: results[role][0] for role in rating.ROLES}
+    if dictionaries is not None:
+        user_sums = {role: sums.set_axis(dictionaries['user'].decode(sums.index.to_numpy()))
+                     for role, sums in user_sums.items()}
+    role_ratings = {role: ingest.rate_user_sums(user_sums[role], role) for role in rating.ROLES}
+    rating_df = rating.combine_ratings(*role_ratings.values())
+    location_rating = rating.location_rollup({role: results[role][2] for role in rating.ROLES}, role_ratings,
+                                             dictionaries)
+    return rating_df, rating.build_rating_all(rating_df), location_rating
+
+
+# the tables the dashboard reads from the pipeline results, {name: table} for
+# tables.export_tables: Rating, Rating_all, Location_Rating, the location/user pairs of the
+# processed_*_df_1 tables and, when encoded, the Dictionary_* tables
+def output_tables(results, dictionaries=None):
+    rating_df, rating_all, location_rating = build_tables(results, dictionaries)
+    tables = {'Rating': rating_df, 'Rating_all': rating_all, 'Location_Rating': location_rating}
+    for role in rating.ROLES:
+        tables['processed_' + role + '_df_1'] = results[role][2]
+    if dictionaries is not None:
+        tables.update(dictionary_tables(dictionaries))
+    return tables
+
+
+if __name__ == "__main__":
+    dictionaries = new_dictionaries()
+    print(export_tables(output_tables(run_pipeline(sys.argv[1], dictionaries=dictionaries), dictionaries),
+                        sys.argv[2], sys.argv[3]))
@@ -0,0 +1,226 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Rating engine shared by the modeling notebook and the dashboard.
+
+Computes the per-user `_#`, `_%`, `org_cost_*` and `err_cost_*` aggregates with one
+grouped aggregation per role, then applies StandardScaler -> MinMaxScaler -> weights
+as array operations. The result matches the notebook's `Rating` table.
+location_rollup builds the notebook's `Location_Rating` table in one grouped pass.
+
+Input tables are the processed_*_df_1 tables of the notebook:
+disposals: location, user, scan_type_pfm, ret_date_pfm, disp_doc, ori_cost, err_cost
+locations: location, user, val_ds584_flag, ori_cost, err_cost
+receiving: location, user, misclf_pfm, cre_mthod_pfm, ori_cost, err_cost
+'''
+
+# import modules
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# weights for role disposals
+weight_scan_type = 1/15
+weight_ret_date = 0.5/15
+weight_disp_doc = 1/15
+weight_disp_cost = 5/15
+
+# weights for role locations
+weight_val_flag = 1/15
+weight_loc_cost = 2/15
+
+# weights for role receiving
+weight_misclf_fap = 0.5/15
+weight_cre_method = 1/15
+weight_rec_cost = 3/15
+
+# model definition of each role
+# actions: (column in processed table, prefix of the _# and _% columns, weight)
+# cost_weight: weight for the standardized error cost
+ROLES = OrderedDict([
+    ('disposals', {
+        'actions': [('scan_type_pfm', 'scan_type', weight_scan_type),
+                    ('ret_date_pfm', 'ret_date', weight_ret_date),
+                    ('disp_doc', 'disp_doc', weight_disp_doc)],
+        'cost_weight': weight_disp_cost,
+    }),
+    ('locations', {
+        'actions': [('val_ds584_flag', 'val_ds584_flag', weight_val_flag)],
+        'cost_weight': weight_loc_cost,
+    }),
+    ('receiving', {
+        'actions': [('misclf_pfm', 'misclf_fap', weight_misclf_fap),
+                    ('cre_mthod_pfm', 'cre_mthod', weight_cre_method)],
+        'cost_weight': weight_rec_cost,
+    }),
+])
+
+
+# column names of the aggregated table of a role
+def count_columns(role):
+    return [name + '_#' for _, name, _ in ROLES[role]['actions']]
+
+
+def percent_columns(role):
+    return [name + '_%' for _, name, _ in ROLES[role]['actions']]
+
+
+def weights(role):
+    return np.array([w for _, _, w in ROLES[role]['actions']] + [ROLES[role]['cost_weight']])
+
+
+# same zero-variance handling as sklearn's scalers: a constant feature is scaled by 1
+def _handle_zeros_in_scale(scale):
+    scale = np.asarray(scale, dtype=float).copy()
+    scale[scale < 10 * np.finfo(scale.dtype).eps] = 1.0
+    return scale
+
+
+# StandardScaler().fit_transform on a single column
+def standard_scale(x):
+    x = np.asarray(x, dtype=float)
+    if len(x) == 0:
+        return x
+    return (x - x.mean()) / _handle_zeros_in_scale(np.array([x.std()]))[0]
+
+
+# MinMaxScaler(feature_range=(0, 1)).fit_transform, column-wise
+def minmax_scale(X):
+    X = np.asarray(X, dtype=float)
+    if len(X) == 0:
+        return X
+    lo = X.min(axis=0)
+    return (X - lo) / _handle_zeros_in_scale(X.max(axis=0) - lo)
+
+
+# sum the transactions number of each action and the cost per user, in one grouped pass
+# returns the notebook's `*_rating_df` before modeling plus the reference columns
+def aggregate_role(processed_df, role):
+    actions = ROLES[role]['actions']
+    agg = processed_df.groupby('user').agg(
+        n=('ori_cost', 'size'),
+        org_cost=('ori_cost', 'sum'),
+        err_cost=('err_cost', 'sum'),
+        **{name: (col, 'sum') for col, name, _ in actions})
+    return finish_aggregate(agg, role)
+
+
+# turn per-user sums (n, org_cost, err_cost and one column per action) into the role table
+def finish_aggregate(agg, role):
+    out = pd.DataFrame({'user': agg.index})
+    for _, name, _ in ROLES[role]['actions']:
+        out[name + '_#'] = agg[name].to_numpy(dtype=float)
+    out['org_cost_' + role] = agg['org_cost'].to_numpy(dtype=float)
+    out['err_cost_' + role] = agg['err_cost'].to_numpy(dtype=float)
+    n = agg['n'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for _, name, _ in ROLES[role]['actions']:
+            out[name + '_%'] = out[name + '_#'].to_numpy() / n
+        out['err_cost_' + role + '_%'] = out['err_cost_' + role].to_numpy() / out['org_cost_' + role].to_numpy()
+    return out
+
+
+# normalized feature matrix of a role: action counts and standardized error cost, min-max scaled
+def feature_matrix(agg, role):
+    std_err = standard_scale(agg['err_cost_' + role])
+    X = np.column_stack([agg[c].to_numpy(dtype=float) for c in count_columns(role)] + [std_err])
+    return std_err, minmax_scale(X)
+
+
+# standardize, normalize and weight the aggregated table of a role
+# returns the table with the notebook's column order, including the std_err_cost and rating columns
+def score_role(agg, role):
+    std_err, X = feature_matrix(agg, role)
+    scored = agg[['user'] + count_columns(role) + ['err_cost_' + role]].copy()
+    scored['std_err_cost_' + role] = std_err
+    scored[role + '_rating'] = X @ weights(role)
+    reference = agg[['org_cost_' + role] + percent_columns(role) + ['err_cost_' + role + '_%']]
+    scored = pd.concat([scored, reference], axis=1)
+    if role == 'receiving':
+        # the notebook fills the receiving table with 0 before modeling
+        scored = scored.fillna(0)
+    return scored
+
+
+# model one role from its aggregated table (notebook's final *_rating_df)
+# dropped_user: the locations user to drop, default the first one of agg
+def model_role(agg, role, dropped_user=None):
+    scored = score_role(agg, role)
+    if role == 'locations':
+        # the notebook drops the first user of the locations table after modeling (cell 60)
+        if dropped_user is None:
+            scored = scored.iloc[1:]
+        else:
+            scored = scored[scored['user'] != dropped_user]
+        scored = scored.reset_index(drop=True)
+    return scored
+
+
+# model one role end to end from its processed table
+def rate_role(processed_df, role):
+    return model_role(aggregate_role(processed_df, role), role)
+
+
+# outer join the three role tables by user and calculate the total rating (notebook's `Rating`)
+def combine_ratings(disposals_rating_df, locations_rating_df, receiving_rating_df):
+    rating = pd.merge(disposals_rating_df, locations_rating_df, on='user', how='outer')
+    rating = pd.merge(rating, receiving_rating_df, on='user', how='outer')
+    # missing value means the user doesn't have the specific role
+    rating = rating.fillna(0).drop_duplicates()
+    rating['total_rating'] = rating['disposals_rating'] + \
+        rating['locations_rating'] + rating['receiving_rating']
+    return rating
+
+
+# build the notebook's `Rating` table from the three processed tables
+def build_rating(processed_disposals_df_1, processed_locations_df_1, processed_receiving_df_1):
+    return combine_ratings(rate_role(processed_disposals_df_1, 'disposals'),
+                           rate_role(processed_locations_df_1, 'locations'),
+                           rate_role(processed_receiving_df_1, 'receiving'))
+
+
+# build the notebook's `Rating_all` table: ratings plus a 0/1 flag for each role the user has
+def build_rating_all(rating):
+    rating_all = rating[['user', 'disposals_rating', 'locations_rating',
+                         'receiving_rating', 'total_rating']].copy()
+    rating_all['disposal_role'] = (rating['org_cost_disposals'] > 0).astype(int)
+    rating_all['locations_role'] = (rating['org_cost_locations'] > 0).astype(int)
+    rating_all['receiving_role'] = (rating['org_cost_receiving'] > 0).astype(int)
+    return rating_all
+
+
+# numeric part of a location id, the notebook's int(s[9:]) of 'BUSINESS_<n>' (NaN if not numeric)
+def location_key(locations):
+    return pd.to_numeric(pd.Series(locations, dtype=object).str[9:], errors='coerce').to_numpy()
+
+
+# per-location ratings (the notebook's `Location_Rating`), one grouped pass over all roles
+# location_users: {role: location, user pairs}; role_ratings: {role: modeled *_rating_df}
+# dictionaries: the pairs are int codes (encoding.py), so the merge and the groupby run on
+# codes; the ratings' users are encoded for the merge and the locations decoded at the end
+def location_rollup(location_users, role_ratings, dictionaries=None):
+    columns = []
+    frames = []
+    for role in ROLES:
+        rated = [role + '_rating'] + percent_columns(role) + ['err_cost_' + role + '_%']
+        columns += rated
+        pairs = location_users[role][['location', 'user']].drop_duplicates()
+        ratings = role_ratings[role][['user'] + rated]
+        if dictionaries is not None:
+            ratings = ratings.assign(user=dictionaries['user'].encode(ratings['user'].to_numpy(), grow=False))
+        df = pairs.merge(ratings, on='user', how='left')
+        if role == 'locations':
+            # the notebook drops location/user rows with any missing value (cell 65)
+            df = df.dropna()
+        elif role == 'receiving':
+            # and keeps the receiving rows with a rating >= 0 (cell 105)
+            df = df[df[role + '_rating'] >= 0]
+        frames.append(df.drop(columns='user'))
+    # each row only fills its own role's columns, missing roles sum to 0
+    rollup = pd.concat(frames, ignore_index=True).groupby('location', sort=False)[columns].sum()
+    if dictionaries is not None:
+        rollup.index = dictionaries['location'].decode(rollup.index.to_numpy())
+    rollup['total_rating'] = rollup['disposals_rating'] + rollup['locations_rating'] + rollup['receiving_rating']
+    rollup = rollup.iloc[np.argsort(location_key(rollup.index), kind='stable')]
+    return rollup.rename_axis('location').reset_index()
@@ -0,0 +1,159 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Training rosters: for every business unit, its users needing training (total rating > 0)
+and each user's training areas, the error types the user has in each role.
+
+All rosters are built in one pass: the location/user pairs of the processed tables are
+indexed once (indexes.LocationUserIndex: every location's users presorted by total
+rating), the training areas are computed once per user, and the rosters are gathered
+and written in blocks of whole locations (about block_rows rows). Memory is bounded by
+the block besides the rating table and the pairs, which are read like the dashboard does.
+
+Formats:
+- csv: one file per location, roster.<location>.<version>.csv
+- parquet: one file sorted by location, roster.<version>.parquet; its row groups hold
+  whole locations, so a reader filtering on location only reads that location's groups
+
+Usage:
+    write_rosters(load_roster_tables(LocalBackend('tables'), '0412'), 'rosters', '0412')
+    python rosters.py tables rosters 0412 [csv|parquet]
+'''
+
+# import modules
+import os
+import sys
+import numpy as np
+import pandas as pd
+import rating
+from encoding import Dictionary, encode_columns, new_dictionaries
+from indexes import LocationUserIndex
+from loader import LocalBackend, S3Backend, load_tables
+from tables import decode_categories, table_file, widen_floats
+
+# roster rows gathered and written at once
+block_rows = 1000000
+
+# columns read from the Rating table: the ratings and the error counts of each role
+columns_rating = ['user', 'total_rating'] + [role + '_rating' for role in rating.ROLES] + \
+    [col for role in rating.ROLES for col in rating.count_columns(role)]
+
+
+# file name of a roster, e.g. roster.BUSINESS_12.0412.csv (roster.0412.parquet for all locations)
+def roster_file(location, version, ext='.csv'):
+    name = 'roster.' if location is None else 'roster.' + str(location).replace(os.sep, '_') + '.'
+    return name + version + ext
+
+
+# the exported tables a roster needs: Rating and the location/user pairs with their dictionaries
+def load_roster_tables(backend, version, ext='.csv'):
+    requests = {'user': (table_file('Rating', version, ext), columns_rating),
+                'dictionary_user': (table_file('Dictionary_user', version, ext), None),
+                'dictionary_location': (table_file('Dictionary_location', version, ext), None)}
+    for role in rating.ROLES:
+        requests[role] = (table_file('processed_' + role + '_df_1', version, ext), ['location', 'user'])
+    return load_tables(backend, requests, optional=('dictionary_user', 'dictionary_location'))
+
+
+# users needing training, sorted by total rating, and the location index over them
+def roster_index(data, min_rating=0):
+    df_user = widen_floats(decode_categories(data['user'], ['user']))
+    df_user = df_user.sort_values('total_rating', ascending=False, kind='stable').set_index('user')
+    df_user = df_user[df_user.total_rating > min_rating]
+    pairs = [data[role][['location', 'user']].drop_duplicates() for role in rating.ROLES]
+    # exports with string identifiers are encoded here, like in the dashboard
+    if data['dictionary_user'] is not None and data['dictionary_location'] is not None:
+        dictionaries = {'user': Dictionary.from_table(data['dictionary_user']),
+                        'location': Dictionary.from_table(data['dictionary_location'])}
+    else:
+        dictionaries = new_dictionaries()
+        pairs = [encode_columns(df, dictionaries) for df in pairs]
+    pairs = pd.concat(pairs).drop_duplicates(ignore_index=True).set_index('location')
+    return df_user, LocationUserIndex(pairs, df_user, dictionaries)
+
+
+# training areas of every user: per role, the error types with a count > 0, comma separated
+# the error types a user has are bits of a small integer, which picks one of the 2**k labels
+def training_areas(df_user):
+    areas = pd.DataFrame(index=df_user.index)
+    for role in rating.ROLES:
+        names = [name for _, name, _ in rating.ROLES[role]['actions']]
+        bits = np.zeros(len(df_user), dtype=np.int64)
+        for i, col in enumerate(rating.count_columns(role)):
+            bits |= (df_user[col].to_numpy() > 0).astype(np.int64) << i
+        labels = np.array([', '.join(name for i, name in enumerate(names) if b >> i & 1)
+                           for b in range(2 ** len(names))], dtype=object)
+        areas['training_' + role] = labels[bits]
+    return areas
+
+
+# rosters of consecutive locations (positions `codes` of the location index), one frame
+def roster_block(df_user, areas, index, codes):
+    starts, ends = index.location_ptr[codes], index.location_ptr[codes + 1]
+    counts = ends - starts
+    rows = np.concatenate([index.location_rows[start:end] for start, end in zip(starts, ends)]) \
+        if len(codes) else np.empty(0, dtype=np.int64)
+    block = pd.concat([df_user.iloc[rows], areas.iloc[rows]], axis=1).reset_index()
+    block.insert(0, 'location', np.repeat(index.locations.to_numpy()[codes], counts))
+    # rank of the user in the location's roster, by total rating
+    block.insert(1, 'rank', np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts) + 1)
+    return block
+
+
+# blocks of location positions, in location order, with about block_rows rows each
+def location_blocks(index, size=block_rows):
+    codes = np.argsort(index.locations.to_numpy().astype(str), kind='stable')
+    counts = np.diff(index.location_ptr)[codes]
+    codes = codes[counts > 0]
+    ends = np.cumsum(counts[counts > 0])
+    # a block ends with the location that reaches the next multiple of size
+    cuts = np.searchsorted(ends, np.arange(size, ends[-1] + size, size) if len(ends) else [], side='left') + 1
+    bounds = np.unique(np.concatenate([[0], np.minimum(cuts, len(codes))]))
+    return [codes[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+
+# write the rosters of every location into directory, returns the paths written
+def write_rosters(data, directory, version, fmt='csv', min_rating=0, size=block_rows):
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+    df_user, index = roster_index(data, min_rating)
+    areas = training_areas(df_user)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    writer = None
+    for codes in location_blocks(index, size):
+        block = roster_block(df_user, areas, index, codes)
+        table = pa.Table.from_pandas(block, preserve_index=False)
+        if fmt == 'parquet':
+            if writer is None:
+                paths.append(os.path.join(directory, roster_file(None, version, '.parquet')))
+                writer = pq.ParquetWriter(paths[-1], table.schema)
+            # one row group per block, so groups end at location boundaries
+            writer.write_table(table, row_group_size=max(len(block), 1))
+        else:
+            # each location's rows are a zero-copy slice of the block (pyarrow's csv writer
+            # is many times faster than DataFrame.to_csv)
+            counts = np.diff(index.location_ptr)[codes]
+            starts = np.cumsum(counts) - counts
+            for location, start, count in zip(index.locations.to_numpy()[codes], starts, counts):
+                paths.append(os.path.join(directory, roster_file(location, version)))
+                pa_csv.write_csv(table.slice(start, count), paths[-1])
+    if writer is not None:
+        writer.close()
+    return paths
+
+
+# tables from a local directory or an s3://bucket
+def backend_of(source):
+    if source.startswith('s3://'):
+        return S3Backend(source[len('s3://'):].rstrip('/'))
+    return LocalBackend(source)
+
+
+if __name__ == "__main__":
+    fmt = sys.argv[4] if len(sys.argv) > 4 else 'csv'
+    # the typed Parquet exports of the tables (tables.export_tables) read fastest
+    data = load_roster_tables(backend_of(sys.argv[1]), sys.argv[3], '.parquet')
+    print(len(write_rosters(data, sys.argv[2], sys.argv[3], fmt)), 'files written')
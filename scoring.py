@@ -0,0 +1,140 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+What-if scoring with other role weights.
+
+A rating is the min-max normalized feature matrix of a role times the role's weights
+(rating.py). The normalized features of every user and role are computed once and kept
+as one matrix (Rating_features: one row per user, one column per weight); the features
+of a location are the sums of its users' features, per role over the role's location/user
+pairs (like Location_Rating). Any weight vector then re-scores all users and all
+locations with one matrix-vector product each.
+
+With the default weights the scores equal Rating and Location_Rating. Weights are
+expected to be >= 0 (the receiving rows of Location_Rating are filtered on rating >= 0).
+
+Usage:
+    features = feature_table({role: rating.aggregate_role(processed, role) for role, processed in ...})
+    scorer = WeightScorer(features.set_index('user'))
+    weights = default_weights(); weights['err_cost_disposals'] = 0.5
+    scorer.score(weights).nlargest(10, 'total_rating')
+'''
+
+# import modules
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import rating
+
+
+# weight names of a role: its actions and the role's error cost, in feature matrix order
+def weight_names(role):
+    return [name for _, name, _ in rating.ROLES[role]['actions']] + ['err_cost_' + role]
+
+
+# every weight name, in the column order of the feature table
+def all_weight_names():
+    return [name for role in rating.ROLES for name in weight_names(role)]
+
+
+# weights of the rating model: name -> weight
+def default_weights():
+    return OrderedDict((name, w) for role in rating.ROLES
+                       for name, w in zip(weight_names(role), rating.weights(role)))
+
+
+# normalized features of a role from its aggregated table (rating.aggregate_role /
+# rating.finish_aggregate), one row per rated user
+def role_features(agg, role):
+    _, X = rating.feature_matrix(agg, role)
+    features = pd.DataFrame(np.nan_to_num(X), columns=weight_names(role))
+    features.insert(0, 'user', agg['user'].to_numpy())
+    if role == 'locations':
+        # the notebook drops the first user of the locations table after modeling (cell 60)
+        features = features.iloc[1:]
+    return features
+
+
+# normalized features of all roles, one row per user (0 for the roles a user doesn't have)
+# role_aggs: {role: aggregated table}; exported as Rating_features
+def feature_table(role_aggs):
+    table = None
+    for role in rating.ROLES:
+        features = role_features(role_aggs[role], role)
+        table = features if table is None else pd.merge(table, features, on='user', how='outer')
+    return table.fillna(0)[['user'] + all_weight_names()]
+
+
+# features of each location: per role, the sum of the role's features over its location/user
+# pairs; features: indexed by user; location_users: {role: location, user pairs}
+def location_features(features, location_users):
+    parts = []
+    for role in rating.ROLES:
+        pairs = location_users[role][['location', 'user']].drop_duplicates()
+        rows = features.index.get_indexer(pairs['user'])
+        keep = rows >= 0
+        values = features[weight_names(role)].to_numpy()[rows[keep]]
+        parts.append(pd.DataFrame(values, columns=weight_names(role),
+                                  index=pairs['location'].to_numpy()[keep]).groupby(level=0, sort=False).sum())
+    return pd.concat(parts, axis=1).fillna(0)[all_weight_names()]
+
+
+# positions of the k largest values, largest first (ties in position order)
+def top_positions(values, k):
+    k = min(k, len(values))
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+    # the k-th largest value; argpartition picks any of the values tied with it, so those
+    # are taken by position
+    kth = values[np.argpartition(-values, k - 1)[k - 1]]
+    above = np.flatnonzero(values > kth)
+    part = np.concatenate([above, np.flatnonzero(values == kth)[:k - len(above)]])
+    return part[np.lexsort((part, -values[part]))]
+
+
+# 1-based rank of every value, largest first (ties in position order)
+def ranks(values):
+    order = np.lexsort((np.arange(len(values)), -values))
+    rank = np.empty(len(values), dtype=np.int64)
+    rank[order] = np.arange(1, len(values) + 1)
+    return rank
+
+
+# re-scores users (and locations) for any weights from the cached feature matrices
+class WeightScorer:
+    # features: index user, the weight columns; locations: the same for locations
+    def __init__(self, features, locations=None):
+        self.names = all_weight_names()
+        self.users = features.index
+        self.X = np.ascontiguousarray(features[self.names].to_numpy(dtype=np.float64))
+        self.locations = None if locations is None else locations.index
+        self.L = None if locations is None else np.ascontiguousarray(locations[self.names].to_numpy(dtype=np.float64))
+        # weight column -> role rating column, for the per-role ratings
+        self.roles = np.zeros((len(self.names), len(rating.ROLES)))
+        for j, role in enumerate(rating.ROLES):
+            for name in weight_names(role):
+                self.roles[self.names.index(name), j] = 1.0
+
+    # weight vector from {name: weight}, missing names keep their default
+    def vector(self, weights=None):
+        merged = default_weights()
+        merged.update(weights or {})
+        return np.array([merged[name] for name in self.names], dtype=np.float64)
+
+    # total rating of every user, in the order of the features
+    def total(self, weights=None):
+        return self.X @ self.vector(weights)
+
+    # role ratings and total rating of every user (or of the users at row offsets `rows`)
+    def score(self, weights=None, rows=None):
+        w = self.vector(weights)
+        X, users = (self.X, self.users) if rows is None else (self.X[rows], self.users[rows])
+        df = pd.DataFrame(X @ (self.roles * w[:, None]), index=users,
+                          columns=[role + '_rating' for role in rating.ROLES])
+        df['total_rating'] = X @ w
+        return df
+
+    # total rating of every location
+    def location_total(self, weights=None):
+        return self.L @ self.vector(weights)
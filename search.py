@@ -0,0 +1,136 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Typeahead search over user IDs and business-unit (location) names, built at load time.
+
+A SearchIndex keeps the lowercased names sorted, so the names starting with a query are
+one searchsorted range, and a trigram index (every 3-character substring -> the names
+containing it, as integer postings) for substrings and misspellings: a name's similarity
+to the query is the Dice coefficient of their trigram sets. Both are built with numpy over
+the names' character codes, no Python loop per name.
+
+Matches are ranked: the name itself, then names starting with the query, then names
+sharing trigrams, most similar first; ties by score (e.g. the total rating, largest
+first). Trigrams are only looked up when fewer than k names start with the query, and a
+query shorter than 3 characters only matches prefixes. Candidates come from the query's
+rarer trigrams; a trigram in more than common_share of the names (e.g. "use" of every
+USER... ID) only adds to the similarity of those candidates, so a lookup reads short
+postings. An empty query returns the k best-scored names.
+
+Usage:
+    index = SearchIndex(df_user.index, df_user.total_rating)
+    positions = index.search('user0001', k=20)    # positions of the matches, best first
+    index.names[positions]
+'''
+
+# import modules
+import numpy as np
+from scoring import top_positions
+
+# least trigram similarity of a fuzzy match
+min_similarity = 0.3
+# share of the names above which a trigram doesn't produce candidates
+common_share = 0.05
+# character code bits of a trigram code (3 x 21 bits covers every unicode character)
+_char_bits = 21
+
+
+# sorted trigram codes of one string
+def _query_grams(text):
+    return np.unique(np.array([ord(text[i]) << 2 * _char_bits | ord(text[i + 1]) << _char_bits | ord(text[i + 2])
+                               for i in range(len(text) - 2)], dtype=np.int64))
+
+
+# prefix and trigram search over names; scores (optional) break ties, largest first
+class SearchIndex:
+    def __init__(self, names, scores=None):
+        self.names = np.asarray(names, dtype=object)
+        n = len(self.names)
+        self.scores = np.zeros(n) if scores is None else np.asarray(scores, dtype=np.float64)
+        self._best = np.empty(0, dtype=np.int64)  # best-scored positions, for empty queries
+        keys = np.char.lower(self.names.astype(str))
+        # sorted keys and their positions, for prefix ranges
+        self._order = np.argsort(keys, kind='stable')
+        self._keys = keys[self._order]
+        # trigram codes of every name: (name, offset) character codes as a 2-d array
+        width = keys.dtype.itemsize // 4
+        lengths = np.char.str_len(keys)
+        if width < 3 or n == 0:
+            self._grams, self._ptr = np.empty(0, dtype=np.int64), np.zeros(1, dtype=np.int64)
+            self._postings, self._n_grams = np.empty(0, dtype=np.int32), np.zeros(n, dtype=np.int64)
+            return
+        chars = keys.view(np.uint32).reshape(n, width).astype(np.int64)
+        grams = chars[:, :-2] << 2 * _char_bits | chars[:, 1:-1] << _char_bits | chars[:, 2:]
+        valid = np.arange(3, width + 1) <= lengths[:, None]
+        rows = np.broadcast_to(np.arange(n, dtype=np.int32)[:, None], grams.shape)[valid]
+        grams = grams[valid]
+        # postings sorted by trigram, rows ascending within one (a stable sort of the
+        # row-major pairs), each (trigram, name) pair once
+        order = np.argsort(grams, kind='stable')
+        grams, rows = grams[order], rows[order]
+        first = np.ones(len(grams), dtype=bool)
+        first[1:] = (grams[1:] != grams[:-1]) | (rows[1:] != rows[:-1])
+        grams, self._postings = grams[first], rows[first]
+        starts = np.flatnonzero(np.r_[True, grams[1:] != grams[:-1]])
+        self._grams = grams[starts]
+        self._ptr = np.append(starts, len(grams))
+        # distinct trigrams of each name
+        self._n_grams = np.bincount(self._postings, minlength=n)
+
+    def __len__(self):
+        return len(self.names)
+
+    # position of a name, -1 if unknown
+    def position(self, name):
+        key = str(name).lower()
+        lo, hi = np.searchsorted(self._keys, key, 'left'), np.searchsorted(self._keys, key, 'right')
+        for pos in self._order[lo:hi]:
+            if self.names[pos] == name:
+                return int(pos)
+        return -1
+
+    # positions of the k best matches of a query, best first
+    def search(self, query, k=20):
+        query = str(query).strip().lower()
+        if not query:
+            if len(self._best) < min(k, len(self.names)):
+                self._best = top_positions(self.scores, k)
+            return self._best[:k]
+        # names equal to the query (ignoring case), then the other names starting with it
+        lo = np.searchsorted(self._keys, query, 'left')
+        equal = np.searchsorted(self._keys, query, 'right')
+        hi = np.searchsorted(self._keys, query + '\U0010ffff', 'left')
+        exact = self._order[lo:equal]
+        exact = exact[top_positions(self.scores[exact], k)]
+        prefix = self._order[equal:hi]
+        found = np.concatenate([exact, prefix[top_positions(self.scores[prefix], max(k - len(exact), 0))]])
+        if len(found) >= k or len(query) < 3:
+            return found
+        return np.concatenate([found, self._similar(query, k - len(found), self._order[lo:hi])])
+
+    # positions of the k names most similar to the query by trigrams, except `excluded`
+    def _similar(self, query, k, excluded):
+        grams = _query_grams(query)
+        at = np.minimum(np.searchsorted(self._grams, grams), max(len(self._grams) - 1, 0))
+        at = at[self._grams[at] == grams] if len(self._grams) else at[:0]
+        if len(at) == 0:
+            return np.empty(0, dtype=np.int64)
+        sizes = self._ptr[at + 1] - self._ptr[at]
+        common = sizes > max(common_share * len(self.names), k)
+        if common.all():
+            common[np.argmin(sizes)] = False
+        hits = np.concatenate([self._postings[self._ptr[i]:self._ptr[i + 1]] for i in at[~common]])
+        candidates, counts = np.unique(hits, return_counts=True)
+        keep = ~np.isin(candidates, excluded)
+        candidates, counts = candidates[keep], counts[keep]
+        # the common trigrams' postings are sorted, a candidate is found by bisection
+        for i in at[common]:
+            postings = self._postings[self._ptr[i]:self._ptr[i + 1]]
+            found = np.minimum(np.searchsorted(postings, candidates), len(postings) - 1)
+            counts += postings[found] == candidates
+        similarity = 2 * counts / (len(grams) + self._n_grams[candidates])
+        keep = similarity >= min_similarity
+        candidates, similarity = candidates[keep], similarity[keep]
+        order = np.lexsort((-self.scores[candidates], -similarity))[:k]
+        return candidates[order]
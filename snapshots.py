@@ -0,0 +1,191 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Hot reload of the dashboard's tables.
+
+Everything the dashboard builds from one export version (tables, indexes, summaries,
+figure cache) is one immutable snapshot. A SnapshotHolder keeps the current snapshot and
+pins it for the duration of each request, so a callback sees one consistent version even
+when a reload lands in the middle of it. A Refresher thread polls the published version
+(tables.publish_version), builds the snapshot of a new version off the request path,
+warms it and swaps the holder's single reference; the old snapshot is freed once its
+last request ends. The dashboard keeps serving the current snapshot while a version fails
+to build. A deterministic failure (bad schema or data: a ValueError, KeyError, TypeError
+or IndexError) skips the version until a newer one appears; any other failure (S3,
+network, disk) is retried with exponential backoff. status() tells how far behind the
+published version the served snapshot is.
+
+Under gunicorn only the master builds snapshots (gunicorn.conf.py): after a swap it
+makes the workers re-fork from it (on_swap sends SIGHUP), so they share the new snapshot
+copy-on-write like the preloaded one instead of each building a private copy. A build
+holds a lock that is also taken around every fork, so a worker never starts from a
+half-built snapshot. The workers run a Refresher without build, which only watches the
+published version for status().
+
+Usage:
+    holder = SnapshotHolder(build(version))
+    holder.attach(app.server)
+    Refresher(holder, lambda: published_version(backend), build, interval=60).start()
+    holder.get().df_user            # inside a request: the snapshot pinned for it
+'''
+
+# import modules
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# errors of a build that fail again on retry, the version is skipped
+permanent_errors = (ValueError, KeyError, TypeError, IndexError)
+# seconds before the first retry after a transient failure, doubled per failure up to the max
+retry_seconds = 5
+max_retry_seconds = 600
+
+
+# the current snapshot, and the snapshot pinned for the running request (per thread)
+class SnapshotHolder:
+    def __init__(self, snapshot):
+        self.current = snapshot
+        self.swapped_at = time.time()
+        self._local = threading.local()
+
+    # the snapshot pinned for this thread, else the current one
+    def get(self):
+        snapshot = getattr(self._local, 'snapshot', None)
+        return self.current if snapshot is None else snapshot
+
+    # pin a snapshot (default the current one) for the code in the with block
+    @contextmanager
+    def pinned(self, snapshot=None):
+        previous = getattr(self._local, 'snapshot', None)
+        self._local.snapshot = self.current if snapshot is None else snapshot
+        try:
+            yield self._local.snapshot
+        finally:
+            self._local.snapshot = previous
+
+    # make snapshot the current one (a single reference assignment), returns the old one
+    def swap(self, snapshot):
+        previous, self.current = self.current, snapshot
+        self.swapped_at = time.time()
+        return previous
+
+    # pin the current snapshot for every request of a Flask server
+    def attach(self, server):
+        def pin():
+            self._local.snapshot = self.current
+
+        def unpin(exc=None):
+            self._local.snapshot = None
+
+        server.before_request(pin)
+        server.teardown_request(unpin)
+
+
+# background thread that swaps in the snapshot of each newly published version
+# latest(): the published version (None: unknown); build(version): a new snapshot,
+# with a `version` attribute (None: only watch the published version); warm(snapshot):
+# optional, runs with the snapshot pinned; on_swap(snapshot): optional, called after a swap
+class Refresher:
+    def __init__(self, holder, latest, build, interval=60, warm=None, metrics=None, on_swap=None):
+        self.holder = holder
+        self.latest = latest
+        self.build = build
+        self.interval = interval
+        self.warm = warm
+        self.metrics = metrics
+        self.on_swap = on_swap
+        # held while a snapshot is built and around forks (see start)
+        self.lock = threading.Lock()
+        self.failed = None  # version whose build failed deterministically, not retried
+        self.reloads = 0
+        self.published = None  # latest published version seen
+        self.behind_since = None  # time.time() the published version was first seen not served
+        self.failures = 0  # transient failures of the published version in a row
+        self.retry_at = None  # time.monotonic() of its next attempt
+        self._stop = threading.Event()
+        self._thread = None
+
+    # reload if a new version is published, returns True when a snapshot was swapped in
+    def check(self):
+        version = self.latest()
+        if version is None:
+            return False
+        if version != self.published:
+            # a newer version, tried right away
+            self.published, self.failures, self.retry_at = version, 0, None
+        if version == self.holder.current.version:
+            self.behind_since = None
+            return False
+        if self.behind_since is None:
+            self.behind_since = time.time()
+        if self.build is None or version == self.failed or \
+                (self.retry_at is not None and time.monotonic() < self.retry_at):
+            return False
+        start = time.perf_counter()
+        try:
+            with self.lock:
+                snapshot = self.build(version)
+                if self.warm is not None:
+                    with self.holder.pinned(snapshot):
+                        self.warm(snapshot)
+        except permanent_errors:
+            logger.exception('reload of version %s failed, keeping version %s until a newer one is published',
+                             version, self.holder.current.version)
+            self.failed = version
+            return False
+        except Exception:
+            self.failures += 1
+            delay = min(retry_seconds * 2 ** (self.failures - 1), max_retry_seconds)
+            self.retry_at = time.monotonic() + delay
+            logger.exception('reload of version %s failed (%d in a row), keeping version %s, retrying in %ss',
+                             version, self.failures, self.holder.current.version, delay)
+            return False
+        self.holder.swap(snapshot)
+        self.reloads += 1
+        self.failures, self.retry_at, self.behind_since = 0, None, None
+        if self.metrics is not None:
+            self.metrics.observe('reload', time.perf_counter() - start)
+        logger.info('reloaded version %s in %.3fs', version, time.perf_counter() - start)
+        if self.on_swap is not None:
+            self.on_swap(snapshot)
+        return True
+
+    # served and published version, and how long the served one has been behind
+    def status(self):
+        return {'version': self.holder.current.version, 'swapped_at': self.holder.swapped_at,
+                'published': self.published, 'reloads': self.reloads,
+                'behind_s': 0.0 if self.behind_since is None else round(time.time() - self.behind_since, 3),
+                'failures': self.failures, 'skipped': self.failed}
+
+    # seconds until the next check: the poll interval, or sooner for a retry
+    def _wait(self):
+        if self.retry_at is None:
+            return self.interval
+        return min(self.interval, max(self.retry_at - time.monotonic(), 0))
+
+    def _run(self):
+        while not self._stop.wait(self._wait()):
+            try:
+                self.check()
+            except Exception:
+                # e.g. the version pointer couldn't be read, try again next time
+                logger.exception('checking the published version failed')
+
+    def start(self):
+        if self.build is not None and hasattr(os, 'register_at_fork'):
+            # a fork waits for a running build, the child must not copy its half-built state
+            os.register_at_fork(before=self.lock.acquire, after_in_parent=self.lock.release,
+                                after_in_child=self.lock.release)
+        self._thread = threading.Thread(target=self._run, name='snapshot-refresher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
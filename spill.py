@@ -0,0 +1,122 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Out-of-core user aggregation for backfills larger than memory.
+
+Pass 1 streams the extracts in chunks, cleans them (ingest.clean_chunk) and appends the
+rows to on-disk spill files, partitioned by hash of user (pipeline.user_shards).
+Pass 2 reduces one partition at a time, streaming its spill files (pipeline.reduce_shard):
+duplicate rows are dropped by row hash (ingest.SeenRows) and the rows folded into
+per-user and per-location sums. Users never cross partitions, so the per-user sums are
+simply concatenated and the scaler fit (ingest.rate_user_sums) only sees the small
+per-user result.
+
+Memory is bounded by the spill buffer plus the largest partition's distinct row hashes and
+sums; pick n_partitions so a partition fits comfortably (default: one per 256 MB of input).
+
+Usage:
+    sums = aggregate_out_of_core({'disposals': ['2011/gmu_training_disposals.csv', ...]}, 'disposals')
+    python spill.py out 0412 data_2011 data_2012 ... data_2021
+'''
+
+# import modules
+import math
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import ingest
+from encoding import encode_result, new_dictionaries
+from pipeline import build_tables, output_tables, reduce_shard, user_shards
+from tables import export_tables
+
+# input bytes per partition when n_partitions isn't given
+partition_bytes = 256 * 1024 * 1024
+# processed rows buffered in memory before they are written to the spill files
+buffer_rows = 1000000
+
+
+# partitions needed for the extracts
+def default_partitions(paths):
+    return max(1, math.ceil(sum(os.path.getsize(path) for path in paths) / partition_bytes))
+
+
+# pass 1: clean the extracts of a role into spill files, returns {partition: [file, ...]}
+def spill_role(paths, role, spill_dir, n_partitions, chunksize=ingest.chunksize):
+    files = {}
+    buffers = {}
+    buffered = 0
+
+    def flush():
+        for part, rows in buffers.items():
+            path = os.path.join(spill_dir, '{}.{}.{}.arrow'.format(role, part, len(files.get(part, []))))
+            pd.concat(rows, ignore_index=True).to_feather(path, compression='uncompressed')
+            files.setdefault(part, []).append(path)
+        buffers.clear()
+
+    for path in paths:
+        for raw in pd.read_csv(path, dtype=str, chunksize=chunksize):
+            processed = ingest.clean_chunk(raw, role)
+            processed['row_hash'] = pd.util.hash_pandas_object(raw, index=False).to_numpy()
+            for part, rows in processed.groupby(user_shards(processed['user'], n_partitions)):
+                buffers.setdefault(part, []).append(rows)
+            buffered += len(processed)
+            if buffered >= buffer_rows:
+                flush()
+                buffered = 0
+    flush()
+    return files
+
+
+# aggregate a role's extracts out of core, returns (user_sums, location_sums, location_users)
+# like ingest.ingest_role; workers > 1 reduces partitions in parallel processes;
+# dictionaries: encode the result with these (encoding.py)
+def aggregate_out_of_core(paths, role, spill_dir=None, n_partitions=None, workers=1,
+                          chunksize=ingest.chunksize, dictionaries=None):
+    n_partitions = n_partitions or default_partitions(paths)
+    own_dir = spill_dir is None
+    spill_dir = tempfile.mkdtemp(prefix='spill.') if own_dir else spill_dir
+    os.makedirs(spill_dir, exist_ok=True)
+    try:
+        files = spill_role(paths, role, spill_dir, n_partitions, chunksize)
+        if not files:
+            raise ValueError('no rows in ' + ', '.join(paths))
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                parts = list(pool.map(reduce_shard, [role] * len(files), files.values()))
+        else:
+            parts = [reduce_shard(role, part_files) for part_files in files.values()]
+    finally:
+        if own_dir:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+    user_sums = pd.concat([part[0] for part in parts])
+    location_sums = pd.concat([part[1] for part in parts]).groupby(level=0).sum()
+    location_users = pd.concat([part[2] for part in parts]).drop_duplicates(ignore_index=True)
+    if dictionaries is not None:
+        return encode_result((user_sums, location_sums, location_users), dictionaries)
+    return user_sums, location_sums, location_users
+
+
+# pipeline results ({role: (user_sums, location_sums, location_users)}, encoded) over the
+# extracts of several directories (e.g. one per year), and their dictionaries
+def backfill_results(directories, spill_dir=None, n_partitions=None, workers=1):
+    dictionaries = new_dictionaries()
+    results = {}
+    for role, source in ingest.SOURCES.items():
+        paths = [os.path.join(directory, source['file']) for directory in directories]
+        results[role] = aggregate_out_of_core(paths, role, spill_dir, n_partitions, workers,
+                                              dictionaries=dictionaries)
+    return results, dictionaries
+
+
+# backfill: Rating, Rating_all and Location_Rating over the extracts of several directories
+def backfill(directories, spill_dir=None, n_partitions=None, workers=1):
+    return build_tables(*backfill_results(directories, spill_dir, n_partitions, workers))
+
+
+if __name__ == "__main__":
+    # the same tables as pipeline.py: also the processed location/user pairs and the dictionaries
+    print(export_tables(output_tables(*backfill_results(sys.argv[3:])), sys.argv[1], sys.argv[2]))
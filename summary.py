@@ -0,0 +1,39 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Precomputed statistics of the dashboard's Home tab, derived with vectorized operations:
+error/correct pie counts per role, the top-100 users stacked bars and the location bar.
+With ranking indexes (indexes.RankingIndex) the top users and locations are read from them.
+'''
+
+# (rating column, role flag column) of the Rating_all table, per role
+pie_roles = {
+    'disposals': ('disposals_rating', 'disposal_role'),
+    'locations': ('locations_rating', 'locations_role'),
+    'receiving': ('receiving_rating', 'receiving_role'),
+}
+
+
+# (error, correct) users of a role: correct means the user has the role and a zero rating
+def pie_counts(df_rating_all, rating_col, role_col):
+    correct = int(((df_rating_all[rating_col] == 0) & (df_rating_all[role_col] == 1)).sum())
+    return len(df_rating_all) - correct, correct
+
+
+# Home-tab statistics
+# df_location: location, total_rating sorted descending; df_user: one row per user, by column or index
+def build_home_summary(df_location, df_user, df_rating_all, top=100, location_ranking=None, user_ranking=None):
+    if location_ranking is not None:
+        df_location = df_location.iloc[location_ranking.top('total_rating')]
+    if 'user' not in df_user.columns:
+        df_user = df_user.rename_axis('user').reset_index()
+    if user_ranking is not None:
+        top_users = df_user.iloc[user_ranking.top('total_rating', top)]
+    else:
+        top_users = df_user.nlargest(top, 'total_rating')
+    return {
+        'locations': df_location[['location', 'total_rating']],
+        'top_users': top_users[['user', 'disposals_rating', 'locations_rating', 'receiving_rating']],
+        'pies': {role: pie_counts(df_rating_all, *cols) for role, cols in pie_roles.items()},
+    }
@@ -0,0 +1,105 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Synthetic gmu_training_* extracts with the real schemas, for benchmarks and tests
+(the real data can't leave the client enclave).
+
+- BUSINESS_UNIT is 'BUSINESS_<n>', so the notebook's int(s[9:]) location key works
+- COST is a dirty string ('1,234.50', '#250', "'99'", '-45', ...)
+- users and locations follow a Zipf-like skew, a few of them carry most transactions
+- rows are written in chunks, so 100M-row extracts need little memory
+
+Usage:
+    python synthetic_data.py data 1000000
+'''
+
+# import modules
+import os
+import sys
+import numpy as np
+import pandas as pd
+from ingest import SOURCES
+
+# rows written per chunk
+chunksize = 1000000
+
+scan_types = ['Scanned', 'Invalid', 'Discovered', 'Scan Transfer', 'Manual', None]
+scan_type_p = [0.55, 0.1, 0.1, 0.1, 0.1, 0.05]
+misclassified_faps = [None, 'Should be FAP based on Asset Class',
+                      'Should not be FAP based on Asset Class', 'FAP not in Approved Location']
+misclassified_fap_p = [0.85, 0.05, 0.05, 0.05]
+creation_methods = ['Purch. Req', 'AM Page', 'Manual Creation', 'PI Add']
+creation_method_p = [0.7, 0.1, 0.1, 0.1]
+cost_formats = ['{:.2f}', '{:,.2f}', '#{:.0f}', '@{:.2f}', "'{:.2f}'", '-{:.0f}', '&{:.2f}']
+cost_format_p = [0.6, 0.2, 0.04, 0.04, 0.04, 0.04, 0.04]
+
+
+# zipf-like sampling probabilities of n entities
+def skewed_p(n, exponent=1.1):
+    p = 1.0 / np.arange(1, n + 1) ** exponent
+    return p / p.sum()
+
+
+# dirty COST strings
+def dirty_costs(rng, n):
+    values = np.round(rng.lognormal(6, 1.5, n), 2)
+    formats = rng.choice(len(cost_formats), n, p=cost_format_p)
+    return [cost_formats[f].format(v) for f, v in zip(formats, values)]
+
+
+# random dates between 2011 and 2021
+def random_dates(rng, n):
+    return pd.Timestamp('2011-01-01') + pd.to_timedelta(rng.integers(0, 3650, n), unit='D')
+
+
+# one chunk of raw rows of a role
+def raw_chunk(rng, role, n, users, locations, user_p, location_p):
+    source = SOURCES[role]
+    user_col, = [col for col, name in source['columns'].items() if name == 'user']
+    df = pd.DataFrame({
+        'ASSET_ID': rng.integers(10 ** 8, 10 ** 9, n).astype(str),
+        'BUSINESS_UNIT': locations[rng.choice(len(locations), n, p=location_p)],
+        user_col: users[rng.choice(len(users), n, p=user_p)],
+        'COST': dirty_costs(rng, n),
+    })
+    if role == 'disposals':
+        df['SCAN_TYPE'] = rng.choice(np.array(scan_types, dtype=object), n, p=scan_type_p)
+        retired = random_dates(rng, n)
+        expected = retired + pd.to_timedelta(rng.integers(-400, 400, n), unit='D')
+        df['EXPECTED_RETIREMENT_DATE_REC'] = expected.strftime('%Y-%m-%d')
+        df['RETIREMENT_DATE'] = retired.strftime('%Y-%m-%d')
+        df['ON_DS132'] = rng.choice(['Yes', 'No'], n, p=[0.8, 0.2])
+    elif role == 'locations':
+        df['VALID_DS584_FLAG'] = rng.choice([1, 0], n, p=[0.85, 0.15])
+        df['LOCATION_DATE'] = random_dates(rng, n).strftime('%a %b %d %Y 00:00:00 GMT-0400 (EDT)')
+    else:
+        df['MISCLASSIFIED_FAP'] = rng.choice(np.array(misclassified_faps, dtype=object), n, p=misclassified_fap_p)
+        df['CREATION_METHOD'] = rng.choice(creation_methods, n, p=creation_method_p)
+        df['ACQUISITION_DT'] = random_dates(rng, n).strftime('%d.%m.%Y')
+    return df
+
+
+# write a synthetic extract of a role to path
+def write_extract(path, role, n_rows, n_users=None, n_locations=None, seed=0):
+    rng = np.random.default_rng(seed)
+    n_users = n_users or max(100, n_rows // 200)
+    n_locations = n_locations or max(10, n_users // 50)
+    users = np.array(['USER%06d' % i for i in range(n_users)], dtype=object)
+    locations = np.array(['BUSINESS_%d' % i for i in range(n_locations)], dtype=object)
+    user_p, location_p = skewed_p(n_users), skewed_p(n_locations, 0.8)
+    for start in range(0, n_rows, chunksize):
+        df = raw_chunk(rng, role, min(chunksize, n_rows - start), users, locations, user_p, location_p)
+        df.to_csv(path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+    return path
+
+
+# write the three extracts into a directory, named like the real files
+def write_extracts(directory, n_rows, seed=0):
+    os.makedirs(directory, exist_ok=True)
+    return {role: write_extract(os.path.join(directory, source['file']), role, n_rows, seed=seed + i)
+            for i, (role, source) in enumerate(SOURCES.items())}
+
+
+if __name__ == "__main__":
+    print(write_extracts(sys.argv[1], int(sys.argv[2])))
@@ -0,0 +1,85 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Server-side filtering, sorting and pagination for dash DataTables
+(page_action='custom', filter_action='custom', sort_action='custom').
+
+The filter query syntax is the one the DataTable sends, e.g.
+    {total_rating} > 0.1 && {user} contains "ab"
+'''
+
+# import modules
+import math
+
+# filter operators of the DataTable query language, longest symbols first
+operators = [['ge ', '>='],
+             ['le ', '<='],
+             ['lt ', '<'],
+             ['gt ', '>'],
+             ['ne ', '!='],
+             ['eq ', '='],
+             ['contains '],
+             ['datestartswith ']]
+
+
+# split one part of a filter query into (column, operator, value)
+def split_filter_part(filter_part):
+    for operator_type in operators:
+        for operator in operator_type:
+            if operator in filter_part:
+                name_part, value_part = filter_part.split(operator, 1)
+                name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+
+                value_part = value_part.strip()
+                v0 = value_part[0] if value_part else ''
+                if v0 and v0 == value_part[-1] and v0 in ("'", '"', '`'):
+                    value = value_part[1: -1].replace('\\' + v0, v0)
+                else:
+                    try:
+                        value = float(value_part)
+                    except ValueError:
+                        value = value_part
+
+                # word operators need spaces after them in the filter string,
+                # but we don't want these later
+                return name, operator_type[0].strip(), value
+
+    return [None] * 3
+
+
+# boolean mask of the rows of df matching a filter query
+def filter_mask(df, filter_query):
+    mask = None
+    for filter_part in (filter_query or '').split(' && '):
+        col_name, operator, filter_value = split_filter_part(filter_part)
+        if col_name not in df.columns:
+            continue
+        col = df[col_name]
+        if operator in ('eq', 'ne', 'lt', 'le', 'gt', 'ge'):
+            # a comparison between text and numbers doesn't filter
+            if isinstance(filter_value, str) == (col.dtype.kind in 'fiu'):
+                continue
+            part = getattr(col, operator)(filter_value)
+        elif operator == 'contains':
+            part = col.astype(str).str.contains(str(filter_value), regex=False)
+        elif operator == 'datestartswith':
+            part = col.astype(str).str.startswith(str(filter_value))
+        else:
+            continue
+        mask = part if mask is None else mask & part
+    return mask
+
+
+# one page of df after filtering and sorting, returns (records, page_count)
+def query_page(df, filter_query, sort_by, page_current, page_size):
+    mask = filter_mask(df, filter_query)
+    if mask is not None:
+        df = df[mask.to_numpy()]
+    if sort_by:
+        df = df.sort_values([col['column_id'] for col in sort_by],
+                            ascending=[col['direction'] == 'asc' for col in sort_by],
+                            kind='mergesort')
+    page_current = page_current or 0
+    page = df.iloc[page_current * page_size:(page_current + 1) * page_size]
+    return page.to_dict('records'), max(1, math.ceil(len(df) / page_size))
@@ -0,0 +1,119 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Export and load of the dashboard tables (Rating, Location_Rating, Rating_all, the
+three processed_*_df_1 tables and the Dictionary_user / Dictionary_location tables of
+their integer-coded identifiers, see encoding.py).
+
+Tables are written as csv and/or as typed columnar files next to it: Parquet (compact,
+for S3) and uncompressed Arrow IPC (.arrow, read memory-mapped without decoding). In
+both, user/location are dictionary encoded and the ratings are stored as float32.
+Loading reads only the requested columns; local Parquet and Arrow files are
+memory-mapped.
+
+An export becomes visible to a running dashboard when its version is published:
+publish_version writes the version to table.VERSION after all tables are written, and
+the dashboard reloads the tables of a newly published version (snapshots.py). A delta
+export (incremental.write_delta) only holds the Rating rows of the changed users, and
+its delta_base_file names the full export it applies to.
+
+Require: pyarrow for the Parquet and Arrow formats
+'''
+
+# import modules
+import io
+import os
+import pandas as pd
+
+# file holding the published export version, e.g. 0412
+version_file = 'table.VERSION'
+
+
+# file name of an exported table, e.g. table.Rating.0412.csv
+def table_file(name, version, ext='.csv'):
+    return 'table.' + name + '.' + version + ext
+
+
+# file naming the full export version a delta export applies to, e.g. table.0412-1.BASE
+def delta_base_file(version):
+    return 'table.' + version + '.BASE'
+
+
+# typed columnar version of a table: categorical user/location (kept as they are when
+# already integer codes, see encoding.py), float32 ratings
+def to_columnar(df):
+    df = df.copy()
+    for col in df.columns:
+        if col in ('user', 'location') and not pd.api.types.is_integer_dtype(df[col]):
+            df[col] = df[col].astype(str).astype('category')
+        elif col.endswith('rating'):
+            df[col] = df[col].astype('float32')
+    return df
+
+
+# export tables ({name: DataFrame}) to a local directory or an s3://bucket prefix
+def export_tables(tables, directory, version, formats=('csv', 'parquet', 'arrow')):
+    paths = []
+    for name, df in tables.items():
+        if 'csv' in formats:
+            paths.append(directory.rstrip('/') + '/' + table_file(name, version, '.csv'))
+            df.to_csv(paths[-1], index=False)
+        if 'parquet' in formats:
+            paths.append(directory.rstrip('/') + '/' + table_file(name, version, '.parquet'))
+            to_columnar(df).to_parquet(paths[-1], index=False)
+        if 'arrow' in formats:
+            paths.append(directory.rstrip('/') + '/' + table_file(name, version, '.arrow'))
+            to_columnar(df).reset_index(drop=True).to_feather(paths[-1], compression='uncompressed')
+    return paths
+
+
+# write a small text file to a local directory or an s3://bucket prefix
+def write_text(directory, name, text):
+    path = directory.rstrip('/') + '/' + name
+    if '://' in path:
+        import fsspec
+        with fsspec.open(path, 'w') as f:
+            f.write(text)
+        return path
+    # replace the file in one step, a reader never sees it half written
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write(text)
+    os.replace(tmp, path)
+    return path
+
+
+# publish an exported version to a local directory or an s3://bucket prefix, call it after
+# export_tables so a reader of the version finds all of its tables
+def publish_version(directory, version):
+    return write_text(directory, version_file, version + '\n')
+
+
+# read a table from a local path or a bytes buffer, only the given columns
+def read_table(source, filename, columns=None):
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    if filename.endswith('.parquet'):
+        if isinstance(source, str):
+            return pd.read_parquet(source, columns=columns, memory_map=True)
+        return pd.read_parquet(source, columns=columns)
+    if filename.endswith('.arrow'):
+        import pyarrow.feather as feather
+        table = feather.read_table(source, columns=columns, memory_map=isinstance(source, str))
+        # split_blocks keeps the numeric columns as zero-copy views of the mapped file
+        return table.to_pandas(split_blocks=True)
+    return pd.read_csv(source, usecols=columns)
+
+
+# back to plain values for dictionary-encoded columns (e.g. for plotly express grouping)
+def decode_categories(df, columns):
+    for col in columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(df[col].cat.categories.dtype)
+    return df
+
+
+# float32 columns back to float64, so rounded ratings display exactly
+def widen_floats(df):
+    return df.astype({col: 'float64' for col in df.columns if df[col].dtype == 'float32'})
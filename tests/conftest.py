@@ -0,0 +1,70 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Shared fixtures: small synthetic gmu_training_* extracts (synthetic_data.py) with some rows
+repeated, so duplicate removal has work to do, and the notebook's processed_*_df_1 tables.
+'''
+
+# import modules
+import os
+import sys
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ingest
+import synthetic_data
+
+# rows of each synthetic extract, and of them repeated at the end
+n_rows = 4000
+n_repeated = 300
+
+
+# directory of the three extracts, named like the real files
+@pytest.fixture(scope='session')
+def extract_dir(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp('extracts'))
+    for path in synthetic_data.write_extracts(directory, n_rows).values():
+        raw = pd.read_csv(path, dtype=str)
+        raw.sample(n_repeated, random_state=0).to_csv(path, mode='a', header=False, index=False)
+    return directory
+
+
+# {role: path} of the extracts
+@pytest.fixture(scope='session')
+def extracts(extract_dir):
+    return {role: os.path.join(extract_dir, source['file']) for role, source in ingest.SOURCES.items()}
+
+
+# {role: raw extract} read the notebook's way, duplicate rows removed
+@pytest.fixture(scope='session')
+def raw(extracts):
+    return {role: pd.read_csv(path, dtype=str).drop_duplicates(ignore_index=True) for role, path in extracts.items()}
+
+
+# {role: the notebook's processed_*_df_1 table}
+@pytest.fixture(scope='session')
+def processed(raw):
+    return {role: ingest.clean_chunk(df, role) for role, df in raw.items()}
+
+
+# directory of every table the dashboard reads, exported as benchmark.py does (version
+# benchmark.data_version, all formats)
+@pytest.fixture(scope='session')
+def table_dir(extract_dir, tmp_path_factory):
+    import benchmark
+    directory = str(tmp_path_factory.mktemp('tables'))
+    benchmark.bench_pipeline(extract_dir, directory)
+    return directory
+
+
+# the dashboard module, serving the Arrow tables of table_dir (imported once per session)
+@pytest.fixture(scope='session')
+def dashboard(table_dir):
+    import benchmark
+    os.environ.update(DASHBOARD_DATA_SOURCE='local', DASHBOARD_DATA_DIR=table_dir,
+                      DASHBOARD_DATA_VERSION=benchmark.data_version, DASHBOARD_DATA_EXT='.arrow')
+    import Interactive_dashboard
+    return Interactive_dashboard
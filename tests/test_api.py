@@ -0,0 +1,126 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Scoring API answers against looking the users up in the dashboard's tables and sorting them.
+'''
+
+# import modules
+import json
+import numpy as np
+import pandas as pd
+import pytest
+import api
+import benchmark
+
+
+@pytest.fixture(scope='module')
+def client(dashboard):
+    return dashboard.server.test_client()
+
+
+@pytest.fixture(scope='module')
+def snapshot(dashboard):
+    return dashboard.snapshot()
+
+
+# {location: users} of the served users, from the processed rows of every role
+@pytest.fixture(scope='module')
+def location_members(processed, snapshot):
+    pairs = pd.concat([df[['location', 'user']] for df in processed.values()]).drop_duplicates()
+    pairs = pairs[pairs['user'].isin(snapshot.df_user.index)]
+    return pairs.groupby('location')['user'].apply(set).to_dict()
+
+
+# users of a window's table sorted by a column, largest first, ties in table order
+def sorted_users(df, col):
+    return df.reset_index().sort_values(col, ascending=False, kind='stable')['user'].tolist()
+
+
+def get_json(client, url, **kwargs):
+    response = client.get(api.prefix + url, **kwargs)
+    return response.status_code, json.loads(response.get_data(as_text=True) or 'null')
+
+
+@pytest.mark.parametrize('window', ['all', '30d', 'decayed'])
+def test_user_records_match_the_table(client, snapshot, window):
+    df = snapshot.user_views[window][0]
+    users = [df.index[0], df.index[len(df) // 2], df.index[-1]]
+    status, body = get_json(client, '/users/' + users[1] + '?window=' + window)
+    assert status == 200 and body['version'] == snapshot.version and body['window'] == window
+    record = body['user']
+    assert record['user'] == users[1]
+    for col in api.user_columns:
+        assert record[col] == pytest.approx(df.loc[users[1], col])
+    for col in api.rating_columns:
+        assert record['rank_' + col] == sorted_users(df, col).index(users[1]) + 1
+    response = client.post(api.prefix + '/users', json={'users': users + ['NOBODY'], 'window': window})
+    body = json.loads(response.get_data(as_text=True))
+    assert body['missing'] == ['NOBODY'] and [r['user'] for r in body['users']] == users
+    assert body['users'][1] == record
+    status, body = get_json(client, '/users?id=' + users[0] + '&id=NOBODY&window=' + window)
+    assert body['missing'] == ['NOBODY'] and body['users'][0]['user'] == users[0]
+
+
+@pytest.mark.parametrize('window,by', [('all', 'total_rating'), ('all', 'receiving_rating'),
+                                       ('30d', 'total_rating'), ('decayed', 'disposals_rating')])
+def test_location_top_k_matches_sorting_its_users(client, snapshot, location_members, window, by):
+    df = snapshot.user_views[window][0]
+    locations = sorted(location_members, key=lambda location: -len(location_members[location]))[:3]
+    response = client.post(api.prefix + '/locations/top', json={'locations': locations + ['NOWHERE'], 'k': 5,
+                                                                'by': by, 'window': window})
+    body = json.loads(response.get_data(as_text=True))
+    assert body['missing'] == ['NOWHERE'] and body['k'] == 5 and body['by'] == by
+    for location, part in zip(locations, body['locations']):
+        members = location_members[location]
+        expected = [user for user in sorted_users(df, by) if user in members][:5]
+        assert part['location'] == location and [r['user'] for r in part['users']] == expected
+    status, body = get_json(client, '/locations/' + locations[0] + '/top?k=2&by=' + by + '&window=' + window)
+    assert [r['user'] for r in body['locations'][0]['users']] == \
+        [user for user in sorted_users(df, by) if user in location_members[locations[0]]][:2]
+
+
+def test_rankings_match_sorting(client, snapshot):
+    df = snapshot.user_views['all'][0]
+    status, body = get_json(client, '/rankings?by=total_rating,locations_rating&k=7&offset=3')
+    assert status == 200 and body['offset'] == 3
+    for col in ['total_rating', 'locations_rating']:
+        rows = body['rankings'][col]
+        assert [r['user'] for r in rows] == sorted_users(df, col)[3:10]
+        assert [r['rank'] for r in rows] == list(range(4, 11))
+        np.testing.assert_allclose([r['rating'] for r in rows], df.loc[[r['user'] for r in rows], col])
+
+
+@pytest.mark.parametrize('url,status', [('/users/NOBODY', 404), ('/users/x?window=2y', 400),
+                                        ('/rankings?by=total', 400), ('/rankings?k=-1', 400),
+                                        ('/rankings?k=' + str(api.max_k + 1), 400), ('/locations/x/top?k=a', 400)])
+def test_invalid_requests(client, url, status):
+    got, body = get_json(client, url)
+    assert got == status and 'error' in body
+
+
+def test_batch_limits_and_bodies(client):
+    response = client.post(api.prefix + '/users', json={'users': ['u'] * (api.max_batch + 1)})
+    assert response.status_code == 413
+    assert client.post(api.prefix + '/users', data='not json').status_code == 400
+    assert client.post(api.prefix + '/locations/top', json={'locations': 'L1'}).status_code == 400
+
+
+def test_etag_revalidation(client, snapshot):
+    user = snapshot.df_user.index[0]
+    response = client.get(api.prefix + '/users/' + user)
+    etag = response.headers['ETag'].strip('"')
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert client.get(api.prefix + '/users/' + user, headers={'If-None-Match': '"' + etag + '"'}).status_code == 304
+    # another request has another ETag
+    other = client.get(api.prefix + '/users/' + user + '?window=30d')
+    assert other.headers['ETag'].strip('"') != etag
+
+
+def test_benchmark_requests_answer(client, snapshot):
+    location = snapshot.location_index.locations[0]
+    users = snapshot.df_user.index[:50].tolist()
+    for method, url, *data in benchmark.api_requests(location, users[0], users).values():
+        response = client.open(url, method=method, json=data[0] if data else None)
+        assert response.status_code == 200
+        json.loads(response.get_data(as_text=True))
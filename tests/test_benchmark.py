@@ -0,0 +1,70 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+The synthetic extracts have the real schemas, and the benchmark's pipeline writes the
+tables it times and flags regressions against a baseline.
+'''
+
+# import modules
+import os
+import numpy as np
+import pandas as pd
+import benchmark
+import ingest
+import synthetic_data
+import tables
+
+
+def test_synthetic_extracts_have_the_real_schemas(raw):
+    for role, source in ingest.SOURCES.items():
+        df = raw[role]
+        assert set(source['columns']) | set(source['dates']) | {source['date'][0]} <= set(df.columns)
+        # dirty costs all clean up to numbers, and the notebook's location key parses
+        assert ingest.clean_cost(df['COST']).notna().all()
+        assert (~df['COST'].str.match(r'^[0-9.]+$')).any()
+        assert (df['BUSINESS_UNIT'].str[9:].astype(int) >= 0).all()
+        assert ingest.transaction_dates(df, role).notna().all()
+        # skewed: the busiest user has far more than an even share of the rows
+        assert df.iloc[:, 2].value_counts().iloc[0] > 5 * len(df) / df.iloc[:, 2].nunique()
+
+
+def test_synthetic_extracts_are_reproducible(tmp_path):
+    first = synthetic_data.write_extract(str(tmp_path / 'a.csv'), 'receiving', 500, seed=3)
+    second = synthetic_data.write_extract(str(tmp_path / 'b.csv'), 'receiving', 500, seed=3)
+    pd.testing.assert_frame_equal(pd.read_csv(first, dtype=str), pd.read_csv(second, dtype=str))
+
+
+def test_bench_pipeline_writes_the_dashboard_tables(table_dir):
+    names = ['Rating', 'Rating_all', 'Location_Rating', 'Location_Cube', 'Rating_windows', 'Rating_features',
+             'Dictionary_user', 'Dictionary_location'] + ['processed_%s_df_1' % role for role in ingest.SOURCES]
+    for name in names:
+        for ext in ('.csv', '.parquet', '.arrow'):
+            assert os.path.exists(os.path.join(table_dir, tables.table_file(name, benchmark.data_version, ext)))
+    rating_df = pd.read_csv(os.path.join(table_dir, tables.table_file('Rating', benchmark.data_version)))
+    assert not rating_df['user'].duplicated().any()
+    np.testing.assert_allclose(rating_df['total_rating'], rating_df[['disposals_rating', 'locations_rating',
+                                                                     'receiving_rating']].sum(axis=1))
+
+
+def test_stages_measure_their_own_memory():
+    results = benchmark.StageResults()
+    start = results.start()
+    held = np.ones(50 * 2 ** 20 // 8)
+    results.add('allocate', start, len(held))
+    del held
+    start = results.start()
+    results.add('idle', start, 0)
+    stages = results.stages
+    assert stages['allocate']['stage_mb'] > 40 and stages['idle']['stage_mb'] < 10
+    # the peak of a later stage doesn't carry the earlier stage's peak
+    assert stages['idle']['peak_rss_mb'] < stages['allocate']['peak_rss_mb'] - 40
+
+
+def test_regressions_flags_slower_stages():
+    baseline = {'pipeline': {'read': {'seconds': 1.0}, 'clean': {'seconds': 1.0}},
+                'dashboard': {'startup': {'seconds': 2.0}}}
+    results = {'pipeline': {'read': {'seconds': 1.1}, 'clean': {'seconds': 1.5}, 'new': {'seconds': 9.0}},
+               'dashboard': {'startup': {'seconds': 3.0}, 'peak_rss_mb': 100}}
+    assert benchmark.regressions(results, baseline, 0.2) == [('pipeline', 'clean', 1.5, 1.0),
+                                                            ('dashboard', 'startup', 3.0, 2.0)]
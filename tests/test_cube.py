@@ -0,0 +1,108 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+The aggregate cube's cells against grouping the transactions directly, and the
+transaction dates the cube is keyed by.
+'''
+
+# import modules
+import numpy as np
+import pandas as pd
+import pytest
+import ingest
+import rating
+from cube import ALL_YEARS, AggregateCube, error_types
+
+
+# every cell of a role straight from its processed rows: (error_type, year, location) -> measures
+def brute_cells(processed, role, years, ratings):
+    df = processed.assign(year=years.to_numpy(), rating=processed['user'].map(ratings).fillna(0).to_numpy())
+    df = pd.concat([df, df.assign(year=ALL_YEARS)], ignore_index=True)
+    cells = []
+    for name, col in error_types(role):
+        if col is None:
+            error = np.zeros(len(df), dtype=bool)
+            for _, action in error_types(role)[:-1]:
+                error |= df[action].to_numpy() > 0
+        else:
+            error = df[col].to_numpy() > 0
+        part = df.assign(error=error, err_cost=np.where(error, df['ori_cost'], 0.0))
+        errors = part[error]
+        erring_users = errors.drop_duplicates(['year', 'location', 'user'])
+        grouped = pd.DataFrame({
+            'n': part.groupby(['year', 'location']).size(),
+            'errors': part.groupby(['year', 'location'])['error'].sum(),
+            'err_cost': part.groupby(['year', 'location'])['err_cost'].sum(),
+            'users': erring_users.groupby(['year', 'location']).size(),
+            'rating_sum': erring_users.groupby(['year', 'location'])['rating'].sum(),
+        }).fillna(0)
+        cells.append(grouped.assign(error_type=name).set_index('error_type', append=True))
+    return pd.concat(cells).reorder_levels(['error_type', 'year', 'location']).sort_index()
+
+
+@pytest.fixture(scope='module')
+def role_ratings(processed):
+    return {role: rating.rate_role(df, role) for role, df in processed.items()}
+
+
+def test_cells_match_grouping_the_rows(raw, processed, role_ratings):
+    cube = AggregateCube()
+    for role, df in processed.items():
+        years = ingest.transaction_years(raw[role], role)
+        # folded in batches, like the chunks of a streaming ingest
+        for start in range(0, len(df), 1500):
+            cube.add(df.iloc[start:start + 1500], role, years.iloc[start:start + 1500])
+    cells = cube.refresh(role_ratings)
+    for role, df in processed.items():
+        ratings = role_ratings[role].set_index('user')[role + '_rating']
+        expected = brute_cells(df, role, ingest.transaction_years(raw[role], role), ratings)
+        got = cells.xs(role, level='role').sort_index()
+        pd.testing.assert_frame_equal(got, expected[got.columns], check_dtype=False)
+
+
+def test_slices_and_years(raw, processed, role_ratings):
+    cube = AggregateCube()
+    for role, df in processed.items():
+        cube.add(df, role, ingest.transaction_years(raw[role], role))
+    cube.refresh(role_ratings)
+    years = cube.years()
+    assert years[0] == ALL_YEARS and years[1:] == sorted(ingest.transaction_years(raw['disposals'], 'disposals')
+                                                         .unique().tolist())
+    per_location = cube.slice('disposals', 'scan_type', years[1])
+    assert set(per_location.index) <= set(processed['disposals']['location'])
+    location = per_location.index[0]
+    assert cube.slice('disposals', 'scan_type', years[1], location).equals(per_location.loc[location])
+    over_years = cube.location_years('disposals', 'scan_type', location)
+    assert over_years.loc[ALL_YEARS, 'errors'] == over_years.drop(ALL_YEARS)['errors'].sum()
+    assert len(cube.slice('disposals', 'scan_type', 1900)) == 0
+    # an exported table restores the same cells
+    restored = AggregateCube()
+    restored.set_cells(cube.table())
+    pd.testing.assert_frame_equal(restored.cells, cube.cells)
+
+
+def test_ingest_role_fills_the_cube(extracts, raw, processed, role_ratings, role='receiving'):
+    streamed = AggregateCube()
+    ingest.ingest_role(extracts[role], role, chunksize=700, cube=streamed)
+    whole = AggregateCube()
+    whole.add(processed[role], role, ingest.transaction_years(raw[role], role))
+    pd.testing.assert_frame_equal(streamed.refresh(role_ratings), whole.refresh(role_ratings))
+
+
+@pytest.mark.parametrize('role', list(ingest.SOURCES))
+def test_transaction_dates_of_missing_dates(raw, role):
+    col = ingest.SOURCES[role]['date'][0]
+    chunk = raw[role].iloc[:4].copy()
+    chunk[col] = np.nan
+    # a chunk without any date, e.g. the last chunk of an extract with trailing undated rows
+    dates = ingest.transaction_dates(chunk, role)
+    assert dates.isna().all() and list(dates.index) == list(chunk.index)
+    assert (ingest.transaction_years(chunk, role) == ingest.UNKNOWN_YEAR).all()
+    # missing and malformed dates among valid ones
+    chunk = raw[role].iloc[:4].copy()
+    chunk.loc[chunk.index[1], col] = np.nan
+    chunk.loc[chunk.index[2], col] = 'not a date'
+    dates = ingest.transaction_dates(chunk, role)
+    assert dates.isna().tolist() == [False, True, True, False]
+    assert dates.iloc[0] == ingest.transaction_dates(raw[role].iloc[:1], role).iloc[0]
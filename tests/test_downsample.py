@@ -0,0 +1,96 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Rank buckets against slicing the series bucket by bucket, zoom ranges, and the figures
+drawn for short and long series.
+'''
+
+# import modules
+import math
+import dash
+import numpy as np
+import pytest
+from downsample import max_labels, rank_buckets, ranked_figure, zoom_range
+
+
+@pytest.fixture(scope='module')
+def series():
+    values = -np.sort(-np.random.default_rng(0).exponential(size=5003))
+    labels = np.array(['L%05d' % i for i in range(len(values))], dtype=object)
+    return labels, values
+
+
+@pytest.mark.parametrize('lo,hi,n', [(0, None, 1000), (0, None, 7), (17, 2500, 100), (4000, 4003, 100),
+                                     (5000, 9000, 3), (-5, 10, 1000)])
+def test_buckets_match_slicing(series, lo, hi, n):
+    _, values = series
+    buckets = rank_buckets(values, lo, hi, n)
+    end = len(values) if hi is None else min(hi, len(values))
+    start = max(lo, 0)
+    size = math.ceil((end - start) / n)
+    expected = [values[i:min(i + size, end)] for i in range(start, end, size)]
+    assert len(buckets) == len(expected) <= n
+    for (_, bucket), part in zip(buckets.iterrows(), expected):
+        assert bucket['first'] == bucket['position'] + 1 and bucket['count'] == len(part)
+        assert bucket['last'] == bucket['first'] + len(part) - 1
+        assert (bucket['max'], bucket['min']) == (part.max(), part.min())
+        assert bucket['mean'] == pytest.approx(part.mean())
+    # the buckets cover the range once
+    assert buckets['count'].sum() == end - start
+
+
+def test_empty_range():
+    assert len(rank_buckets(np.arange(5.0), 3, 3)) == 0
+    assert len(rank_buckets([], 0)) == 0
+
+
+@pytest.mark.parametrize('relayout,expected', [
+    (None, None), ({}, None), ({'autosize': True}, None), ({'xaxis.autorange': True}, (0, None)),
+    ({'xaxis.range[0]': 10.5, 'xaxis.range[1]': 20.5}, (9, 21)), ({'xaxis.range': [-3.2, 4.1]}, (0, 5)),
+    ({'xaxis.range[0]': 0.5}, None)])
+def test_zoom_range(relayout, expected):
+    assert zoom_range(relayout) == expected
+
+
+def test_short_series_are_bars(series):
+    labels, values = series
+    fig = ranked_figure(labels[:40], values[:40], highlight='L00003')
+    bar, = fig.data
+    assert bar.type == 'bar' and list(bar.x) == list(range(1, 41)) and list(bar.y) == list(values[:40])
+    assert [i for i, color in enumerate(bar.marker.color) if color != '#186ded'] == [3]
+    assert list(fig.layout.xaxis.ticktext) == list(labels[:40])
+    # past max_labels the bars keep rank ticks
+    fig = ranked_figure(labels, values, 0, max_labels + 1)
+    assert fig.layout.xaxis.ticktext is None and len(fig.data[0].x) == max_labels + 1
+
+
+def test_long_series_are_bucket_lines(series):
+    labels, values = series
+    fig = ranked_figure(labels, values, highlight='L04000', n=100)
+    assert [trace.type for trace in fig.data] == ['scattergl'] * 4
+    maxima, minima, means, marker = fig.data
+    buckets = rank_buckets(values, n=100)
+    assert list(maxima.y) == list(buckets['max']) and list(minima.y) == list(buckets['min'])
+    assert list(means.y) == list(buckets['mean']) and list(maxima.x) == list(buckets['first'])
+    assert maxima.hovertext[1] == 'ranks 52-102: top L00051'
+    assert (list(marker.x), list(marker.y)) == ([4001], [values[4000]])
+    assert tuple(fig.layout.xaxis.range) == (0.5, len(values) + 0.5)
+    # zooming to a short range draws its bars
+    fig = ranked_figure(labels, values, 2000, 2050, n=100)
+    assert fig.data[0].type == 'bar' and list(fig.data[0].x) == list(range(2001, 2051))
+    assert tuple(fig.layout.xaxis.range) == (2000.5, 2050.5)
+
+
+def test_dashboard_zoom_callbacks(dashboard):
+    locations = dashboard.snapshot().home_summary['locations']
+    assert dashboard.callback_location_overview_zoom({'autosize': True}) is dash.no_update
+    # the ranks partly in the range are drawn
+    fig = dashboard.callback_location_overview_zoom({'xaxis.range[0]': 2.5, 'xaxis.range[1]': 3.5})
+    assert list(fig.data[0].x) == [2, 3, 4] and list(fig.data[0].y) == list(locations.total_rating[1:4])
+    location = dashboard.snapshot().location_index.locations[0]
+    full = dashboard.callback_user_rating_bar2_zoom({'xaxis.autorange': True}, location, None, 'all')
+    assert full is dashboard.cached_user_rating_bar2(location, None, 'all')
+    zoomed = dashboard.callback_user_rating_bar2_zoom({'xaxis.range': [0.5, 2.5]}, location, None, 'all')
+    assert list(zoomed.data[0].y) == list(dashboard.user_rating_bar2_figure(location).data[0].y[:3])
+    assert dashboard.callback_user_rating_bar2_zoom({'xaxis.range': [0, 2]}, None, None, 'all') is dash.no_update
@@ -0,0 +1,64 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Dictionary encoding: stable codes, round trips, and encoded ingest equal to the plain one.
+'''
+
+# import modules
+import numpy as np
+import pandas as pd
+import pytest
+import ingest
+from encoding import Dictionary, decode_columns, dictionary_tables, encode_columns, new_dictionaries
+
+
+def test_codes_are_stable_and_appended():
+    dictionary = Dictionary(['b', 'a'])
+    np.testing.assert_array_equal(dictionary.encode(['a', 'c', 'b', 'c']), [1, 2, 0, 2])
+    # known values keep their codes, unknown ones are appended in order of appearance
+    np.testing.assert_array_equal(dictionary.encode(['d', 'a']), [3, 1])
+    assert dictionary.encode(['a']).dtype == np.int32
+    np.testing.assert_array_equal(dictionary.encode(['e', 'b'], grow=False), [-1, 0])
+    assert len(dictionary) == 4
+    assert list(dictionary.decode([3, -1, 0])) == ['d', None, 'b']
+
+
+def test_identifiers_read_as_numbers_encode_like_strings():
+    dictionary = Dictionary(['12'])
+    np.testing.assert_array_equal(dictionary.encode(np.array([12], dtype=object)), [0])
+
+
+def test_table_round_trip():
+    dictionary = Dictionary(['x', 'y', 'z'])
+    restored = Dictionary.from_table(dictionary.table().sample(frac=1, random_state=0))
+    assert list(restored.values) == ['x', 'y', 'z']
+    with pytest.raises(ValueError):
+        Dictionary.from_table(pd.DataFrame({'code': [0, 2], 'value': ['x', 'z']}))
+    tables = dictionary_tables(new_dictionaries())
+    assert sorted(tables) == ['Dictionary_location', 'Dictionary_user']
+
+
+def test_encode_and_decode_columns(processed):
+    dictionaries = new_dictionaries()
+    df = processed['disposals']
+    encoded = encode_columns(df, dictionaries)
+    assert pd.api.types.is_integer_dtype(encoded['user']) and pd.api.types.is_integer_dtype(encoded['location'])
+    assert encoded['user'].nunique() == df['user'].nunique()
+    pd.testing.assert_frame_equal(decode_columns(encoded, dictionaries), df, check_dtype=False)
+
+
+@pytest.mark.parametrize('role', list(ingest.SOURCES))
+def test_encoded_ingest_matches_plain_ingest(extracts, role):
+    dictionaries = new_dictionaries()
+    user_sums, location_sums, location_users = ingest.ingest_role(extracts[role], role, chunksize=700,
+                                                                  dictionaries=dictionaries)
+    plain = ingest.ingest_role(extracts[role], role, chunksize=700)
+    decoded = user_sums.set_axis(dictionaries['user'].decode(user_sums.index.to_numpy()))
+    pd.testing.assert_frame_equal(decoded.sort_index(), plain[0].sort_index(), check_dtype=False, check_names=False,
+                                  check_index_type=False)
+    decoded = location_sums.set_axis(dictionaries['location'].decode(location_sums.index.to_numpy()))
+    pd.testing.assert_frame_equal(decoded.sort_index(), plain[1].sort_index(), check_dtype=False, check_names=False,
+                                  check_index_type=False)
+    pairs = decode_columns(location_users, dictionaries)
+    assert set(map(tuple, pairs.to_numpy())) == set(map(tuple, plain[2].to_numpy()))
@@ -0,0 +1,57 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+The figure cache's hits, LRU eviction under the memory cap and invalidation.
+'''
+
+# import modules
+import json
+import plotly.graph_objects as go
+from figure_cache import FigureCache
+from metrics import Metrics
+
+
+# a bar figure of n bars, and a counter of how often it was built
+def builder(n, built):
+    def build():
+        built.append(n)
+        return go.Figure(data=go.Bar(x=list(range(n)), y=list(range(n))))
+    return build
+
+
+def test_hit_returns_the_built_figure_without_building():
+    cache, built = FigureCache(), []
+    first = cache.get(('bar', None, None, None, None), builder(3, built))
+    again = cache.get(('bar', None, None, None, None), builder(3, built))
+    assert built == [3]
+    assert again is first
+    assert first == json.loads(go.Figure(data=go.Bar(x=[0, 1, 2], y=[0, 1, 2])).to_json())
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_least_recently_used_figures_are_evicted_over_the_cap():
+    size = len(go.Figure(data=go.Bar(x=list(range(50)), y=list(range(50)))).to_json())
+    cache, built = FigureCache(max_bytes=2 * size), []
+    for key in 'abc':
+        cache.get(key, builder(50, built))
+        if key == 'b':
+            cache.get('a', builder(50, built))  # a is now newer than b
+    assert len(cache) == 2 and cache.nbytes <= cache.max_bytes
+    cache.get('a', builder(50, built))
+    cache.get('b', builder(50, built))
+    assert len(built) == 4  # a stayed, b was evicted and built again
+    # a figure larger than the cap is returned but not kept
+    assert cache.get('huge', builder(5000, built))['data'][0]['x'][-1] == 4999
+    assert 'huge' not in cache._entries
+
+
+def test_invalidate_and_metrics():
+    metrics = Metrics()
+    cache, built = FigureCache(metrics=metrics), []
+    cache.get('a', builder(3, built))
+    cache.invalidate()
+    assert len(cache) == 0 and cache.nbytes == 0
+    cache.get('a', builder(3, built))
+    assert built == [3, 3]
+    assert metrics.snapshot()['latency']['figure.build']['count'] == 2
@@ -0,0 +1,103 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Incremental re-scoring against rating.build_rating over all the rows at once, and
+delta exports patched into the base export, by hand and by the dashboard.
+'''
+
+# import modules
+import numpy as np
+import pandas as pd
+import benchmark
+import rating
+from incremental import RatingState, apply_delta, write_delta
+from tables import delta_base_file, table_file
+
+
+# Rating rows in user order
+def by_user(rating_df):
+    return rating_df.sort_values('user').reset_index(drop=True)
+
+
+# the processed rows split into the initial load and two later batches
+def batches(processed):
+    return [{role: df.iloc[i::3] for role, df in processed.items()} for i in range(3)]
+
+
+def test_updates_match_a_full_rebuild(processed):
+    first, *later = batches(processed)
+    state = RatingState.from_processed(first['disposals'], first['locations'], first['receiving'])
+    seen = dict(first)
+    for batch in later:
+        delta = state.update(batch)
+        seen = {role: pd.concat([seen[role], batch[role]]) for role in rating.ROLES}
+        expected = by_user(rating.build_rating(seen['disposals'], seen['locations'], seen['receiving']))
+        # same dropped locations user as the full build, as long as it was first from the start
+        assert state.dropped_user == processed['locations']['user'].min()
+        pd.testing.assert_frame_equal(by_user(state.rating_table()), expected, check_dtype=False)
+        # the delta holds the batch's users, with their rows of the full table
+        assert set(delta['user']) >= set().union(*[set(df['user']) for df in batch.values()]) - {state.dropped_user}
+        pd.testing.assert_frame_equal(by_user(delta), expected[expected['user'].isin(delta['user'])]
+                                      .reset_index(drop=True), check_dtype=False)
+
+
+def test_new_user_ahead_of_the_dropped_user_is_kept(processed):
+    state = RatingState.from_processed(processed['disposals'], processed['locations'], processed['receiving'])
+    dropped = state.dropped_user
+    row = processed['locations'].iloc[:1].assign(user='A')
+    assert 'A' < dropped
+    state.update({'locations': row})
+    users = set(state.role_table('locations')['user'])
+    assert 'A' in users and dropped not in users
+
+
+def test_save_and_load_keep_the_state(processed, tmp_path):
+    state = RatingState.from_processed(processed['disposals'], processed['locations'], processed['receiving'])
+    state.update({'locations': processed['locations'].iloc[:1].assign(user='A')})
+    state.save(str(tmp_path))
+    loaded = RatingState.load(str(tmp_path))
+    assert loaded.dropped_user == state.dropped_user and loaded.changed == state.changed == {'A'}
+    pd.testing.assert_frame_equal(by_user(loaded.rating_table()), by_user(state.rating_table()), check_dtype=False)
+
+
+def test_deltas_patch_the_base_export(processed, tmp_path):
+    first, *later = batches(processed)
+    state = RatingState.from_processed(first['disposals'], first['locations'], first['receiving'])
+    base = state.rating_table()
+    base_all = rating.build_rating_all(base)
+    seen = dict(first)
+    for i, batch in enumerate(later):
+        state.update(batch)
+        seen = {role: pd.concat([seen[role], batch[role]]) for role in rating.ROLES}
+        # every delta holds the changes since the base, the earlier deltas aren't needed
+        version = '0412-%d' % (i + 1)
+        write_delta(state, str(tmp_path), version, '0412', formats=('csv',))
+        assert (tmp_path / delta_base_file(version)).read_text() == '0412\n'
+        delta = pd.read_csv(tmp_path / table_file('Rating_delta', version), dtype={'user': str})
+        rating_df, rating_all = apply_delta(base, base_all, delta)
+        expected = rating.build_rating(seen['disposals'], seen['locations'], seen['receiving'])
+        # std_err_cost_* follow the global mean/std, which the unchanged rows keep from the base
+        columns = [col for col in expected.columns if not col.startswith('std_err_cost_')]
+        pd.testing.assert_frame_equal(by_user(rating_df)[columns], by_user(expected)[columns], check_dtype=False)
+        pd.testing.assert_frame_equal(by_user(rating_all), by_user(rating.build_rating_all(expected)),
+                                      check_dtype=False)
+
+
+def test_dashboard_builds_a_delta_version(dashboard, processed, table_dir):
+    state = RatingState.from_processed(processed['disposals'], processed['locations'], processed['receiving'])
+    state.update({'disposals': processed['disposals'].iloc[:200], 'receiving': processed['receiving'].iloc[:50]})
+    write_delta(state, table_dir, 'bench-1', benchmark.data_version, formats=('arrow',))
+    served = dashboard.snapshot()
+    snapshot = dashboard.build_snapshot('bench-1')
+    assert snapshot.version == 'bench-1'
+    expected = state.rating_table().set_index('user')['total_rating'].round(6)
+    changed = [user for user in sorted(state.changed) if expected[user] > 0]
+    assert changed
+    np.testing.assert_allclose(snapshot.df_user.loc[changed, 'total_rating'], expected[changed], rtol=1e-6, atol=1e-6)
+    # the other users and the locations are the base version's
+    unchanged = served.df_user.index.difference(sorted(state.changed))
+    pd.testing.assert_series_equal(snapshot.df_user.loc[unchanged, 'total_rating'],
+                                   served.df_user.loc[unchanged, 'total_rating'])
+    pd.testing.assert_frame_equal(snapshot.df_location, served.df_location)
+    assert list(snapshot.df_user['total_rating']) == sorted(snapshot.df_user['total_rating'], reverse=True)
@@ -0,0 +1,87 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+The dashboard's in-memory indexes against brute-force answers over the tables.
+'''
+
+# import modules
+import numpy as np
+import pandas as pd
+import pytest
+import rating
+from encoding import encode_columns, new_dictionaries
+from indexes import LocationUserIndex, RankingIndex
+
+
+# df_user as the dashboard holds it: index user, sorted by total rating, descending
+@pytest.fixture(scope='module')
+def df_user(processed):
+    rating_df = rating.build_rating(processed['disposals'], processed['locations'], processed['receiving'])
+    return rating_df.set_index('user').sort_values('total_rating', ascending=False, kind='stable')
+
+
+# location/user pairs of every role, plus a pair of a user without a rating row
+@pytest.fixture(scope='module')
+def pairs(processed):
+    pairs = pd.concat([df[['location', 'user']] for df in processed.values()])
+    pairs = pd.concat([pairs, pd.DataFrame({'location': ['BUSINESS_0'], 'user': ['NOBODY']})])
+    return pairs.drop_duplicates(ignore_index=True)
+
+
+def test_location_user_index_matches_brute_force(df_user, pairs):
+    dictionaries = new_dictionaries()
+    encoded = encode_columns(pairs, dictionaries).set_index('location')
+    index = LocationUserIndex(encoded, df_user, dictionaries)
+    rated = pairs[pairs['user'].isin(df_user.index)]
+    for location in pairs['location'].unique():
+        users = set(rated.loc[rated['location'] == location, 'user'])
+        expected = np.flatnonzero(df_user.index.isin(users))
+        np.testing.assert_array_equal(index.rows(location), expected)
+    for user in df_user.index[:50]:
+        assert set(index.locations_of(user)) == set(rated.loc[rated['user'] == user, 'location'])
+    assert len(index.rows('BUSINESS_NONE')) == 0
+    assert len(index.locations_of('NOBODY')) == 0
+
+
+# descending stable order of a column, like nlargest / sort_values(ascending=False)
+def brute_order(values):
+    return np.argsort(-np.asarray(values, dtype=float), kind='stable')
+
+
+def assert_ranking_matches(index, df, col):
+    order = brute_order(df[col])
+    np.testing.assert_array_equal(index.top(col), order)
+    np.testing.assert_array_equal(index.top(col, 7), order[:7])
+    np.testing.assert_array_equal(index.bottom(col, 7), order[-7:])
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = np.arange(1, len(order) + 1)
+    np.testing.assert_array_equal(index.ranks(col, np.arange(len(order))), ranks)
+    for key in df.index[::37]:
+        assert index.rank(col, key) == ranks[df.index.get_loc(key)]
+
+
+def test_ranking_index_matches_sorting(df_user):
+    # ties: the ratings rounded to few distinct values
+    df = df_user[['total_rating', 'disposals_rating']].round(1).sample(frac=1, random_state=0)
+    index = RankingIndex(df, ['total_rating', 'disposals_rating'])
+    for col in df.columns:
+        assert_ranking_matches(index, df, col)
+    np.testing.assert_array_equal(index.top('total_rating', 100),
+                                  df.index.get_indexer(df.nlargest(100, 'total_rating').index))
+
+
+def test_ranking_index_updates_match_a_rebuild():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'total_rating': rng.integers(0, 5, 200).astype(float)},
+                      index=['USER%04d' % i for i in range(200)])
+    index = RankingIndex(df, ['total_rating'])
+    for step in range(300):
+        key = 'USER%04d' % rng.integers(0, 230)
+        value = float(rng.integers(-1, 7))
+        index.update(key, {'total_rating': value})
+        df.loc[key, 'total_rating'] = value
+        if step % 50 == 0:
+            assert_ranking_matches(index, df, 'total_rating')
+    assert list(index.keys) == list(df.index)
+    assert_ranking_matches(index, df, 'total_rating')
@@ -0,0 +1,94 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Streaming ingest against the whole extract read at once, deduped in memory or by partition,
+and SeenRows against a set.
+'''
+
+# import modules
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import ingest
+import rating
+from cube import AggregateCube
+
+
+# sums of a table, rows and columns in a fixed order
+def sorted_sums(sums):
+    return sums.sort_index().astype(float)
+
+
+@pytest.mark.parametrize('role', list(ingest.SOURCES))
+def test_ingest_role_matches_whole_extract(extracts, processed, role):
+    user_sums, location_sums, location_users = ingest.ingest_role(extracts[role], role, chunksize=700)
+    pd.testing.assert_frame_equal(sorted_sums(user_sums),
+                                  sorted_sums(ingest.partial_sums(processed[role], role, 'user')))
+    pd.testing.assert_frame_equal(sorted_sums(location_sums),
+                                  sorted_sums(ingest.partial_sums(processed[role], role, 'location')))
+    expected = processed[role][['location', 'user']].drop_duplicates()
+    assert not location_users.duplicated().any()
+    assert set(map(tuple, location_users.to_numpy())) == set(map(tuple, expected.to_numpy()))
+    pd.testing.assert_frame_equal(ingest.rate_user_sums(user_sums, role), rating.rate_role(processed[role], role),
+                                  check_dtype=False)
+
+
+def test_large_extracts_dedupe_one_partition_at_a_time(extracts, raw, processed, monkeypatch, tmp_path,
+                                                       role='disposals'):
+    expected = ingest.ingest_role(extracts[role], role, chunksize=700)
+    held = []
+    add = ingest.SeenRows.add
+
+    def counted_add(seen, hashes):
+        keep = add(seen, hashes)
+        held.append(len(seen))
+        return keep
+    monkeypatch.setattr(ingest.SeenRows, 'add', counted_add)
+    # five partitions
+    monkeypatch.setattr(ingest, 'partition_bytes', os.path.getsize(extracts[role]) // 5 + 1)
+    monkeypatch.setattr(ingest, 'spill_rows', 1000)
+    processed_path = str(tmp_path / 'processed.csv')
+    streamed = AggregateCube()
+    got = ingest.ingest_role(extracts[role], role, chunksize=700, processed_path=processed_path, cube=streamed,
+                             spill_dir=str(tmp_path / 'spill'))
+    for part, want in zip(got[:2], expected[:2]):
+        pd.testing.assert_frame_equal(sorted_sums(part), sorted_sums(want))
+    assert set(map(tuple, got[2].to_numpy())) == set(map(tuple, expected[2].to_numpy()))
+    assert len({name.split('.')[1] for name in os.listdir(str(tmp_path / 'spill'))}) == 5
+    # no partition held more than a fraction of the distinct rows
+    assert max(held) < len(raw[role]) / 2
+    written = pd.read_csv(processed_path, dtype={'location': str, 'user': str})
+    pd.testing.assert_frame_equal(written.sort_values(list(written.columns), ignore_index=True),
+                                  processed[role].sort_values(list(written.columns), ignore_index=True),
+                                  check_dtype=False)
+    whole = AggregateCube()
+    whole.add(processed[role], role, ingest.transaction_years(raw[role], role))
+    pd.testing.assert_frame_equal(streamed.facts[role].sort_index(), whole.facts[role].sort_index(),
+                                  check_dtype=False)
+
+
+def test_ingest_without_dedupe_counts_repeated_rows(extracts, raw, role='locations'):
+    user_sums = ingest.ingest_role(extracts[role], role, dedupe=False, chunksize=700)[0]
+    assert user_sums['n'].sum() == len(pd.read_csv(extracts[role], dtype=str))
+    assert ingest.ingest_role(extracts[role], role, chunksize=700)[0]['n'].sum() == len(raw[role])
+
+
+def test_seen_rows_matches_a_set():
+    rng = np.random.default_rng(0)
+    seen, expected = ingest.SeenRows(), set()
+    for size in [1, 50, 3, 400, 0, 120, 1000, 7, 64]:
+        hashes = rng.integers(0, 500, size).astype(np.uint64)
+        keep = seen.add(hashes)
+        new = []
+        for h in hashes.tolist():
+            new.append(h not in expected)
+            expected.add(h)
+        np.testing.assert_array_equal(keep, new)
+        assert len(seen) == len(expected)
+    # the runs stay sorted and at least double in size from the newest to the oldest
+    for older, newer in zip(seen.runs, seen.runs[1:]):
+        assert len(older) > 2 * len(newer)
+    for run in seen.runs:
+        assert (np.diff(run.astype(np.float64)) > 0).all()
@@ -0,0 +1,159 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+The S3 loader's cache against an in-memory stand-in for the boto3 client.
+'''
+
+# import modules
+import datetime
+import hashlib
+import os
+import threading
+import pandas as pd
+import pytest
+from botocore.exceptions import ClientError
+import loader
+import tables
+
+
+# streaming body of an object; truncated: deliver only the first half
+class Body:
+    def __init__(self, data, truncated=False):
+        self.data = data[:len(data) // 2] if truncated else data
+
+    def iter_chunks(self, size):
+        for i in range(0, len(self.data), 3):
+            yield self.data[i:i + 3]
+
+    def read(self):
+        return self.data
+
+
+# the boto3 calls the loader makes, counted; errors: {key: S3 error code} of keys whose
+# calls fail
+class FakeClient:
+    def __init__(self):
+        self.objects = {}
+        self.errors = {}
+        self.heads = self.gets = 0
+        self.truncated = False
+        self.lock = threading.Lock()
+
+    def put(self, key, data):
+        self.objects[key] = (data, '"%s"' % hashlib.md5(data).hexdigest(), datetime.datetime.now())
+
+    # the object of a key, or the error boto3 raises (HEAD requests get a bare 404)
+    def _object(self, key, operation, missing):
+        code = self.errors.get(key, None if key in self.objects else missing)
+        if code is not None:
+            raise ClientError({'Error': {'Code': code}}, operation)
+        return self.objects[key]
+
+    def head_object(self, Bucket, Key):
+        with self.lock:
+            self.heads += 1
+        data, etag, modified = self._object(Key, 'HeadObject', '404')
+        return {'ETag': etag, 'LastModified': modified}
+
+    def get_object(self, Bucket, Key):
+        with self.lock:
+            self.gets += 1
+        data, etag, modified = self._object(Key, 'GetObject', 'NoSuchKey')
+        return {'Body': Body(data, self.truncated), 'ETag': etag, 'LastModified': modified,
+                'ContentLength': len(data)}
+
+
+@pytest.fixture
+def client():
+    client = FakeClient()
+    client.put('table.Rating.0412.csv', b'user,total_rating\nUSER1,0.5\nUSER2,0.25\n')
+    return client
+
+
+def cached(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_cache_is_validated_once_per_process(client, tmp_path):
+    backend = loader.S3Backend('bucket', str(tmp_path), client=client)
+    path = backend.path('table.Rating.0412.csv')
+    assert cached(path) == client.objects['table.Rating.0412.csv'][0]
+    assert (client.gets, client.heads) == (1, 0)
+    # validated by this process: no request at all
+    backend.path('table.Rating.0412.csv')
+    assert (client.gets, client.heads) == (1, 0)
+    # another process checks the entry once, and doesn't download an unchanged object
+    other = loader.S3Backend('bucket', str(tmp_path), client=client)
+    other.path('table.Rating.0412.csv')
+    other.path('table.Rating.0412.csv')
+    assert (client.gets, client.heads) == (1, 1)
+    # a changed object is downloaded again
+    client.put('table.Rating.0412.csv', b'user,total_rating\nUSER3,1.0\n')
+    loader.S3Backend('bucket', str(tmp_path), client=client).path('table.Rating.0412.csv')
+    assert cached(path) == b'user,total_rating\nUSER3,1.0\n'
+
+
+def test_truncated_download_keeps_the_cached_copy(client, tmp_path):
+    path = loader.S3Backend('bucket', str(tmp_path), client=client).path('table.Rating.0412.csv')
+    old = cached(path)
+    client.put('table.Rating.0412.csv', b'user,total_rating\nUSER3,1.0\n')
+    client.truncated = True
+    with pytest.raises(IOError):
+        loader.S3Backend('bucket', str(tmp_path), client=client).path('table.Rating.0412.csv')
+    assert cached(path) == old
+    assert sorted(os.listdir(str(tmp_path))) == ['table.Rating.0412.csv', 'table.Rating.0412.csv.meta.json']
+
+
+def test_concurrent_refreshes_dont_collide(client, tmp_path):
+    loader.S3Backend('bucket', str(tmp_path), client=client).path('table.Rating.0412.csv')
+    client.put('table.Rating.0412.csv', b'user,total_rating\nUSER3,1.0\n' * 1000)
+    errors = []
+
+    def refresh():
+        try:
+            loader.S3Backend('bucket', str(tmp_path), client=client).path('table.Rating.0412.csv')
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=refresh) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert cached(str(tmp_path / 'table.Rating.0412.csv')) == client.objects['table.Rating.0412.csv'][0]
+    assert sorted(os.listdir(str(tmp_path))) == ['table.Rating.0412.csv', 'table.Rating.0412.csv.meta.json']
+
+
+def test_load_tables_and_published_version(client, tmp_path):
+    client.put(tables.version_file, b'0412\n')
+    backend = loader.S3Backend('bucket', str(tmp_path), client=client)
+    assert loader.published_version(backend) == '0412'
+    data = loader.load_tables(backend, {'user': ('table.Rating.0412.csv', ['user']),
+                                        'missing': ('table.Rating.0413.csv', None)}, optional=('missing',))
+    pd.testing.assert_frame_equal(data['user'], pd.DataFrame({'user': ['USER1', 'USER2']}))
+    assert data['missing'] is None
+    with pytest.raises(FileNotFoundError):
+        loader.load_tables(backend, {'missing': ('table.Rating.0413.csv', None)})
+    assert loader.published_version(loader.LocalBackend(str(tmp_path / 'none'))) is None
+
+
+def test_only_missing_objects_count_as_missing(client, tmp_path):
+    backend = loader.S3Backend('bucket', str(tmp_path), client=client)
+    assert loader.published_version(backend) is None
+    # an object that exists but can't be read isn't missing
+    client.put(tables.version_file, b'0412\n')
+    client.errors[tables.version_file] = 'AccessDenied'
+    with pytest.raises(ClientError):
+        loader.published_version(backend)
+    client.errors['table.Rating.0412.csv'] = 'SlowDown'
+    with pytest.raises(ClientError):
+        loader.load_tables(backend, {'user': ('table.Rating.0412.csv', None)}, optional=('user',))
+    # nor is a local file that doesn't parse
+    (tmp_path / 'local').mkdir()
+    (tmp_path / 'local' / 'table.Rating.0412.parquet').write_bytes(b'not parquet')
+    with pytest.raises(Exception) as error:
+        loader.load_tables(loader.LocalBackend(str(tmp_path / 'local')),
+                           {'user': ('table.Rating.0412.parquet', None)}, optional=('user',))
+    assert not isinstance(error.value, FileNotFoundError)
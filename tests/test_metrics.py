@@ -0,0 +1,96 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Latency histograms, the instrumented Dash app's /metrics endpoints and the profiler.
+'''
+
+# import modules
+import json
+import time
+import dash
+import pytest
+from dash import html
+from dash.dependencies import Input, Output
+import metrics as metrics_module
+from metrics import Histogram, Metrics, SamplingProfiler, instrument_dash
+
+
+def test_histogram_quantiles_are_bucket_bounds():
+    histogram = Histogram()
+    for ms in [0.5] * 90 + [30] * 9 + [700]:
+        histogram.observe(ms, nbytes=10)
+    summary = histogram.summary()
+    assert summary['count'] == 100 and summary['max_ms'] == 700
+    assert (summary['p50_ms'], summary['p95_ms'], summary['p99_ms']) == (1, 50, 50)
+    assert histogram.quantile(1.0) == 700  # the open last bucket is capped by the maximum
+    assert summary['buckets_ms'] == {'1': 90, '50': 9, '1000': 1}
+    assert summary['mean_bytes'] == 10
+    assert Histogram().summary()['p50_ms'] == 0.0
+
+
+def test_timer_and_gauges():
+    metrics = Metrics()
+    with metrics.timer('load.user'):
+        time.sleep(0.01)
+    calls = []
+    metrics.gauge('cache', lambda: calls.append(1) or {'hits': len(calls)})
+    snapshot = metrics.snapshot()
+    assert snapshot['latency']['load.user']['count'] == 1
+    assert snapshot['latency']['load.user']['max_ms'] >= 10
+    assert snapshot['gauges'] == {'cache': {'hits': 1}}
+    assert metrics.snapshot()['gauges'] == {'cache': {'hits': 2}}  # evaluated on every snapshot
+
+
+@pytest.fixture
+def client():
+    app = dash.Dash(__name__)
+    app.layout = html.Div([html.Div(id='in'), html.Div(id='out')])
+
+    @app.callback(Output('out', 'children'), Input('in', 'children'))
+    def echo(value):
+        return value
+
+    instrument_dash(app, Metrics(), profiling=True)
+    return app.server.test_client()
+
+
+def test_callbacks_are_timed_and_served_locally_only(client):
+    response = client.post('/_dash-update-component', json={
+        'output': 'out.children', 'outputs': {'id': 'out', 'property': 'children'},
+        'inputs': [{'id': 'in', 'property': 'children', 'value': 'x'}], 'changedPropIds': ['in.children']})
+    assert response.status_code == 200
+    served = json.loads(client.get('/metrics').data)
+    assert served['latency']['callback.echo']['count'] == 1
+    assert served['latency']['callback.echo']['mean_bytes'] > 0
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '10.0.0.1'}).status_code == 404
+
+
+def test_profile_seconds_are_validated_and_clamped(client, monkeypatch):
+    for seconds in ['abc', 'nan', '']:
+        assert client.get('/metrics/profile?seconds=' + seconds).status_code == 400
+    slept = []
+    monkeypatch.setattr(metrics_module.time, 'sleep', slept.append)
+    assert client.get('/metrics/profile?seconds=-5').status_code == 200
+    assert client.get('/metrics/profile?seconds=1e9').status_code == 200
+    assert client.get('/metrics/profile?seconds=inf').status_code == 200
+    assert slept == [metrics_module.profile_seconds[0]] + [metrics_module.profile_seconds[1]] * 2
+
+
+def test_profiling_is_opt_in():
+    app = dash.Dash(__name__)
+    app.layout = html.Div()
+    instrument_dash(app, Metrics())
+    assert app.server.test_client().get('/metrics/profile?seconds=1').status_code == 404
+
+
+def test_sampling_profiler_folds_other_threads_stacks():
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        pass
+    folded = profiler.stop()
+    assert 'test_sampling_profiler_folds_other_threads_stacks' in folded
+    stack, count = folded.splitlines()[0].rsplit(' ', 1)
+    assert int(count) > 0 and ';' in stack
@@ -0,0 +1,91 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+The parallel pipeline against the in-memory ingest and rating of the same extracts.
+'''
+
+# import modules
+import os
+import pandas as pd
+import pytest
+import ingest
+import pipeline
+import rating
+from encoding import decode_columns, new_dictionaries
+
+
+# one role's (user_sums, location_sums, location_users) in a fixed order
+def ordered(result):
+    user_sums, location_sums, location_users = result
+    return (user_sums.sort_index().astype(float), location_sums.sort_index().astype(float),
+            location_users.sort_values(['location', 'user'], ignore_index=True))
+
+
+def assert_results_equal(result, expected):
+    for got, want in zip(ordered(result), ordered(expected)):
+        pd.testing.assert_frame_equal(got, want)
+
+
+# the notebook's Rating, Rating_all and Location_Rating of the processed tables
+def in_memory_tables(processed):
+    rating_df = rating.build_rating(processed['disposals'], processed['locations'], processed['receiving'])
+    location_rating = rating.location_rollup({role: df[['location', 'user']] for role, df in processed.items()},
+                                             {role: rating.rate_role(df, role) for role, df in processed.items()})
+    return rating_df, rating.build_rating_all(rating_df), location_rating
+
+
+def test_line_ranges_cover_the_rows(extracts):
+    path = extracts['disposals']
+    ranges = pipeline.line_ranges(path, size=10000)
+    assert len(ranges) > 5
+    with open(path, 'rb') as f:
+        content = f.read()
+    # contiguous, from the end of the header to the end of the file, each starting a line
+    assert ranges[0][0] == content.index(b'\n') + 1 and ranges[-1][1] == len(content)
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start
+    assert all(content[start - 1:start] == b'\n' for start, _ in ranges)
+
+
+def test_user_shards_are_stable():
+    users = ['USER%06d' % i for i in range(100)]
+    shards = pipeline.user_shards(users, 7)
+    assert ((shards >= 0) & (shards < 7)).all()
+    assert (pipeline.user_shards(users[::-1], 7) == shards[::-1]).all()
+
+
+@pytest.fixture(scope='module')
+def results(extracts, tmp_path_factory):
+    spill_dir = str(tmp_path_factory.mktemp('shards'))
+    return spill_dir, pipeline.run_pipeline(extracts, workers=2, n_shards=3, size=50000, spill_dir=spill_dir)
+
+
+def test_run_pipeline_matches_ingest(extracts, results):
+    spill_dir, results = results
+    for role, path in extracts.items():
+        assert_results_equal(results[role], ingest.ingest_role(path, role))
+    # the rows went through shard files, several map ranges per role
+    files = os.listdir(spill_dir)
+    assert len([name for name in files if name.startswith('disposals.')]) > 3
+
+
+def test_build_tables_matches_the_in_memory_tables(processed, results):
+    for got, expected in zip(pipeline.build_tables(results[1]), in_memory_tables(processed)):
+        pd.testing.assert_frame_equal(got.reset_index(drop=True), expected.reset_index(drop=True), check_dtype=False)
+
+
+def test_encoded_pipeline_builds_the_same_tables(extracts, processed):
+    dictionaries = new_dictionaries()
+    results = pipeline.run_pipeline(extracts, workers=2, size=200000, dictionaries=dictionaries)
+    assert pd.api.types.is_integer_dtype(results['disposals'][0].index)
+    for got, expected in zip(pipeline.build_tables(results, dictionaries), in_memory_tables(processed)):
+        pd.testing.assert_frame_equal(got.reset_index(drop=True), expected.reset_index(drop=True), check_dtype=False)
+    # exported with the location/user pairs and the dictionaries the dashboard decodes them with
+    tables = pipeline.output_tables(results, dictionaries)
+    assert set(tables) == {'Rating', 'Rating_all', 'Location_Rating', 'Dictionary_user', 'Dictionary_location'} | \
+        {'processed_%s_df_1' % role for role in rating.ROLES}
+    for role, df in processed.items():
+        pairs = decode_columns(tables['processed_' + role + '_df_1'], dictionaries)
+        assert set(map(tuple, pairs[['location', 'user']].to_numpy())) == set(map(tuple, df[['location', 'user']].to_numpy()))
+
@@ -0,0 +1,127 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+rating.py against the modeling notebook's original pipeline: a per-user groupby loop,
+StandardScaler and MinMaxScaler from sklearn, the weights, the outer joins.
+'''
+
+# import modules
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+import rating
+from encoding import encode_columns, new_dictionaries
+
+
+# the notebook's per-user loop of a role (cells 22, 52, 89)
+def notebook_aggregate(processed_df, role):
+    rows = []
+    for user, row in processed_df.groupby('user'):
+        out = {'user': user}
+        for col, name, _ in rating.ROLES[role]['actions']:
+            out[name + '_#'] = row[col].sum()
+        out['org_cost_' + role] = row['ori_cost'].sum()
+        out['err_cost_' + role] = row['err_cost'].sum()
+        for col, name, _ in rating.ROLES[role]['actions']:
+            out[name + '_%'] = row[col].sum() / len(row)
+        out['err_cost_' + role + '_%'] = row['err_cost'].sum() / row['ori_cost'].sum()
+        rows.append(out)
+    return pd.DataFrame(rows)
+
+
+# the notebook's modeling of a role (cells 23-29, 53-60, 90-97)
+def notebook_model(agg, role):
+    if role == 'receiving':
+        agg = agg.fillna(0)
+    counts = rating.count_columns(role)
+    reference = agg[['user', 'org_cost_' + role] + rating.percent_columns(role) + ['err_cost_' + role + '_%']]
+    df = agg[['user'] + counts + ['err_cost_' + role]].copy()
+    df['std_err_cost_' + role] = StandardScaler().fit_transform(
+        df['err_cost_' + role].astype(float).values.reshape(-1, 1))
+    X = MinMaxScaler(feature_range=(0, 1)).fit_transform(df[counts + ['std_err_cost_' + role]])
+    df[role + '_rating'] = (X * rating.weights(role)).sum(axis=1)
+    df = pd.merge(df, reference, on='user', how='outer')
+    if role == 'locations':
+        df = df.drop([0])
+    return df
+
+
+# the notebook's Rating and Rating_all (cells 111-118)
+def notebook_rating_all(processed):
+    roles = [notebook_model(notebook_aggregate(processed[role], role), role) for role in rating.ROLES]
+    Rating = pd.merge(roles[0], roles[1], on='user', how='outer')
+    Rating = pd.merge(Rating, roles[2], on='user', how='outer')
+    Rating = Rating.fillna(0).drop_duplicates()
+    Rating['total_rating'] = Rating['disposals_rating'] + Rating['locations_rating'] + Rating['receiving_rating']
+    Rating_all = Rating[['user', 'disposals_rating', 'locations_rating', 'receiving_rating', 'total_rating']].copy()
+    Rating_all['disposal_role'] = [1 if d > 0 else 0 for d in Rating['org_cost_disposals']]
+    Rating_all['locations_role'] = [1 if d > 0 else 0 for d in Rating['org_cost_locations']]
+    Rating_all['receiving_role'] = [1 if d > 0 else 0 for d in Rating['org_cost_receiving']]
+    return Rating, Rating_all
+
+
+@pytest.mark.parametrize('role', list(rating.ROLES))
+def test_aggregate_role_matches_notebook_loop(processed, role):
+    expected = notebook_aggregate(processed[role], role)
+    pd.testing.assert_frame_equal(rating.aggregate_role(processed[role], role), expected, check_dtype=False)
+
+
+def test_build_rating_all_matches_notebook(processed):
+    Rating, Rating_all = notebook_rating_all(processed)
+    rating_df = rating.build_rating(processed['disposals'], processed['locations'], processed['receiving'])
+    pd.testing.assert_frame_equal(rating_df.reset_index(drop=True), Rating.reset_index(drop=True),
+                                  check_dtype=False)
+    pd.testing.assert_frame_equal(rating.build_rating_all(rating_df).reset_index(drop=True),
+                                  Rating_all.reset_index(drop=True), check_dtype=False)
+
+
+def test_scalers_match_sklearn():
+    X = np.array([[1, 5, 2], [3, 5, -1], [0, 5, 4], [7, 5, 4]], dtype=float)
+    np.testing.assert_allclose(rating.minmax_scale(X), MinMaxScaler().fit_transform(X))
+    np.testing.assert_allclose(rating.standard_scale(X[:, 0]), StandardScaler().fit_transform(X[:, :1])[:, 0])
+    # a constant column is scaled by 1, like sklearn
+    np.testing.assert_allclose(rating.standard_scale(X[:, 1]), 0)
+
+
+# the notebook's original Location_Rating (cells 32-36, 63-68, 100-105, 120-129): each role's
+# location/user rows joined with the ratings, summed per location in a loop, outer joined
+def notebook_location_rating(processed):
+    location_tables = []
+    for role in rating.ROLES:
+        scored = notebook_model(notebook_aggregate(processed[role], role), role)
+        dashboard_df = pd.merge(processed[role][['location', 'user']], scored, on='user', how='left')
+        if role == 'locations':
+            dashboard_df = dashboard_df.dropna(axis=0, how='any')
+        columns = rating.percent_columns(role) + ['err_cost_' + role + '_%']
+        dashboard_df = dashboard_df.drop_duplicates(['location', 'user', role + '_rating'])
+        dashboard_df = dashboard_df[['location', 'user', role + '_rating'] + columns]
+        if role == 'receiving':
+            dashboard_df = dashboard_df[dashboard_df[role + '_rating'] >= 0]
+        rows = []
+        for location, row in dashboard_df.groupby('location'):
+            rows.append(dict({'location': location, role + '_rating': row[role + '_rating'].sum()},
+                             **{col: row[col].sum() for col in columns}))
+        location_tables.append(pd.DataFrame(rows))
+    Location_Rating = pd.merge(location_tables[0], location_tables[1], on='location', how='outer')
+    Location_Rating = pd.merge(Location_Rating, location_tables[2], on='location', how='outer').fillna(0)
+    Location_Rating['total_rating'] = Location_Rating['disposals_rating'] + \
+        Location_Rating['locations_rating'] + Location_Rating['receiving_rating']
+    Location_Rating['l'] = [int(s[9:]) for s in Location_Rating['location'].values]
+    return Location_Rating.sort_values(by='l').drop('l', axis=1)
+
+
+def test_location_rollup_matches_notebook(processed):
+    expected = notebook_location_rating(processed)
+    location_users = {role: df[['location', 'user']] for role, df in processed.items()}
+    role_ratings = {role: rating.rate_role(df, role) for role, df in processed.items()}
+    rollup = rating.location_rollup(location_users, role_ratings)
+    assert list(rollup['location']) == list(expected['location'])
+    pd.testing.assert_frame_equal(rollup[expected.columns].reset_index(drop=True), expected.reset_index(drop=True),
+                                  check_dtype=False)
+    # the same from integer-coded pairs
+    dictionaries = new_dictionaries()
+    encoded = {role: encode_columns(pairs, dictionaries) for role, pairs in location_users.items()}
+    pd.testing.assert_frame_equal(rating.location_rollup(encoded, role_ratings, dictionaries), rollup,
+                                  check_dtype=False)
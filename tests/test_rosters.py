@@ -0,0 +1,121 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Training rosters against filtering the rating table to each location's users.
+'''
+
+# import modules
+import glob
+import os
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+import benchmark
+import rating
+from loader import LocalBackend
+from rosters import load_roster_tables, location_blocks, roster_file, roster_index, write_rosters
+
+
+# roster tables of the processed rows, with string identifiers and no dictionaries
+@pytest.fixture(scope='module')
+def plain_data(processed):
+    data = {'user': rating.build_rating(processed['disposals'], processed['locations'], processed['receiving']),
+            'dictionary_user': None, 'dictionary_location': None}
+    for role in rating.ROLES:
+        data[role] = processed[role][['location', 'user']]
+    return data
+
+
+# {location: roster} of a location's users with a total rating > 0, best first, with the
+# error types of each role as training areas
+def brute_rosters(data):
+    df_user = data['user'].sort_values('total_rating', ascending=False, kind='stable')
+    df_user = df_user[df_user['total_rating'] > 0]
+    pairs = pd.concat([data[role] for role in rating.ROLES])
+    rosters = {}
+    for location, users in pairs.groupby('location')['user']:
+        roster = df_user[df_user['user'].isin(set(users))].reset_index(drop=True)
+        if not len(roster):
+            continue
+        for role in rating.ROLES:
+            names = [name for _, name, _ in rating.ROLES[role]['actions']]
+            roster['training_' + role] = [', '.join(name for name in names if row[name + '_#'] > 0)
+                                          for _, row in roster.iterrows()]
+        roster.insert(0, 'rank', range(1, len(roster) + 1))
+        rosters[location] = roster
+    return rosters
+
+
+def read_csv_rosters(directory):
+    return {os.path.basename(path)[len('roster.'):-len('.v.csv')]: pd.read_csv(path, dtype={'user': str, 'location': str})
+            for path in glob.glob(os.path.join(directory, 'roster.*.v.csv'))}
+
+
+def assert_roster_equal(got, expected, exact=True):
+    columns = ['rank', 'user', 'total_rating'] + [col for col in got.columns if col.startswith('training_')]
+    got = got.reset_index(drop=True).fillna({col: '' for col in columns if col.startswith('training_')})
+    if exact:
+        pd.testing.assert_frame_equal(got[columns], expected[columns], check_dtype=False, check_names=False)
+    else:
+        # float32 exports: the same users, ranked by a non-increasing total rating
+        assert set(got['user']) == set(expected['user']) and list(got['rank']) == list(expected['rank'])
+        assert got['total_rating'].is_monotonic_decreasing
+        merged = got.merge(expected, on='user')
+        pd.testing.assert_series_equal(merged['total_rating_x'], merged['total_rating_y'], check_names=False,
+                                       rtol=1e-5)
+        for col in columns[3:]:
+            assert list(merged[col + '_x']) == list(merged[col + '_y'])
+
+
+def test_csv_rosters_match_filtering(plain_data, tmp_path):
+    expected = brute_rosters(plain_data)
+    paths = write_rosters(plain_data, str(tmp_path), 'v', size=50)
+    assert sorted(paths) == sorted(str(tmp_path / roster_file(location, 'v')) for location in expected)
+    got = read_csv_rosters(str(tmp_path))
+    for location, roster in expected.items():
+        assert (got[location]['location'] == location).all()
+        assert_roster_equal(got[location], roster)
+
+
+@pytest.mark.parametrize('size', [1, 50, 10 ** 6])
+def test_parquet_rosters_hold_whole_locations_per_row_group(plain_data, tmp_path, size):
+    expected = brute_rosters(plain_data)
+    path, = write_rosters(plain_data, str(tmp_path), 'v', fmt='parquet', size=size)
+    parquet = pq.ParquetFile(path)
+    seen = set()
+    for i in range(parquet.num_row_groups):
+        locations = set(parquet.read_row_group(i, columns=['location']).column(0).to_pylist())
+        assert not locations & seen
+        seen |= locations
+    table = parquet.read().to_pandas()
+    assert list(table['location']) == sorted(table['location'])
+    assert seen == set(expected)
+    for location, roster in table.groupby('location'):
+        assert_roster_equal(roster, expected[location])
+
+
+def test_min_rating(plain_data):
+    df_user, index = roster_index(plain_data, min_rating=0.5)
+    assert (df_user['total_rating'] > 0.5).all()
+    assert len(df_user) == (plain_data['user']['total_rating'] > 0.5).sum()
+
+
+def test_location_blocks_cover_every_location_once(plain_data):
+    _, index = roster_index(plain_data)
+    for size in [1, 7, 100, 10 ** 6]:
+        blocks = location_blocks(index, size)
+        codes = [code for block in blocks for code in block]
+        assert sorted(codes) == sorted(set(codes))
+        assert [str(location) for location in index.locations[codes]] == \
+            sorted(str(location) for location in index.locations[codes])
+
+
+def test_rosters_of_the_exported_tables(table_dir, plain_data, tmp_path):
+    data = load_roster_tables(LocalBackend(table_dir), benchmark.data_version, '.parquet')
+    expected = brute_rosters(plain_data)
+    write_rosters(data, str(tmp_path), 'v')
+    got = read_csv_rosters(str(tmp_path))
+    assert sorted(got) == sorted(expected)
+    for location, roster in expected.items():
+        assert_roster_equal(got[location], roster, exact=False)
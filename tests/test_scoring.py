@@ -0,0 +1,71 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+What-if scores against re-running the rating model with the same weights.
+'''
+
+# import modules
+import copy
+import numpy as np
+import pandas as pd
+import pytest
+import rating
+from scoring import (WeightScorer, all_weight_names, default_weights, feature_table, location_features, ranks,
+                     top_positions)
+
+
+@pytest.fixture(scope='module')
+def scorer_tables(processed):
+    features = feature_table({role: rating.aggregate_role(df, role) for role, df in processed.items()})
+    location_users = {role: df[['location', 'user']] for role, df in processed.items()}
+    features = features.set_index('user')
+    return WeightScorer(features, location_features(features, location_users)), location_users
+
+
+# Rating and Location_Rating of the rating model with other weights ({name: weight})
+def rated_with(processed, location_users, weights, monkeypatch):
+    roles = copy.deepcopy(rating.ROLES)
+    for role, model in roles.items():
+        model['actions'] = [(col, name, weights.get(name, w)) for col, name, w in model['actions']]
+        model['cost_weight'] = weights.get('err_cost_' + role, model['cost_weight'])
+    monkeypatch.setattr(rating, 'ROLES', roles)
+    rating_df = rating.build_rating(processed['disposals'], processed['locations'], processed['receiving'])
+    role_ratings = {role: rating.rate_role(df, role) for role, df in processed.items()}
+    return rating_df.set_index('user'), rating.location_rollup(location_users, role_ratings).set_index('location')
+
+
+@pytest.mark.parametrize('weights', [{}, {'err_cost_disposals': 0.5, 'scan_type': 0.0, 'misclf_fap': 1.0}])
+def test_scores_match_the_rating_model(processed, scorer_tables, monkeypatch, weights):
+    scorer, location_users = scorer_tables
+    full = dict(default_weights(), **weights)
+    users, locations = rated_with(processed, location_users, full, monkeypatch)
+    scored = scorer.score(full)
+    columns = [role + '_rating' for role in rating.ROLES] + ['total_rating']
+    pd.testing.assert_frame_equal(scored.sort_index(), users[columns].sort_index(), check_names=False)
+    np.testing.assert_allclose(scorer.total(full), users['total_rating'].reindex(scorer.users).to_numpy())
+    totals = pd.Series(scorer.location_total(full), index=scorer.locations)
+    pd.testing.assert_series_equal(totals.sort_index(), locations['total_rating'].sort_index(), check_names=False)
+    # a subset of the users
+    rows = np.array([3, 0, 7])
+    pd.testing.assert_frame_equal(scorer.score(full, rows), scored.iloc[rows])
+
+
+def test_weights_vector():
+    names = all_weight_names()
+    assert len(names) == len(set(names)) == len(default_weights())
+    scorer = WeightScorer(pd.DataFrame(np.eye(len(names)), columns=names, index=list('abcdefghi')[:len(names)]))
+    vector = scorer.vector({'err_cost_receiving': 2.0})
+    assert vector[names.index('err_cost_receiving')] == 2.0
+    np.testing.assert_allclose(np.delete(vector, names.index('err_cost_receiving')),
+                               [w for name, w in default_weights().items() if name != 'err_cost_receiving'])
+
+
+def test_top_positions_and_ranks_match_sorting():
+    values = np.random.default_rng(0).integers(0, 20, 500).astype(float)
+    order = np.argsort(-values, kind='stable')
+    for k in [0, 1, 7, 499, 500, 600]:
+        np.testing.assert_array_equal(top_positions(values, k), order[:k])
+    expected = np.empty(len(values), dtype=np.int64)
+    expected[order] = np.arange(1, len(values) + 1)
+    np.testing.assert_array_equal(ranks(values), expected)
@@ -0,0 +1,106 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Typeahead search against scanning every name: exact and prefix matches by score, trigram
+(Dice) similarity of the fuzzy matches, and the dashboard's search boxes.
+'''
+
+# import modules
+import numpy as np
+import pytest
+import search
+from search import SearchIndex
+
+
+@pytest.fixture(scope='module')
+def names_scores():
+    rng = np.random.default_rng(0)
+    letters = np.array(list('abcdeABé'))
+    names = [''.join(rng.choice(letters, rng.integers(1, 9))) for _ in range(3000)]
+    names += ['abc', 'ABC', 'Abc', 'x', 'ab']
+    # scores rounded to one digit, so ties are common
+    return np.array(names, dtype=object), np.round(rng.random(len(names)), 1)
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+# positions of the k best matches by scanning every name
+def brute_search(names, scores, query, k):
+    query = query.strip().lower()
+    keys = [str(name).lower() for name in names]
+    positions = range(len(names))
+    if not query:
+        return sorted(positions, key=lambda i: (-scores[i], i))[:k]
+    exact = sorted([i for i in positions if keys[i] == query], key=lambda i: (-scores[i], i))
+    # the prefix matches tie by name, then position
+    prefix = sorted([i for i in positions if keys[i] != query and keys[i].startswith(query)],
+                    key=lambda i: (-scores[i], keys[i], i))
+    found = (exact + prefix)[:k]
+    if len(found) >= k or len(query) < 3:
+        return found
+    grams = trigrams(query)
+    similar = []
+    for i in positions:
+        if keys[i].startswith(query) or not trigrams(keys[i]):
+            continue
+        dice = 2 * len(grams & trigrams(keys[i])) / (len(grams) + len(trigrams(keys[i])))
+        if dice >= search.min_similarity:
+            similar.append((-dice, -scores[i], i))
+    return found + [i for _, _, i in sorted(similar)][:k - len(found)]
+
+
+@pytest.mark.parametrize('query', ['', '  ', 'a', 'Ab', 'abc', 'ABCd', 'bade', 'éab', 'ccccc', 'zzz', 'abcdeabc'])
+@pytest.mark.parametrize('k', [1, 5, 50])
+def test_matches_scanning_every_name(names_scores, monkeypatch, query, k):
+    # no trigram is too common to produce candidates, so every similar name is found
+    monkeypatch.setattr(search, 'common_share', 1.0)
+    names, scores = names_scores
+    index = SearchIndex(names, scores)
+    assert index.search(query, k).tolist() == brute_search(names, scores, query, k)
+
+
+def test_common_trigrams_only_score_candidates(names_scores):
+    names, scores = names_scores
+    index = SearchIndex(names, scores)
+    for query in ['abcd', 'bade', 'edcba']:
+        got = index.search(query, 200).tolist()
+        expected = brute_search(names, scores, query, 200)
+        # the same ranking, except names sharing only common trigrams with the query
+        assert got == [i for i in expected if i in set(got)]
+        assert len(got) > 0
+
+
+def test_position(names_scores):
+    names, scores = names_scores
+    index = SearchIndex(names, scores)
+    for name in ['abc', 'ABC', 'Abc', 'x', names[17]]:
+        assert names[index.position(name)] == name
+    # the case matters, other names with the same lowercased key aren't the name
+    missing = next(v for v in ['aBC', 'abC', 'aBc', 'AbC', 'ABc'] if v not in set(names))
+    assert index.position(missing) == -1 and index.position('nothing') == -1
+
+
+def test_short_and_empty_names():
+    index = SearchIndex(['a', 'b', 'ab'], [1.0, 3.0, 2.0])
+    assert index.search('', 5).tolist() == [1, 2, 0]
+    assert index.search('a', 5).tolist() == [0, 2] and index.search('abc', 5).tolist() == []
+    assert len(SearchIndex([]).search('abc')) == 0 and len(SearchIndex([]).search('')) == 0
+
+
+def test_dashboard_search_boxes(dashboard):
+    s = dashboard.snapshot()
+    users = s.df_user.index
+    query = users[5][:-2].lower()
+    options = dashboard.callback_user_search(query, None)
+    expected = brute_search(users.to_numpy(), s.df_user.total_rating.to_numpy(), query, dashboard.search_limit)
+    assert [option['value'] for option in options] == users[expected].tolist()
+    assert all(option['search'] == query for option in options)
+    # the selected user stays among the options
+    selected = users[-1]
+    options = dashboard.callback_user_search(query, selected)
+    assert options[-1]['value'] == selected or selected in users[expected]
+    locations = dashboard.callback_location_search(None, None)
+    assert [option['value'] for option in locations] == s.df_location.location.tolist()[:dashboard.search_limit]
@@ -0,0 +1,189 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Hot reload: pinning, swapping, retries of transient failures, skipped bad versions, the
+reported lag, and the dashboard's callbacks for a user the served snapshot doesn't have.
+'''
+
+# import modules
+import threading
+import time
+import types
+import flask
+import pytest
+import benchmark
+import snapshots
+from snapshots import Refresher, SnapshotHolder
+
+
+class Snapshot:
+    def __init__(self, version):
+        self.version = version
+
+
+# builds snapshots, or raises the next queued error
+class Builder:
+    def __init__(self):
+        self.errors = []
+        self.built = []
+
+    def __call__(self, version):
+        self.built.append(version)
+        if self.errors:
+            raise self.errors.pop(0)
+        return Snapshot(version)
+
+
+# a controllable monotonic clock in place of the time module of snapshots.py
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(snapshots, 'time', types.SimpleNamespace(time=time.time, perf_counter=time.perf_counter,
+                                                                 monotonic=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def published():
+    return ['v1']
+
+
+@pytest.fixture
+def builder():
+    return Builder()
+
+
+@pytest.fixture
+def refresher(published, builder):
+    return Refresher(SnapshotHolder(Snapshot('v1')), lambda: published[0], builder, interval=60)
+
+
+def test_new_version_is_built_warmed_and_swapped(published, builder):
+    holder = SnapshotHolder(Snapshot('v1'))
+    warmed, swapped = [], []
+    refresher = Refresher(holder, lambda: published[0], builder, warm=lambda s: warmed.append(holder.get()),
+                          on_swap=swapped.append)
+    assert refresher.check() is False and builder.built == []
+    published[0] = 'v2'
+    assert refresher.check() is True
+    assert holder.current.version == 'v2'
+    # warmed with the new snapshot pinned, before it was swapped in
+    assert warmed == swapped == [holder.current]
+    assert refresher.status()['reloads'] == 1 and refresher.status()['behind_s'] == 0.0
+
+
+def test_transient_failures_are_retried_with_backoff(refresher, published, builder, clock):
+    published[0] = 'v2'
+    builder.errors = [OSError('s3 unavailable'), OSError('s3 unavailable')]
+    assert refresher.check() is False
+    assert refresher.status()['failures'] == 1 and refresher._wait() == snapshots.retry_seconds
+    # not retried before the backoff ends
+    clock[0] += snapshots.retry_seconds - 1
+    refresher.check()
+    assert builder.built == ['v2']
+    clock[0] += 1
+    refresher.check()
+    assert builder.built == ['v2', 'v2'] and refresher.failures == 2
+    assert refresher._wait() == 2 * snapshots.retry_seconds
+    clock[0] += 2 * snapshots.retry_seconds
+    assert refresher.check() is True
+    assert refresher.holder.current.version == 'v2' and refresher.status()['failures'] == 0
+
+
+def test_backoff_is_capped_by_the_interval_and_the_maximum(refresher, published, builder, clock):
+    published[0] = 'v2'
+    builder.errors = [OSError()] * 21
+    for _ in range(20):
+        refresher.check()
+        clock[0] += snapshots.max_retry_seconds
+    assert refresher.retry_at - clock[0] <= 0
+    refresher.check()
+    assert refresher.retry_at - clock[0] == snapshots.max_retry_seconds
+    assert refresher._wait() == refresher.interval
+
+
+def test_deterministic_failure_skips_the_version_until_a_newer_one(refresher, published, builder, clock):
+    published[0] = 'v2'
+    builder.errors = [KeyError('total_rating')]
+    assert refresher.check() is False
+    clock[0] += 10 * snapshots.max_retry_seconds
+    refresher.check()
+    assert builder.built == ['v2'] and refresher.status()['skipped'] == 'v2'
+    assert refresher.holder.current.version == 'v1'
+    published[0] = 'v3'
+    assert refresher.check() is True and refresher.holder.current.version == 'v3'
+
+
+def test_status_reports_the_lag(refresher, published, builder):
+    builder.errors = [OSError()]
+    published[0] = 'v2'
+    refresher.check()
+    time.sleep(0.05)
+    status = refresher.status()
+    assert status['version'] == 'v1' and status['published'] == 'v2' and status['behind_s'] >= 0.05
+    # an unknown published version keeps the lag as it is
+    published[0] = None
+    assert refresher.check() is False and refresher.status()['behind_s'] >= 0.05
+
+
+def test_watch_only_refresher_reports_without_building(published):
+    holder = SnapshotHolder(Snapshot('v1'))
+    refresher = Refresher(holder, lambda: published[0], None)
+    published[0] = 'v2'
+    assert refresher.check() is False
+    assert refresher.status()['published'] == 'v2' and refresher.status()['behind_s'] >= 0
+    # the master swapped and re-forked this worker: the new worker's snapshot is current
+    holder.swap(Snapshot('v2'))
+    refresher.check()
+    assert refresher.status()['behind_s'] == 0.0
+
+
+def test_refresher_thread_reloads(published, builder):
+    refresher = Refresher(SnapshotHolder(Snapshot('v1')), lambda: published[0], builder, interval=0.01).start()
+    try:
+        published[0] = 'v2'
+        deadline = time.time() + 5
+        while refresher.holder.current.version != 'v2' and time.time() < deadline:
+            time.sleep(0.01)
+        assert refresher.holder.current.version == 'v2'
+    finally:
+        refresher.stop()
+
+
+def test_a_request_keeps_its_snapshot_across_a_swap():
+    holder = SnapshotHolder(Snapshot('v1'))
+    server = flask.Flask(__name__)
+    holder.attach(server)
+    swapped = threading.Event()
+
+    @server.route('/')
+    def view():
+        before = holder.get().version
+        holder.swap(Snapshot('v2'))
+        swapped.set()
+        return before + ' ' + holder.get().version
+
+    client = server.test_client()
+    assert client.get('/').data == b'v1 v1'
+    assert swapped.is_set() and client.get('/').data.startswith(b'v2 ')
+    with holder.pinned(Snapshot('v9')):
+        assert holder.get().version == 'v9'
+    assert holder.get().version == holder.current.version
+
+
+def test_dashboard_callbacks_for_a_user_missing_from_the_snapshot(dashboard):
+    assert dashboard.callback_user_selected('NOBODY', 'all') == ([], [], [])
+    assert dashboard.build_user_rating_bar('NOBODY', '90d') == ''
+    snapshot = dashboard.snapshot()
+    location = snapshot.location_index.locations[0]
+    user = snapshot.df_user.index[0]
+    assert dashboard.callback_user_selected(user, 'all')[0][0]['err_cost_disposals'] == \
+        snapshot.df_user.loc[user, 'err_cost_disposals']
+    client = dashboard.server.test_client()
+    for window in ['all', '30d', 'decayed']:
+        requests = benchmark.dashboard_requests(location, 'NOBODY', window)
+        for name in ['callback_user_selected', 'update_info', 'switch_window']:
+            benchmark.dash_call(client, **requests[name])
+    status = dashboard.snapshot_status()
+    assert status['version'] == benchmark.data_version and 'pid' in status
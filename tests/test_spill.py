@@ -0,0 +1,55 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Out-of-core aggregation against the in-memory ingest of the same rows.
+'''
+
+# import modules
+import os
+import subprocess
+import sys
+import tempfile
+import pandas as pd
+import pytest
+import ingest
+import spill
+import tables
+from test_pipeline import assert_results_equal, in_memory_tables
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_aggregate_out_of_core_matches_ingest(extracts, tmp_path, monkeypatch, workers):
+    # several flushes per partition, so a partition is reduced from several files
+    monkeypatch.setattr(spill, 'buffer_rows', 1000)
+    spill_dir = str(tmp_path / 'spill')
+    for role, path in extracts.items():
+        # the same extract twice: every row of the second copy is a duplicate
+        result = spill.aggregate_out_of_core([path, path], role, spill_dir, n_partitions=4, workers=workers,
+                                             chunksize=700)
+        assert_results_equal(result, ingest.ingest_role(path, role))
+    assert len([name for name in os.listdir(spill_dir) if name.startswith('disposals.0.')]) > 1
+
+
+def test_backfill_matches_the_in_memory_tables(extract_dir, processed):
+    for got, expected in zip(spill.backfill([extract_dir, extract_dir], n_partitions=3), in_memory_tables(processed)):
+        pd.testing.assert_frame_equal(got.reset_index(drop=True), expected.reset_index(drop=True), check_dtype=False)
+
+
+def test_command_line_exports_the_dashboard_tables(extract_dir, tmp_path):
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'spill.py')
+    subprocess.run([sys.executable, script, str(tmp_path), '0412', extract_dir], check=True, stdout=subprocess.PIPE)
+    names = ['Rating', 'Rating_all', 'Location_Rating', 'Dictionary_user', 'Dictionary_location'] + \
+        ['processed_%s_df_1' % role for role in ingest.SOURCES]
+    for name in names:
+        assert os.path.exists(str(tmp_path / tables.table_file(name, '0412', '.arrow')))
+
+
+def test_no_rows_and_the_temporary_spill_directory_is_removed(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    path = str(tmp_path / 'empty.csv')
+    with open(path, 'w') as f:
+        f.write(','.join(ingest.SOURCES['locations']['columns']) + '\n')
+    with pytest.raises(ValueError):
+        spill.aggregate_out_of_core([path], 'locations')
+    assert os.listdir(str(tmp_path)) == ['empty.csv']
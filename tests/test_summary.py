@@ -0,0 +1,62 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Home-tab statistics against the dashboard's original row-by-row counting and nlargest.
+'''
+
+# import modules
+import pandas as pd
+import pytest
+import rating
+from indexes import RankingIndex
+from summary import build_home_summary, pie_counts, pie_roles
+
+
+@pytest.fixture(scope='module')
+def home_tables(processed):
+    rating_df = rating.build_rating(processed['disposals'], processed['locations'], processed['receiving'])
+    rating_all = rating.build_rating_all(rating_df).reset_index(drop=True)
+    df_user = rating_df.set_index('user')
+    location_users = {role: df[['location', 'user']] for role, df in processed.items()}
+    role_ratings = {role: rating.rate_role(df, role) for role, df in processed.items()}
+    df_location = rating.location_rollup(location_users, role_ratings).sort_values('total_rating', ascending=False)
+    return df_location, df_user, rating_all
+
+
+# the dashboard's original loop over Rating_all
+def counted(df_rating_all, rating_col, role_col):
+    error = correct = 0
+    for i in range(len(df_rating_all)):
+        if df_rating_all[rating_col][i] == 0 and df_rating_all[role_col][i] == 1:
+            correct += 1
+        else:
+            error += 1
+    return error, correct
+
+
+def test_home_summary_matches_the_original_statistics(home_tables):
+    df_location, df_user, rating_all = home_tables
+    rating_all = rating_all.copy()
+    # users without a role's rating, so the correct slices aren't empty
+    rating_all.loc[rating_all.index[:5], 'disposals_rating'] = 0
+    summary = build_home_summary(df_location, df_user, rating_all, top=100)
+    for role, cols in pie_roles.items():
+        assert summary['pies'][role] == counted(rating_all, *cols) == pie_counts(rating_all, *cols)
+    assert summary['pies']['disposals'][1] > 0
+    expected = df_user.rename_axis('user').reset_index().nlargest(100, 'total_rating')
+    pd.testing.assert_frame_equal(summary['top_users'],
+                                  expected[['user', 'disposals_rating', 'locations_rating', 'receiving_rating']])
+    pd.testing.assert_frame_equal(summary['locations'], df_location[['location', 'total_rating']])
+
+
+def test_home_summary_from_ranking_indexes(home_tables):
+    df_location, df_user, rating_all = home_tables
+    shuffled = df_location.sample(frac=1, random_state=0)
+    summary = build_home_summary(shuffled, df_user, rating_all, top=100,
+                                 location_ranking=RankingIndex(shuffled, ['total_rating']),
+                                 user_ranking=RankingIndex(df_user, ['total_rating']))
+    expected = build_home_summary(df_location, df_user, rating_all, top=100)
+    pd.testing.assert_frame_equal(summary['top_users'], expected['top_users'])
+    pd.testing.assert_series_equal(summary['locations']['total_rating'].reset_index(drop=True),
+                                   expected['locations']['total_rating'].reset_index(drop=True))
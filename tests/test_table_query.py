@@ -0,0 +1,71 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Server-side filtering, sorting and paging against the same query done by hand in pandas.
+'''
+
+# import modules
+import numpy as np
+import pandas as pd
+import pytest
+from table_query import filter_mask, query_page, split_filter_part
+
+
+@pytest.fixture(scope='module')
+def users():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({'user': ['USER%04d' % i for i in rng.permutation(500)],
+                         'total_rating': np.round(rng.random(500), 2),
+                         'disposals_rating': rng.integers(0, 5, 500).astype(float)})
+
+
+def test_split_filter_part():
+    assert split_filter_part('{total_rating} >= 0.5') == ('total_rating', 'ge', 0.5)
+    assert split_filter_part('{user} contains "US\\"ER"') == ('user', 'contains', 'US"ER')
+    assert split_filter_part('{user} eq USER0001') == ('user', 'eq', 'USER0001')
+    assert split_filter_part('nonsense') == [None] * 3
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('{total_rating} > 0.5', lambda df: df['total_rating'] > 0.5),
+    ('{total_rating} <= 0.25 && {disposals_rating} = 2', lambda df: (df['total_rating'] <= 0.25) &
+     (df['disposals_rating'] == 2)),
+    ('{user} contains "01"', lambda df: df['user'].str.contains('01', regex=False)),
+    ('{user} ne USER0007', lambda df: df['user'] != 'USER0007'),
+    # a text value for a numeric column, or an unknown column, doesn't filter
+    ('{total_rating} > abc && {nothing} > 1 && {disposals_rating} lt 1', lambda df: df['disposals_rating'] < 1),
+    # nor a number for a text column
+    ('{user} > 5 && {user} eq 7 && {total_rating} < 0.5', lambda df: df['total_rating'] < 0.5),
+])
+def test_filter_matches_pandas(users, query, expected):
+    np.testing.assert_array_equal(filter_mask(users, query).to_numpy(), expected(users).to_numpy())
+
+
+def test_no_filter():
+    assert filter_mask(pd.DataFrame({'a': [1]}), '') is None
+
+
+def test_pages_match_pandas(users):
+    query = '{total_rating} >= 0.2'
+    sort_by = [{'column_id': 'disposals_rating', 'direction': 'desc'}, {'column_id': 'user', 'direction': 'asc'}]
+    expected = users[users['total_rating'] >= 0.2].sort_values(['disposals_rating', 'user'],
+                                                                ascending=[False, True])
+    page_size = 20
+    records = []
+    page_count = None
+    for page in range(int(np.ceil(len(expected) / page_size))):
+        part, page_count = query_page(users, query, sort_by, page, page_size)
+        assert len(part) <= page_size
+        records += part
+    assert page_count == int(np.ceil(len(expected) / page_size))
+    pd.testing.assert_frame_equal(pd.DataFrame(records), expected.reset_index(drop=True))
+    # past the last page, and an empty result still has one page
+    assert query_page(users, query, sort_by, page_count, page_size)[0] == []
+    assert query_page(users, '{total_rating} > 2', [], 0, page_size) == ([], 1)
+
+
+def test_dashboard_table_ignores_numbers_for_text_columns(dashboard):
+    location = dashboard.snapshot().location_index.locations[0]
+    data, page_count = dashboard.callback_user_table_query([0], [10], [[]], ['{user} > 5'], location, 'all')
+    assert (data, page_count) == dashboard.callback_user_table_query([0], [10], [[]], [''], location, 'all')
@@ -0,0 +1,52 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Table export and column-pruned reads in every format, and version publishing.
+'''
+
+# import modules
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import tables
+
+
+@pytest.fixture
+def rating_df():
+    return pd.DataFrame({'user': ['USER2', 'USER1', 'USER3'], 'location': ['BUSINESS_1', 'BUSINESS_0', 'BUSINESS_1'],
+                         'total_rating': [0.25, 0.5, 0.125], 'err_cost_disposals': [10.5, 0.0, 3.25]})
+
+
+@pytest.mark.parametrize('ext', ['.csv', '.parquet', '.arrow'])
+def test_export_and_read_back(rating_df, tmp_path, ext):
+    paths = tables.export_tables({'Rating': rating_df}, str(tmp_path), '0412', formats=(ext[1:],))
+    assert paths == [str(tmp_path) + '/' + tables.table_file('Rating', '0412', ext)]
+    filename = os.path.basename(paths[0])
+    df = tables.read_table(paths[0], filename, ['user', 'total_rating'])
+    assert list(df.columns) == ['user', 'total_rating']
+    if ext != '.csv':
+        # dictionary encoded identifiers, float32 ratings, other numbers as they were
+        assert isinstance(df['user'].dtype, pd.CategoricalDtype)
+        assert df['total_rating'].dtype == np.float32
+        assert tables.read_table(paths[0], filename)['err_cost_disposals'].dtype == np.float64
+        df = tables.widen_floats(tables.decode_categories(df, ['user']))
+    pd.testing.assert_frame_equal(df, rating_df[['user', 'total_rating']], check_dtype=False)
+    with open(paths[0], 'rb') as f:
+        pd.testing.assert_frame_equal(tables.read_table(f.read(), filename, ['user', 'total_rating']).astype(str),
+                                      df.astype(str))
+
+
+def test_integer_codes_stay_integers(rating_df):
+    df = tables.to_columnar(rating_df.assign(user=[2, 1, 3]))
+    assert pd.api.types.is_integer_dtype(df['user'])
+    assert isinstance(df['location'].dtype, pd.CategoricalDtype)
+
+
+def test_publish_version_replaces_the_version(tmp_path):
+    tables.publish_version(str(tmp_path), '0412')
+    path = tables.publish_version(str(tmp_path), '0413')
+    with open(path) as f:
+        assert f.read() == '0413\n'
+    assert os.listdir(str(tmp_path)) == [tables.version_file]
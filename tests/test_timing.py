@@ -0,0 +1,28 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Stage timing of consecutive laps.
+'''
+
+# import modules
+import time
+from timing import StageTimer
+
+
+def test_laps_time_consecutive_stages():
+    timer = StageTimer()
+    time.sleep(0.02)
+    timer.lap('load tables')
+    timer.lap('indexes')
+    (first, load), (second, indexes) = timer.stages
+    assert (first, second) == ('load tables', 'indexes')
+    assert load >= 0.02 and 0 <= indexes < load
+    lines = timer.report('startup').splitlines()
+    assert lines[0] == 'startup timing: {:.3f}s'.format(load + indexes)
+    assert lines[1].split()[:2] == ['load', 'tables'] and lines[1].endswith('%')
+    assert len(lines) == 3
+
+
+def test_empty_report():
+    assert StageTimer().report('startup') == 'startup timing: 0.000s'
@@ -0,0 +1,115 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Windowed ratings against rating the rows of each window on their own, and the window sums
+streamed chunk by chunk through ingest.ingest_role against all the rows at once.
+'''
+
+# import modules
+import numpy as np
+import pandas as pd
+import pytest
+import ingest
+import rating
+from encoding import new_dictionaries
+from windows import (DECAYED, WINDOWS, WindowedSums, half_life_days, latest_date, latest_transaction_date,
+                     windowed_ratings, windowed_sums)
+
+
+# {role: (processed rows, their dates)}, rows shuffled and some dates missing
+@pytest.fixture(scope='module')
+def role_dates(raw, processed):
+    out = {}
+    for i, (role, df) in enumerate(processed.items()):
+        dates = ingest.transaction_dates(raw[role], role)
+        dates[dates.sample(frac=0.05, random_state=i).index] = pd.NaT
+        order = np.random.default_rng(i).permutation(len(df))
+        out[role] = (df.iloc[order], dates.iloc[order])
+    return out
+
+
+@pytest.fixture(scope='module')
+def as_of(role_dates):
+    return latest_date(*[dates.to_numpy(dtype='datetime64[ns]') for _, dates in role_dates.values()])
+
+
+# the rows of a trailing window (all rows for all time)
+def in_window(processed, dates, as_of, days):
+    if days is None:
+        return processed
+    keep = (dates > as_of - pd.Timedelta(days, 'D')) & (dates <= as_of)
+    return processed[keep.to_numpy()]
+
+
+def test_window_sums_match_filtered_rows(role_dates, as_of):
+    for role, (processed, dates) in role_dates.items():
+        sums = windowed_sums(processed, dates, role, as_of)
+        for name, days in WINDOWS.items():
+            expected = ingest.partial_sums(in_window(processed, dates, as_of, days), role, 'user')
+            pd.testing.assert_frame_equal(sums[name], expected, check_dtype=False, check_names=False)
+        # decayed: every column weighted by 0.5 ** (age / half life), undated rows left out
+        age = ((as_of - dates) / pd.Timedelta(1, 'D')).clip(lower=0)
+        weight = (0.5 ** (age / half_life_days)).fillna(0).to_numpy()
+        columns = ['n', 'org_cost', 'err_cost'] + [name for _, name, _ in rating.ROLES[role]['actions']]
+        weighted = pd.DataFrame({'user': processed['user'].to_numpy(), 'n': weight,
+                                 'org_cost': processed['ori_cost'].to_numpy() * weight,
+                                 'err_cost': processed['err_cost'].to_numpy() * weight,
+                                 **{name: processed[col].to_numpy() * weight
+                                    for col, name, _ in rating.ROLES[role]['actions']}})
+        expected = weighted.groupby('user')[columns].sum()
+        expected = expected[expected['n'] > 0]
+        pd.testing.assert_frame_equal(sums[DECAYED], expected, check_names=False)
+
+
+# the notebook's Rating of some rows, dropping the given locations user instead of the first one
+def rating_dropping(rows, dropped_user):
+    role_ratings = [rating.score_role(rating.aggregate_role(rows[role], role), role) for role in rating.ROLES]
+    locations = role_ratings[1]
+    role_ratings[1] = locations[locations['user'] != dropped_user].reset_index(drop=True)
+    return rating.combine_ratings(*role_ratings)
+
+
+def test_windowed_ratings_rate_each_window_like_all_time(role_dates, as_of):
+    # the first locations user's rows are all older than a year, so the trailing windows
+    # start with other users
+    processed, dates = role_dates['locations']
+    dropped_user = processed['user'].min()
+    dates = dates.where((processed['user'] != dropped_user).to_numpy(), as_of - pd.Timedelta(1000, 'D'))
+    role_dates = dict(role_dates, locations=(processed, dates))
+    windowed = windowed_ratings(role_dates)
+    assert list(windowed['window'].unique()) == list(WINDOWS) + [DECAYED]
+    first_users = set()
+    for name, days in WINDOWS.items():
+        rows = {role: in_window(processed, dates, as_of, days) for role, (processed, dates) in role_dates.items()}
+        expected = rating_dropping(rows, dropped_user)
+        got = windowed[windowed['window'] == name].drop(columns='window')
+        pd.testing.assert_frame_equal(got.sort_values('user', ignore_index=True),
+                                      expected.sort_values('user', ignore_index=True), check_dtype=False)
+        first_users.add(rows['locations']['user'].min())
+    # some windows start with another user, who stays in them
+    assert first_users - {dropped_user}
+    # all time is the notebook's Rating
+    rows = {role: processed for role, (processed, _) in role_dates.items()}
+    pd.testing.assert_frame_equal(
+        windowed[windowed['window'] == 'all'].drop(columns='window').sort_values('user', ignore_index=True),
+        rating.build_rating(rows['disposals'], rows['locations'], rows['receiving']).sort_values(
+            'user', ignore_index=True), check_dtype=False)
+
+
+def test_streamed_window_sums_match_all_rows(extracts, raw, processed):
+    dates = {role: ingest.transaction_dates(raw[role], role) for role in raw}
+    as_of = latest_transaction_date(extracts, chunksize=1000)
+    assert as_of == latest_date(*[d.to_numpy(dtype='datetime64[ns]') for d in dates.values()])
+    sums = WindowedSums(as_of)
+    # encoded like the benchmark, the window sums are still keyed by name
+    dictionaries = new_dictionaries()
+    for role, path in extracts.items():
+        ingest.ingest_role(path, role, chunksize=1000, dictionaries=dictionaries, windows=sums)
+    expected = windowed_ratings({role: (processed[role], dates[role]) for role in processed}, as_of)
+    pd.testing.assert_frame_equal(sums.ratings(), expected)
+
+
+def test_no_valid_dates():
+    with pytest.raises(ValueError):
+        latest_date(np.array(['NaT'], dtype='datetime64[ns]'))
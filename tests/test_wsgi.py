@@ -0,0 +1,33 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+The production entry point and its gunicorn settings.
+'''
+
+# import modules
+import gc
+import os
+import runpy
+
+
+def test_wsgi_serves_the_preloaded_dashboard(dashboard):
+    import wsgi
+    try:
+        assert wsgi.server is dashboard.server
+        # the loaded tables are out of the collector's generations
+        assert gc.get_freeze_count() > 0
+        response = wsgi.server.test_client().get('/')
+        assert response.status_code == 200
+        assert b'_dash-config' in response.data
+    finally:
+        gc.unfreeze()
+
+
+def test_gunicorn_preloads_and_reloads_in_the_master():
+    settings = runpy.run_path(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                           'gunicorn.conf.py'))
+    assert settings['preload_app'] is True
+    assert settings['worker_class'] == 'gthread' and settings['threads'] > 1
+    assert settings['workers'] >= 1
+    assert callable(settings['when_ready']) and callable(settings['post_fork'])
@@ -0,0 +1,38 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Wall-clock timing of consecutive stages, e.g. where the dashboard's boot time goes.
+
+Usage:
+    boot_timer = StageTimer()
+    ...                         # load tables
+    boot_timer.lap('load tables')
+    ...                         # build indexes
+    boot_timer.lap('indexes')
+    print(boot_timer.report('startup'))
+'''
+
+# import modules
+import time
+
+
+class StageTimer:
+    def __init__(self):
+        self.stages = []  # (name, seconds)
+        self._last = time.perf_counter()
+
+    # close the current stage: the time since the previous lap (or the start)
+    def lap(self, name):
+        now = time.perf_counter()
+        self.stages.append((name, now - self._last))
+        self._last = now
+
+    # one line per stage with its share of the total
+    def report(self, title):
+        total = sum(seconds for _, seconds in self.stages)
+        lines = [title + ' timing: ' + '{:.3f}s'.format(total)]
+        for name, seconds in self.stages:
+            share = seconds / total if total else 0
+            lines.append('  {:<24} {:8.3f}s {:6.1%}'.format(name, seconds, share))
+        return '\n'.join(lines)
@@ -0,0 +1,151 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Time-windowed and time-decayed ratings.
+
+The all-time rating weights an error from ten years ago like one from last week. Here
+every transaction gets a weight per window from its transaction date
+(ingest.transaction_dates: RETIREMENT_DATE, LOCATION_DATE, ACQUISITION_DT): 1 inside a
+trailing window, 0 outside it, and 0.5 ** (age / half_life) for the decayed rating. The
+users are coded once, and each window sums only its rows with a weight > 0 per user
+(np.bincount over the user codes), so memory stays close to that of the all-time sums
+however many windows there are. The sums are rated like the all-time sums
+(ingest.rate_user_sums); every window drops the locations user the all-time rating drops,
+not the first user of its own table.
+
+Over raw extracts too large for memory, ingest.ingest_role(windows=WindowedSums(as_of))
+adds each chunk to the window sums as it streams by, as_of coming from a first pass over
+the date columns only (latest_transaction_date).
+
+The result is one long table (Rating_windows): the columns of Rating plus `window`, so
+the dashboard switches windows by selecting rows, never by recomputing.
+
+Usage:
+    windowed = windowed_ratings({'disposals': (processed_disposals_df_1, transaction_dates(data_disposals, 'disposals')),
+                                 ...})
+    windowed[windowed.window == '90d']
+'''
+
+# import modules
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import rating
+from ingest import SOURCES, chunksize, merge_sums, rate_user_sums, transaction_dates
+
+# trailing windows: name -> days before the as-of date (None: all time)
+WINDOWS = OrderedDict([('30d', 30), ('90d', 90), ('1y', 365), ('all', None)])
+# name and half-life in days of the exponentially time-decayed rating
+DECAYED = 'decayed'
+half_life_days = 365
+
+# display labels of the windows
+window_labels = OrderedDict([('30d', 'Last 30 days'), ('90d', 'Last 90 days'), ('1y', 'Last year'),
+                             ('all', 'All time'), (DECAYED, 'Time decayed')])
+
+
+# transaction dates of processed rows as datetime64[ns], aligned on the processed index
+def row_dates(processed, dates):
+    if isinstance(dates, pd.Series):
+        dates = dates.reindex(processed.index)
+    return pd.to_datetime(np.asarray(dates)).to_numpy(dtype='datetime64[ns]')
+
+
+# latest valid date of several date arrays, the default as-of date
+def latest_date(*dates):
+    valid = [d[~np.isnat(d)].max() for d in dates if (~np.isnat(d)).any()]
+    if not valid:
+        raise ValueError('no valid transaction dates')
+    return max(valid)
+
+
+# weight of each row per window, {name: weights} (None: weight 1 for every row, all
+# time); rows without a date only count for all time
+def window_weights(dates, as_of, windows=WINDOWS, half_life=half_life_days):
+    weights = OrderedDict()
+    for name, days in windows.items():
+        # comparisons with NaT are False
+        weights[name] = None if days is None else \
+            ((dates > as_of - np.timedelta64(days, 'D')) & (dates <= as_of)).astype(float)
+    if half_life:
+        age = np.maximum((as_of - dates) / np.timedelta64(1, 'D'), 0)
+        weights[DECAYED] = np.where(np.isnat(dates), 0.0, 0.5 ** (age / half_life))
+    return weights
+
+
+# per-user sums of a role for every window, {name: sums like ingest.partial_sums}; users
+# without transactions in a window are left out of it
+def windowed_sums(processed, dates, role, as_of, windows=WINDOWS, half_life=half_life_days):
+    weights = window_weights(row_dates(processed, dates), np.datetime64(as_of, 'ns'), windows, half_life)
+    codes, users = pd.factorize(processed['user'], sort=True)
+    columns = ['n', 'org_cost', 'err_cost'] + [name for _, name, _ in rating.ROLES[role]['actions']]
+    values = [None, processed['ori_cost'].to_numpy(dtype=float), processed['err_cost'].to_numpy(dtype=float)] + \
+        [processed[col].to_numpy(dtype=float) for col, _, _ in rating.ROLES[role]['actions']]
+    sums = OrderedDict()
+    for name, w in weights.items():
+        # only the rows in the window, weighted
+        rows = slice(None) if w is None else np.flatnonzero(w > 0)
+        w = None if w is None else w[rows]
+        summed = pd.DataFrame({col: np.bincount(codes[rows], minlength=len(users),
+                                                weights=w if v is None else (v[rows] if w is None else v[rows] * w))
+                               for col, v in zip(columns, values)}, index=users)
+        sums[name] = summed[summed['n'] > 0]
+    return sums
+
+
+# per-user sums of every window, accumulated chunk by chunk (ingest.ingest_role(windows=...)),
+# so the rows never have to be in memory at once; the trailing windows end at as_of, which
+# must be known before the first chunk (latest_transaction_date)
+class WindowedSums:
+    def __init__(self, as_of, windows=WINDOWS, half_life=half_life_days):
+        self.as_of = as_of
+        self.windows = windows
+        self.half_life = half_life
+        self.sums = {}  # role -> {window: sums}
+        # the first user of the all-time locations table
+        self.dropped_user = None
+
+    # add processed rows of a role and the transaction dates of its rows
+    def add(self, processed, role, dates):
+        sums = self.sums.setdefault(role, OrderedDict())
+        for name, part in windowed_sums(processed, dates, role, self.as_of, self.windows, self.half_life).items():
+            sums[name] = merge_sums(sums.get(name), part)
+        if role == 'locations' and len(processed):
+            first = processed['user'].min()
+            self.dropped_user = first if self.dropped_user is None else min(self.dropped_user, first)
+
+    # Rating of every window as one long table: `window` plus the columns of Rating
+    def ratings(self):
+        tables = []
+        for name in self.sums[next(iter(self.sums))]:
+            role_ratings = [rate_user_sums(self.sums[role][name], role, self.dropped_user) for role in rating.ROLES]
+            tables.append(rating.combine_ratings(*role_ratings))
+            tables[-1].insert(0, 'window', name)
+        return pd.concat(tables, ignore_index=True)
+
+
+# latest valid transaction date of the raw extracts ({role: path}), the default as-of date;
+# reads only the date columns
+def latest_transaction_date(paths, chunksize=chunksize):
+    latest = []
+    for role, path in paths.items():
+        for raw in pd.read_csv(path, dtype=str, usecols=[SOURCES[role]['date'][0]], chunksize=chunksize):
+            dates = transaction_dates(raw, role).dropna()
+            if len(dates):
+                latest.append(dates.max())
+    if not latest:
+        raise ValueError('no valid transaction dates')
+    return np.datetime64(max(latest), 'ns')
+
+
+# Rating of every window as one long table: `window` plus the columns of Rating
+# role_dates: {role: (processed_*_df_1, transaction dates of its rows)}
+# as_of: end of the trailing windows, default the latest transaction date
+def windowed_ratings(role_dates, as_of=None, windows=WINDOWS, half_life=half_life_days):
+    if as_of is None:
+        as_of = latest_date(*[row_dates(processed, dates) for processed, dates in role_dates.values()])
+    sums = WindowedSums(as_of, windows, half_life)
+    for role, (processed, dates) in role_dates.items():
+        sums.add(processed, role, dates)
+    return sums.ratings()
@@ -0,0 +1,26 @@
+'''
+Team Pass
+GMU-DAEN-690-DL2@SPRING2021
+
+Production entry point of the dashboard.
+
+    gunicorn -c gunicorn.conf.py wsgi:server
+
+gunicorn.conf.py preloads this module in the master process, so the rating tables,
+indexes and layout are built once and the forked workers share them copy-on-write.
+The served tables are copies the snapshot builds (widened, sorted, rounded) in the
+master, not views of the exported files, so the sharing relies on the preload and
+copy-on-write alone, whatever data_ext is.
+
+The master polls for a newly published version, builds its snapshot and re-forks the
+workers from it (when_ready in gunicorn.conf.py), so a reloaded snapshot is shared the
+same way.
+'''
+
+# import modules
+import gc
+from Interactive_dashboard import server
+
+# move everything loaded so far out of the garbage collector's generations, so the
+# collector in the workers doesn't write to (and copy) the shared pages
+gc.freeze()